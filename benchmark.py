@@ -0,0 +1,581 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Benchmarks of the service layer against synthetic fixtures: fake python3.X interpreters spread over fake
+# PYTHON_PATHS entries, fake VSCode releases served over local HTTP and a fake /opt/vscode tree. Every case runs
+# in a fresh worker process, so its peak memory and its cold start are its own.
+#
+#   python benchmark.py run -o before.json
+#   python benchmark.py compare before.json after.json
+
+BENCHMARK_FORMAT = 1
+DEFAULT_ITERATIONS = 5
+DEFAULT_THRESHOLD = 0.2
+# Differences below these are noise whatever their ratio
+MIN_SECONDS_DELTA = 0.005
+MIN_RSS_DELTA_KB = 4096
+VSCODE_TOP_DIR = "VSCode-linux-x64"
+# Share of files a new fake VSCode release rewrites
+VSCODE_CHANGED_FRACTION = 0.1
+WORDS = [b"function", b"return", b"const", b"module", b"export", b"require", b"this", b"value", b"=>", b"{}"]
+SPAWN_EVENTS = {"subprocess.Popen", "os.posix_spawn", "os.fork", "os.system"}
+# Fake releases on the local python.org stand-in; install_pythons_cached finds all of them in the build cache
+CACHED_PYTHON_RELEASES = ("3.90.1", "3.91.2", "3.92.0")
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+@dataclass
+class FixtureConfig:
+    interpreters: int = 40
+    path_dirs: int = 4
+    # Unrelated executables per fake bin directory, scanned like the rest of /usr/bin
+    noise_files: int = 500
+    vscode_files: int = 2000
+    vscode_mb: int = 100
+    seed: int = 1
+
+
+@dataclass
+class Case:
+    func: Callable[["Fixture", int], str]
+    check: Callable[["Fixture", str], bool]
+    # "cached" runs a first worker to fill the on-disk caches, then measures a second one
+    variants: tuple = ("cold",)
+
+
+class Fixture:
+    def __init__(self, root: Path, manifest: dict):
+        self.root = root
+        self.manifest = manifest
+
+    @property
+    def python_version(self) -> str:
+        # The newest fake interpreter: only the benchmark's stand-ins have it
+        return f"3.{40 + min(self.manifest['config']['interpreters'], 20) - 1}"
+
+    def vscode_release(self, iteration: int) -> str:
+        # The tree starts at release a: alternating makes every iteration a real update
+        return "b" if iteration % 2 == 0 else "a"
+
+
+def _write_stub(path: Path, version: str):
+    # Answers the registry's probe and --version like an interpreter, fails everything else
+    probe = json.dumps(
+        {
+            "version": version,
+            "implementation": "CPython",
+            "architecture": "x86_64",
+            "has_venv": True,
+            "has_ensurepip": True,
+        }
+    )
+    path.write_text(
+        "#!/bin/sh\n"
+        f"# dev-tools benchmark stand-in for Python {version}\n"
+        'case "$*" in\n'
+        f"  *DEVTOOLS-PROBE*) echo 'DEVTOOLS-PROBE {probe}' ;;\n"
+        f'  --version|-V) echo "Python {version}" ;;\n'
+        '  *) echo "benchmark stand-in interpreter" >&2; exit 1 ;;\n'
+        "esac\n"
+    )
+    path.chmod(0o755)
+
+
+def _file_content(rng: random.Random, size: int) -> bytes:
+    # Source-like text for most files, incompressible data for the rest, as in a real release
+    if rng.random() < 0.6:
+        text = b" ".join(rng.choice(WORDS) for _ in range(size // 6 + 1))
+        return text[:size]
+    return rng.randbytes(size)
+
+
+def _vscode_files(config: FixtureConfig, rng: random.Random) -> Dict[str, bytes]:
+    # Few large files and many small ones, summing to about vscode_mb
+    weights = [rng.paretovariate(1.2) for _ in range(config.vscode_files)]
+    scale = config.vscode_mb * 1024 * 1024 / sum(weights)
+    files = {}
+    for i, weight in enumerate(weights):
+        depth = rng.randint(1, 4)
+        parts = [f"d{rng.randint(0, 7)}" for _ in range(depth)]
+        files["/".join(["resources", "app", *parts, f"f{i}.js"])] = _file_content(rng, max(1, int(weight * scale)))
+    return files
+
+
+def _write_release(path: Path, files: Dict[str, bytes], commit: str) -> str:
+    product = json.dumps({"commit": commit, "nameShort": "Code", "version": commit[:7]}).encode()
+    entries = dict(files)
+    entries["resources/app/product.json"] = product
+    entries["bin/code"] = b"#!/bin/sh\necho benchmark stand-in for code\n"
+    # A fixed gzip timestamp keeps the archive, and so its checksum, identical from run to run
+    with open(path, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", compresslevel=1, mtime=0) as compressed:
+        with tarfile.open(fileobj=compressed, mode="w") as archive:
+            for name, data in sorted(entries.items()):
+                info = tarfile.TarInfo(f"{VSCODE_TOP_DIR}/{name}")
+                info.size = len(data)
+                info.mode = 0o755 if name == "bin/code" else 0o644
+                info.mtime = 1700000000
+                archive.addfile(info, io.BytesIO(data))
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def build_fixture(root: Path, config: FixtureConfig) -> dict:
+    rng = random.Random(config.seed)
+    bin_dirs = []
+    for d in range(config.path_dirs):
+        bin_dir = root / "bin" / f"path{d}"
+        bin_dir.mkdir(parents=True)
+        for n in range(config.noise_files):
+            (bin_dir / f"tool{n}").touch(mode=0o755)
+        bin_dirs.append(str(bin_dir))
+
+    # Versions repeat across directories, like python3 packages installed by both the distro and by hand
+    for i in range(config.interpreters):
+        minor = 40 + i % 20
+        bin_dir = Path(bin_dirs[(i + i // 20) % len(bin_dirs)])
+        _write_stub(bin_dir / f"python3.{minor}", f"3.{minor}.{i // 20}")
+    # A real interpreter for create_venv and for the VSCode scripts
+    os.symlink(sys.executable, Path(bin_dirs[0]) / "python3")
+
+    www = root / "www"
+    (www / "api" / "update").mkdir(parents=True)
+    releases = {}
+    files = _vscode_files(config, rng)
+    for name in ("a", "b"):
+        commit = hashlib.sha1(f"{config.seed}-{name}".encode()).hexdigest()
+        if name == "b":
+            for path in rng.sample(sorted(files), int(len(files) * VSCODE_CHANGED_FRACTION)):
+                files[path] = _file_content(rng, len(files[path]))
+        archive = www / f"vscode-{name}.tar.gz"
+        releases[name] = {"commit": commit, "sha256": _write_release(archive, files, commit), "file": archive.name}
+
+    # Only the directory listing and the HEAD of each tarball matter to resolve_python_release
+    for release in CACHED_PYTHON_RELEASES:
+        (www / "ftp" / "python" / release).mkdir(parents=True)
+        (www / "ftp" / "python" / release / f"Python-{release}.tar.xz").touch()
+
+    # The installed tree is release a
+    vscode_path = root / "opt" / "vscode"
+    with tarfile.open(www / releases["a"]["file"]) as archive:
+        for member in archive.getmembers():
+            member.name = member.name.split("/", 1)[1]
+            archive.extract(member, vscode_path)
+
+    return {
+        "config": asdict(config),
+        "bin_dirs": bin_dirs,
+        "vscode_path": str(vscode_path),
+        "vscode_backup_dir": str(root / "opt" / "vscode-backup"),
+        "releases": releases,
+    }
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(www: Path, releases: dict) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=str(www)))
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    for name, release in releases.items():
+        api = {
+            "url": f"{base}/{release['file']}",
+            "name": release["commit"][:7],
+            "version": release["commit"],
+            "sha256hash": release["sha256"],
+        }
+        (www / "api" / "update" / name).write_text(json.dumps(api))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _detect_python_versions(fixture: Fixture, iteration: int) -> str:
+    from services.dev_tools_service import DevToolsService
+
+    return " ".join(DevToolsService.detect_python_versions())
+
+
+def _get_python_command(fixture: Fixture, iteration: int) -> str:
+    from services.dev_tools_service import DevToolsService
+
+    return DevToolsService.get_python_command(fixture.python_version) or ""
+
+
+def _system_info(fixture: Fixture, iteration: int) -> str:
+    from services.dev_tools_service import DevToolsService
+
+    return DevToolsService.system_info()
+
+
+def _create_venv(fixture: Fixture, iteration: int) -> str:
+    from services.dev_tools_service import DevToolsService
+
+    target = fixture.root / "work" / f"project{iteration}"
+    target.mkdir(parents=True, exist_ok=True)
+    return str(DevToolsService.create_venv(str(target), "3"))
+
+
+def _update_vscode(fixture: Fixture, iteration: int) -> str:
+    from services import dev_tools_service
+    from services.dev_tools_service import DevToolsService
+
+    # Every iteration downloads: a new release came out and nothing of it is cached yet
+    shutil.rmtree(dev_tools_service.ARTIFACT_CACHE_DIR, ignore_errors=True)
+    release = fixture.vscode_release(iteration)
+    dev_tools_service.VSCODE_UPDATE_API = f"{fixture.manifest['base_url']}/api/update/{release}"
+    return str(DevToolsService.update_vscode())
+
+
+def _install_pythons_cached(fixture: Fixture, iteration: int) -> str:
+    from services import build_cache, dev_tools_service
+    from services.build_profiles import BUILD_PROFILES, DEFAULT_BUILD_PROFILE
+    from services.dev_tools_service import DevToolsService
+
+    # A host without a package manager whose build cache holds every version: the versions resolve in parallel and
+    # are installed from the cache. The helper would extract into /, so installs are checked and recorded instead
+    build_cache.PYTHON_FTP_URL = f"{fixture.manifest['base_url']}/ftp/python/"
+    dev_tools_service.PYTHON_BUILD_CACHE_DIR = fixture.root / "work" / "python-builds"
+    DevToolsService._package_manager_detected = True
+    DevToolsService._package_manager_instance = None
+    profile = BUILD_PROFILES[DEFAULT_BUILD_PROFILE]
+    cache = DevToolsService._build_cache()
+    for release in CACHED_PYTHON_RELEASES:
+        key = cache.key(release, profile.configure_args, build_cache.toolchain_fingerprint())
+        if not cache.lookup(key):
+            destdir = fixture.root / "work" / f"destdir-{release}"
+            (destdir / "usr" / "local" / "bin").mkdir(parents=True, exist_ok=True)
+            _write_stub(destdir / "usr" / "local" / "bin" / f"python{release.rsplit('.', 1)[0]}", release)
+            cache.store(key, destdir, {"release": release})
+
+    installed = []
+
+    def install_build_archive(archive: Path):
+        digest = build_cache.BuildCache(archive.parent, dev_tools_service.PYTHON_BUILD_DIGESTS_FILE).digest(
+            archive.name[: -len(".tar.gz")]
+        )
+        if digest != build_cache.file_sha256(archive):
+            raise dev_tools_service.SystemCommandError(f"No matching digest recorded for {archive.name}")
+        installed.append(archive.name)
+
+    DevToolsService._install_build_archive = staticmethod(install_build_archive)
+    versions = [release.rsplit(".", 1)[0] for release in CACHED_PYTHON_RELEASES]
+    result = DevToolsService.install_pythons(versions)
+    return f"{result}\n{len(installed)} archives installed"
+
+
+CASES: Dict[str, Case] = {
+    "detect_python_versions": Case(
+        _detect_python_versions, lambda fixture, out: fixture.python_version in out.split(), ("cold", "cached")
+    ),
+    "get_python_command": Case(
+        _get_python_command, lambda fixture, out: out == f"python{fixture.python_version}", ("cold", "cached")
+    ),
+    "system_info": Case(_system_info, lambda fixture, out: fixture.python_version in out, ("cold", "cached")),
+    "create_venv": Case(_create_venv, lambda fixture, out: out.startswith("Virtual environment created")),
+    "update_vscode": Case(_update_vscode, lambda fixture, out: "updated successfully" in out),
+    "install_pythons_cached": Case(
+        _install_pythons_cached,
+        lambda fixture, out: out.endswith(f"\n{len(CACHED_PYTHON_RELEASES)} archives installed")
+        and out.startswith(f"{len(CACHED_PYTHON_RELEASES)} of {len(CACHED_PYTHON_RELEASES)} Python versions installed"),
+    ),
+}
+
+
+def _peak_rss_kb() -> int:
+    # Not ru_maxrss: Linux carries it over exec, so the worker would report the fixture builder's peak
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _worker(args) -> int:
+    # Runs in a fresh process with the fixture environment set by run(); prints one JSON result
+    fixture = Fixture(Path(args.fixture), json.loads((Path(args.fixture) / "manifest.json").read_text()))
+    case = CASES[args.case]
+    spawns = 0
+
+    def count_spawns(event: str, _):
+        nonlocal spawns
+        if event in SPAWN_EVENTS:
+            spawns += 1
+
+    sys.addaudithook(count_spawns)
+    from services.dev_tools_service import DevToolsService
+
+    DevToolsService.PYTHON_PATHS = fixture.manifest["bin_dirs"]
+    seconds: List[float] = []
+    spawn_counts: List[int] = []
+    try:
+        for iteration in range(args.iterations):
+            spawns = 0
+            started = time.perf_counter()
+            output = case.func(fixture, iteration)
+            seconds.append(time.perf_counter() - started)
+            spawn_counts.append(spawns)
+            if not case.check(fixture, output):
+                raise BenchmarkError(f"{args.case} returned an unexpected result: {output.strip()[:300]}")
+    finally:
+        DevToolsService.close_privileged_session()
+
+    json.dump(
+        {
+            "seconds": seconds,
+            "spawns": spawn_counts,
+            "peak_rss_kb": _peak_rss_kb(),
+            # Largest waited-for child; as it carries over exec, never below the worker's size when it started one
+            "children_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        },
+        sys.stdout,
+    )
+    return 0
+
+
+def _run_worker(fixture_dir: Path, case: str, iterations: int, env: Dict[str, str]) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "_worker", str(fixture_dir), case]
+    cmd += ["--iterations", str(iterations)]
+    result = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise BenchmarkError(f"{case} failed:\n{result.stderr.strip()[-2000:]}")
+    return json.loads(result.stdout)
+
+
+def _summary(raw: dict) -> dict:
+    seconds = raw["seconds"]
+    # The first call pays for cold caches and imports, the others show the steady state
+    steady = seconds[1:] or seconds
+    return {
+        "first_seconds": seconds[0],
+        "median_seconds": statistics.median(steady),
+        "min_seconds": min(steady),
+        "spawns_first": raw["spawns"][0],
+        "spawns_median": statistics.median(raw["spawns"][1:] or raw["spawns"]),
+        "peak_rss_kb": raw["peak_rss_kb"],
+        "children_peak_rss_kb": raw["children_peak_rss_kb"],
+        "seconds": seconds,
+        "spawns": raw["spawns"],
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def _run(args) -> int:
+    config = FixtureConfig(
+        interpreters=args.interpreters,
+        path_dirs=args.path_dirs,
+        noise_files=args.noise_files,
+        vscode_files=args.vscode_files,
+        vscode_mb=args.vscode_mb,
+        seed=args.seed,
+    )
+    cases = args.cases or list(CASES)
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        print(f"Unknown cases: {', '.join(unknown)} (available: {', '.join(CASES)})", file=sys.stderr)
+        return 2
+
+    root = Path(tempfile.mkdtemp(prefix="dev-tools-bench-"))
+    try:
+        print(f"Building fixture in {root}...", file=sys.stderr)
+        manifest = build_fixture(root, config)
+        server = _serve(root / "www", manifest["releases"])
+        manifest["base_url"] = f"http://127.0.0.1:{server.server_address[1]}"
+        (root / "manifest.json").write_text(json.dumps(manifest))
+
+        results = {}
+        for name in cases:
+            for variant in CASES[name].variants:
+                label = f"{name}[{variant}]"
+                cache_dir = root / "cache" / label
+                env = dict(
+                    os.environ,
+                    XDG_CACHE_HOME=str(cache_dir),
+                    PATH=os.pathsep.join(manifest["bin_dirs"] + [os.environ.get("PATH", "")]),
+                    DEV_TOOLS_PRIVILEGE_LAUNCHER="",
+                    DEV_TOOLS_VSCODE_PATH=manifest["vscode_path"],
+                    DEV_TOOLS_VSCODE_BACKUP_DIR=manifest["vscode_backup_dir"],
+                )
+                for name_to_drop in (
+                    "DEV_TOOLS_TRACE_FILE",
+                    "DEV_TOOLS_METRICS_FILE",
+                    "DEV_TOOLS_WHEELHOUSE",
+                    "DEV_TOOLS_BUILD_CACHE",
+                ):
+                    env.pop(name_to_drop, None)
+                if variant == "cached":
+                    _run_worker(root, name, 1, env)
+                print(f"Running {label}...", file=sys.stderr)
+                results[label] = _summary(_run_worker(root, name, args.iterations, env))
+                print(
+                    f"  first {results[label]['first_seconds']:.4f}s, median {results[label]['median_seconds']:.4f}s, "
+                    f"{results[label]['spawns_first']} spawns, peak {results[label]['peak_rss_kb'] // 1024} MiB",
+                    file=sys.stderr,
+                )
+        server.shutdown()
+    except BenchmarkError as e:
+        print(f"Benchmark failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if not args.keep_fixture:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "format": BENCHMARK_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "fixture": asdict(config),
+        "iterations": args.iterations,
+        "cases": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"Results saved to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+def compare_reports(old: dict, new: dict, threshold: float) -> List[dict]:
+    rows = []
+    metrics = [
+        ("median_seconds", MIN_SECONDS_DELTA),
+        ("first_seconds", MIN_SECONDS_DELTA),
+        # Spawn counts are deterministic: any additional process is a regression
+        ("spawns_first", 0.5),
+        ("spawns_median", 0.5),
+        ("peak_rss_kb", MIN_RSS_DELTA_KB),
+        ("children_peak_rss_kb", MIN_RSS_DELTA_KB),
+    ]
+    for case in sorted(set(old["cases"]) | set(new["cases"])):
+        if case not in old["cases"] or case not in new["cases"]:
+            rows.append({"case": case, "metric": "-", "old": None, "new": None, "change": None, "regression": False})
+            continue
+        for metric, floor in metrics:
+            before, after = old["cases"][case][metric], new["cases"][case][metric]
+            change = (after - before) / before if before else None
+            tolerance = 0 if metric.startswith("spawns") else threshold
+            regression = after - before > floor and after > before * (1 + tolerance)
+            rows.append(
+                {
+                    "case": case,
+                    "metric": metric,
+                    "old": before,
+                    "new": after,
+                    "change": change,
+                    "regression": regression,
+                }
+            )
+    return rows
+
+
+def _compare(args) -> int:
+    old, new = (json.loads(Path(path).read_text()) for path in (args.old, args.new))
+    if old.get("format") != BENCHMARK_FORMAT or new.get("format") != BENCHMARK_FORMAT:
+        print("Unsupported benchmark result format", file=sys.stderr)
+        return 2
+    if old["fixture"] != new["fixture"]:
+        print("Warning: the runs used different fixtures, timings are not comparable", file=sys.stderr)
+    if old["environment"].get("cpus") != new["environment"].get("cpus"):
+        print("Warning: the runs used machines with different CPU counts", file=sys.stderr)
+
+    rows = compare_reports(old, new, args.threshold)
+    for row in rows:
+        if row["old"] is None:
+            print(f"{row['case']:<36} only in one of the runs")
+            continue
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "n/a"
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<36} {row['metric']:<22} {row['old']:>12.4g} {row['new']:>12.4g} {change:>9}{flag}")
+
+    regressions = [row for row in rows if row["regression"]]
+    print(f"{len(regressions)} regressions (threshold {args.threshold:.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = FixtureConfig()
+    parser = argparse.ArgumentParser(description="Benchmark the dev-tools service layer against synthetic fixtures")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmarks and save the results as JSON")
+    run.add_argument("cases", nargs="*", help=f"Cases to run (default: all of {', '.join(CASES)})")
+    run.add_argument("-o", "--output", help="Write the results to this file instead of stdout")
+    run.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Calls per case and worker")
+    run.add_argument("--interpreters", type=int, default=defaults.interpreters, help="Fake python3.X executables")
+    run.add_argument("--path-dirs", type=int, default=defaults.path_dirs, help="Fake PYTHON_PATHS directories")
+    run.add_argument("--noise-files", type=int, default=defaults.noise_files, help="Other executables per directory")
+    run.add_argument("--vscode-files", type=int, default=defaults.vscode_files, help="Files in the fake VSCode")
+    run.add_argument("--vscode-mb", type=int, default=defaults.vscode_mb, help="Unpacked size of the fake VSCode")
+    run.add_argument("--seed", type=int, default=defaults.seed, help="Seed of the generated fixture contents")
+    run.add_argument("--keep-fixture", action="store_true", help="Leave the fixture directory for inspection")
+    run.set_defaults(handler=_run)
+
+    compare = commands.add_parser("compare", help="Compare two result files and flag regressions")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative slowdown that counts as a regression"
+    )
+    compare.set_defaults(handler=_compare)
+
+    worker = commands.add_parser("_worker")
+    worker.add_argument("fixture")
+    worker.add_argument("case", choices=list(CASES))
+    worker.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    worker.set_defaults(handler=_worker)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import argparse
+import json
+import logging
+import sys
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+if TYPE_CHECKING:
+    from services.dev_tools_service import ActionResult
+
+# Kept free of PyQt6 imports: headless hosts can run every command without the GUI dependencies
+
+
+class _Reporter:
+    def __init__(self, quiet: bool):
+        self.quiet = quiet
+        self._last_lines = set()
+
+    def progress(self, value: int, message: str):
+        if self.quiet:
+            return
+        # Multi-line messages carry one status line per item: only the lines that changed are printed
+        lines = message.splitlines()
+        for line in lines:
+            if line not in self._last_lines:
+                print(f"[{value:3d}%] {line}", file=sys.stderr, flush=True)
+        self._last_lines = set(lines)
+
+    @staticmethod
+    def output(lines: List[str]):
+        for line in lines:
+            print(f"  | {line}", file=sys.stderr)
+        sys.stderr.flush()
+
+
+def _run_action(args, action: Callable[..., "ActionResult"], *action_args, **action_kwargs) -> int:
+    from services.command_runner import forward_output
+
+    reporter = _Reporter(quiet=args.json)
+    if args.verbose:
+        with forward_output(reporter.output):
+            result = action(*action_args, progress_callback=reporter.progress, **action_kwargs)
+    else:
+        result = action(*action_args, progress_callback=reporter.progress, **action_kwargs)
+
+    if args.json:
+        print(json.dumps({"ok": result.ok, "message": result.message}))
+    else:
+        print(result.message)
+    return 0 if result.ok else 1
+
+
+def _update_vscode(args) -> int:
+    from services.dev_tools_service import DevToolsService
+
+    return _run_action(args, DevToolsService.update_vscode)
+
+
+def _install_python(args) -> int:
+    from services.dev_tools_service import DevToolsService
+
+    return _run_action(args, DevToolsService.install_pythons, args.versions, build_profile=args.profile)
+
+
+def _create_venv(args) -> int:
+    from services.dev_tools_service import DevToolsService
+
+    return _run_action(
+        args, DevToolsService.create_venv, args.path, args.python, install_requirements=args.install_requirements
+    )
+
+
+def _provision_venvs(args) -> int:
+    from services.dev_tools_service import DevToolsService
+
+    projects = [str(project) for project in DevToolsService.find_venv_projects(args.roots, args.depth)]
+    return _run_action(
+        args,
+        DevToolsService.provision_venvs,
+        projects,
+        args.python,
+        install_requirements=args.install_requirements,
+    )
+
+
+def _venvs(args) -> int:
+    import time
+    from dataclasses import asdict
+
+    from services.dev_tools_service import DevToolsService
+    from services.downloader import format_bytes
+
+    venvs = DevToolsService.scan_venvs(args.roots or None)
+    if args.delete_broken:
+        broken = [venv.path for venv in venvs if not venv.interpreter_exists]
+        if not broken:
+            print("No venvs with a missing interpreter.", file=sys.stderr)
+            return 0
+        return _run_action(args, DevToolsService.delete_venvs, broken)
+
+    keys = {"size": lambda venv: -venv.size_bytes, "used": lambda venv: venv.last_used, "path": lambda venv: venv.path}
+    venvs.sort(key=keys[args.sort])
+    if args.json:
+        print(json.dumps([asdict(venv) for venv in venvs]))
+        return 0
+    for venv in venvs:
+        used = time.strftime("%Y-%m-%d", time.localtime(venv.last_used))
+        status = "" if venv.interpreter_exists else "\tinterpreter missing"
+        print(f"{format_bytes(venv.size_bytes):>9}\t{used}\t{venv.version or '?'}\t{venv.path}{status}")
+    return 0
+
+
+def _list_pythons(args) -> int:
+    from services.dev_tools_service import DevToolsService
+
+    installations = DevToolsService.python_installations()
+    if args.json:
+        print(
+            json.dumps(
+                [
+                    {"version": version, "command": command, "version_output": version_output}
+                    for version, command, version_output in installations
+                ]
+            )
+        )
+    else:
+        for version, command, version_output in installations:
+            print(f"{version}\t{command}\t{version_output}")
+    return 0
+
+
+def _info(args) -> int:
+    from services.dev_tools_service import DevToolsService
+
+    if args.json:
+        print(json.dumps(DevToolsService.refresh_system_info()))
+    else:
+        print(DevToolsService.system_info())
+    return 0
+
+
+def _gui(args) -> int:
+    from PyQt6.QtWidgets import QApplication
+
+    from ui.main_window import MainWindow
+
+    app = QApplication(sys.argv[:1])
+    window = MainWindow()
+    window.show()
+    return app.exec()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from services.build_profiles import BUILD_PROFILES, DEFAULT_BUILD_PROFILE
+
+    parser = argparse.ArgumentParser(prog="dev-tools", description="Python and VSCode development tools")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON on stdout")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the output of the commands being run")
+    parser.add_argument("--trace", metavar="FILE", help="Append a JSON-lines span trace of the operation to FILE")
+    parser.add_argument(
+        "--metrics", metavar="FILE", help="Update span totals in FILE for the node_exporter textfile collector"
+    )
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    gui = commands.add_parser("gui", help="Open the graphical interface (default)")
+    gui.set_defaults(handler=_gui)
+
+    update = commands.add_parser("update-vscode", help="Install or update VSCode in /opt/vscode")
+    update.set_defaults(handler=_update_vscode)
+
+    install = commands.add_parser("install-python", help="Install one or more Python versions (X.Y)")
+    install.add_argument("versions", nargs="+", metavar="version")
+    install.add_argument(
+        "--profile", default=DEFAULT_BUILD_PROFILE, choices=list(BUILD_PROFILES), help="Build profile for source builds"
+    )
+    install.set_defaults(handler=_install_python)
+
+    venv = commands.add_parser("create-venv", help="Create a virtual environment in a directory")
+    venv.add_argument("path")
+    venv.add_argument("--python", default="3", help="Python version to use (default: python3)")
+    venv.add_argument(
+        "--install-requirements", action="store_true", help="Also install requirements.txt from the shared wheelhouse"
+    )
+    venv.set_defaults(handler=_create_venv)
+
+    provision = commands.add_parser(
+        "provision-venvs", help="Create venvs for every project without one under the given directories"
+    )
+    provision.add_argument("roots", nargs="+", help="Project directories or roots to search")
+    provision.add_argument("--python", default="3", help="Python version to use (default: python3)")
+    provision.add_argument("--depth", type=int, default=4, help="How many levels below each root to search")
+    provision.add_argument(
+        "--install-requirements", action="store_true", help="Also install requirements.txt from the shared wheelhouse"
+    )
+    provision.set_defaults(handler=_provision_venvs)
+
+    venvs = commands.add_parser("venvs", help="List the virtual environments under the given (or last used) roots")
+    venvs.add_argument("roots", nargs="*", help="Directories to search (default: the previous ones, or home)")
+    venvs.add_argument("--sort", default="size", choices=["size", "used", "path"], help="Sort order (default: size)")
+    venvs.add_argument(
+        "--delete-broken", action="store_true", help="Delete the venvs whose interpreter no longer exists"
+    )
+    venvs.set_defaults(handler=_venvs)
+
+    pythons = commands.add_parser("list-pythons", help="List installed Python interpreters")
+    pythons.set_defaults(handler=_list_pythons)
+
+    info = commands.add_parser("info", help="Show system information")
+    info.set_defaults(handler=_info)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s: %(message)s")
+    if args.trace or args.metrics:
+        from services import tracing
+
+        tracing.configure(args.trace or tracing.TRACE_FILE, args.metrics or tracing.METRICS_FILE)
+    try:
+        return getattr(args, "handler", _gui)(args)
+    finally:
+        from services.dev_tools_service import DevToolsService
+
+        DevToolsService.close_privileged_session()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,7 @@ ICON_DEST="$HOME/.local/share/icons/dev-tools.png"
 DESKTOP_SRC="$PROJECT_DIR/dev-tools.desktop"
 DESKTOP_DEST="$HOME/.local/share/applications/dev-tools.desktop"
 LAUNCHER_PATH="$PROJECT_DIR/launcher.sh"
+CLI_DEST="$HOME/.local/bin/dev-tools"
 
 echo "Setting up Python virtual environment..."
 python3 -m venv "$PROJECT_DIR/.venv"
@@ -23,6 +24,10 @@ sed "s|^Exec=.*|Exec=$LAUNCHER_PATH|" "$DESKTOP_SRC" > "$DESKTOP_DEST"
 update-desktop-database "$HOME/.local/share/applications/"
 
 echo "Making launcher executable..."
-chmod +x "$PROJECT_DIR/launcher.sh"
+chmod +x "$PROJECT_DIR/launcher.sh" "$PROJECT_DIR/dev-tools"
+
+echo "Linking the dev-tools command..."
+mkdir -p "$(dirname "$CLI_DEST")"
+ln -sf "$PROJECT_DIR/dev-tools" "$CLI_DEST"
 
 echo "Installation completed! You can now find Dev Tools in your application menu."
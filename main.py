@@ -1,16 +1,7 @@
 import sys
 
-from PyQt6.QtWidgets import QApplication
-
-from ui.main_window import MainWindow
-
-
-def main():
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
-    sys.exit(app.exec())
-
+from cli import main
 
+# Without arguments this opens the GUI; PyQt6 is only imported by that command
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
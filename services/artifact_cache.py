@@ -0,0 +1,145 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from services import tracing
+from services.downloader import ChunkSink, Downloader, NotModified, ProgressCallback, read_chunks
+
+CACHE_FORMAT = 1
+DEFAULT_BUDGET = 2 * 1024**3
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactCache:
+    def __init__(self, root: Path, budget: int = DEFAULT_BUDGET, downloader: Optional[Downloader] = None):
+        self.root = Path(root)
+        self.budget = budget
+        self.downloader = downloader or Downloader()
+        self._index_file = self.root / "index.json"
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / "blobs" / sha256[:2] / sha256
+
+    def lookup(self, sha256: str) -> Optional[Path]:
+        path = self.blob_path(sha256.lower())
+        if not path.is_file():
+            return None
+        with self._locked_index() as index:
+            entry = index["blobs"].setdefault(sha256.lower(), {"size": path.stat().st_size})
+            entry["last_used"] = time.time()
+        return path
+
+    def fetch(
+        self,
+        url: str,
+        sha256: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        sink: Optional[ChunkSink] = None,
+    ) -> Path:
+        with tracing.span("artifact-cache.fetch", url=url) as span:
+            return self._fetch(url, sha256, progress, sink, span)
+
+    def _fetch(
+        self, url: str, sha256: Optional[str], progress: Optional[ProgressCallback], sink: Optional[ChunkSink], span
+    ) -> Path:
+        if sha256:
+            cached = self.lookup(sha256)
+            if cached:
+                logger.info(f"Artifact cache hit for {url} ({sha256[:12]})")
+                span.set(cache="hit")
+                return self._replay(cached, sink)
+
+        with self._locked_index() as index:
+            known = dict(index["urls"].get(url, {}))
+        if known and not self.blob_path(known["sha256"]).is_file():
+            known = {}
+        if sha256 and known.get("sha256") != sha256.lower():
+            known = {}
+
+        staging = self.root / "staging" / hashlib.sha256(url.encode()).hexdigest()
+        try:
+            result = self.downloader.download(
+                url,
+                staging,
+                sha256=sha256,
+                progress=progress,
+                etag=known.get("etag"),
+                last_modified=known.get("last_modified"),
+                sink=sink,
+            )
+        except NotModified:
+            logger.info(f"Artifact cache revalidated {url}")
+            span.set(cache="revalidated")
+            cached = self.lookup(known["sha256"])
+            return self._replay(cached, sink) if cached else self._fetch(url, sha256, progress, sink, span)
+
+        span.set(cache="miss")
+        blob = self.blob_path(result.sha256)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staging, blob)
+
+        with self._locked_index() as index:
+            index["urls"][url] = {
+                "sha256": result.sha256,
+                "etag": result.etag,
+                "last_modified": result.last_modified,
+            }
+            index["blobs"][result.sha256] = {"size": result.size, "last_used": time.time()}
+            self._evict(index, keep=result.sha256)
+        return blob
+
+    @staticmethod
+    def _replay(path: Path, sink: Optional[ChunkSink]) -> Path:
+        if sink:
+            for chunk in read_chunks(path):
+                sink(chunk)
+        return path
+
+    def _evict(self, index: dict, keep: str):
+        blobs = index["blobs"]
+        total = sum(entry["size"] for entry in blobs.values())
+        for sha256 in sorted(blobs, key=lambda key: blobs[key].get("last_used", 0)):
+            if total <= self.budget:
+                break
+            if sha256 == keep:
+                continue
+            self.blob_path(sha256).unlink(missing_ok=True)
+            total -= blobs.pop(sha256)["size"]
+            logger.info(f"Evicted artifact {sha256[:12]} from cache")
+
+        for url in [url for url, entry in index["urls"].items() if entry["sha256"] not in blobs]:
+            del index["urls"][url]
+
+    @contextmanager
+    def _locked_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                before = json.dumps(index, sort_keys=True)
+                yield index
+                if json.dumps(index, sort_keys=True) != before:
+                    tmp_file = self._index_file.with_suffix(f".{os.getpid()}.tmp")
+                    tmp_file.write_text(json.dumps(index, indent=1))
+                    os.replace(tmp_file, self._index_file)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_index(self) -> dict:
+        try:
+            index = json.loads(self._index_file.read_text())
+            if index.get("format") == CACHE_FORMAT:
+                return index
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable artifact cache index {self._index_file}: {e}")
+        return {"format": CACHE_FORMAT, "urls": {}, "blobs": {}}
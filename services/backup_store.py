@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import stat
+import sys
+import time
+from typing import Dict, List, Optional
+
+# Runs as root from update_vscode_root.sh through the system python3, so it must only use the standard library
+try:
+    from vscode_delta import build_manifest, load_manifest, save_manifest
+except ImportError:
+    from services.vscode_delta import build_manifest, load_manifest, save_manifest
+
+STORE_FORMAT = 1
+LEGACY_BACKUP_PATTERN = re.compile(r"^\d{8}_\d{6}$")
+
+
+class BackupStore:
+    # objects/ holds one hardlink per distinct (content, mode); snapshots only reference object keys,
+    # so files shared by several VSCode versions occupy disk space once
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.snapshots_dir = os.path.join(root, "snapshots")
+        self.index_file = os.path.join(root, "index.json")
+
+    def object_path(self, key: str) -> str:
+        return os.path.join(self.objects_dir, key[:2], key)
+
+    def snapshot_path(self, name: str) -> str:
+        return os.path.join(self.snapshots_dir, f"{name}.json")
+
+    def load_snapshot(self, name: str) -> dict:
+        with open(self.snapshot_path(name)) as f:
+            return json.load(f)
+
+    def snapshot_names(self) -> List[str]:
+        try:
+            return sorted(name[: -len(".json")] for name in os.listdir(self.snapshots_dir) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def snapshot(self, tree: str, name: str, manifest_cache: Optional[str] = None) -> dict:
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        base_name, suffix = name, 1
+        while os.path.exists(self.snapshot_path(name)):
+            name = f"{base_name}_{suffix}"
+            suffix += 1
+        inodes = self._object_inodes()
+        cached = load_manifest(manifest_cache) if manifest_cache else {}
+        manifest = build_manifest(tree, {**cached, **self._inode_manifest(tree, inodes)})
+
+        files, symlinks, dirs = {}, {}, {}
+        for dirpath, dirnames, filenames in os.walk(tree):
+            for name_ in dirnames + filenames:
+                path = os.path.join(dirpath, name_)
+                relpath = os.path.relpath(path, tree)
+                st = os.lstat(path)
+                if stat.S_ISLNK(st.st_mode):
+                    symlinks[relpath] = os.readlink(path)
+                elif stat.S_ISDIR(st.st_mode):
+                    dirs[relpath] = stat.S_IMODE(st.st_mode)
+                elif relpath in manifest:
+                    entry = manifest[relpath]
+                    key = f"{entry['sha256']}.{entry['mode']:o}"
+                    self._store_object(path, key)
+                    files[relpath] = {"object": key, "size": entry["size"]}
+
+        product = self._product_info(tree)
+        snapshot = {
+            "format": STORE_FORMAT,
+            "name": name,
+            "created": time.time(),
+            "version": product.get("version"),
+            "commit": product.get("commit"),
+            "files": files,
+            "symlinks": symlinks,
+            "dirs": dirs,
+        }
+        self._write_json(self.snapshot_path(name), snapshot)
+        self.reindex()
+        return snapshot
+
+    def restore(self, name: str, target: str, manifest_out: Optional[str] = None):
+        snapshot = self.load_snapshot(name)
+        os.makedirs(target)
+        for relpath in sorted(snapshot["dirs"]):
+            os.makedirs(os.path.join(target, relpath), exist_ok=True)
+
+        manifest = {}
+        for relpath, entry in snapshot["files"].items():
+            path = os.path.join(target, relpath)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.link(self.object_path(entry["object"]), path)
+            st = os.lstat(path)
+            sha256, mode = entry["object"].split(".")
+            manifest[relpath] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "ino": st.st_ino,
+                "mode": int(mode, 8),
+                "sha256": sha256,
+            }
+
+        for relpath, link_target in snapshot["symlinks"].items():
+            path = os.path.join(target, relpath)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.symlink(link_target, path)
+        for relpath, mode in sorted(snapshot["dirs"].items(), reverse=True):
+            os.chmod(os.path.join(target, relpath), mode)
+
+        # The restored files are the object inodes, so their hashes are already known to the next update
+        if manifest_out:
+            save_manifest(manifest_out, manifest)
+
+    def prune(self, keep: int, max_age_days: Optional[float] = None, max_bytes: Optional[int] = None) -> List[str]:
+        # The newest snapshot always survives; older ones go oldest first until every limit is met
+        names = self.snapshot_names()
+        removed = []
+        now = time.time()
+        while len(names) > 1:
+            oldest = names[0]
+            created = self.load_snapshot(oldest).get("created", 0)
+            too_many = len(names) > keep
+            too_old = max_age_days is not None and now - created > max_age_days * 86400
+            too_big = max_bytes is not None and self.reindex()["stored_bytes"] > max_bytes
+            if not (too_many or too_old or too_big):
+                break
+            os.unlink(self.snapshot_path(oldest))
+            removed.append(names.pop(0))
+            self._collect_garbage()
+        self.reindex()
+        return removed
+
+    def migrate_legacy(self, manifest_cache: Optional[str] = None) -> List[str]:
+        # Plain directory backups from earlier versions of the update script
+        migrated = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if LEGACY_BACKUP_PATTERN.match(name) and os.path.isdir(path) and not os.path.islink(path):
+                self.snapshot(path, name, manifest_cache)
+                shutil.rmtree(path)
+                migrated.append(name)
+        return migrated
+
+    def reindex(self) -> dict:
+        snapshots = {}
+        objects = set()
+        for name in self.snapshot_names():
+            snapshot = self.load_snapshot(name)
+            logical = 0
+            for entry in snapshot["files"].values():
+                objects.add(entry["object"])
+                logical += entry["size"]
+            snapshots[name] = {
+                "created": snapshot.get("created"),
+                "version": snapshot.get("version"),
+                "commit": snapshot.get("commit"),
+                "files": len(snapshot["files"]),
+                "logical_bytes": logical,
+            }
+
+        # Objects are hardlinks of the trees they came from: one still linked elsewhere (the live VSCode tree)
+        # costs nothing extra and is never freed by pruning, so only objects the store alone holds count as stored
+        stored: Dict[tuple, int] = {}
+        shared: Dict[tuple, int] = {}
+        for key in objects:
+            try:
+                st = os.lstat(self.object_path(key))
+            except FileNotFoundError:
+                continue
+            (stored if st.st_nlink == 1 else shared)[(st.st_dev, st.st_ino)] = st.st_size
+
+        index = {
+            "format": STORE_FORMAT,
+            "snapshots": snapshots,
+            "objects": len(objects),
+            "stored_bytes": sum(stored.values()),
+            "shared_bytes": sum(shared.values()),
+            "logical_bytes": sum(snapshot["logical_bytes"] for snapshot in snapshots.values()),
+        }
+        self._write_json(self.index_file, index)
+        return index
+
+    def _store_object(self, path: str, key: str):
+        object_path = self.object_path(key)
+        if os.path.exists(object_path):
+            return
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        try:
+            os.link(path, object_path)
+        except OSError:
+            # Different filesystem: fall back to a plain copy
+            tmp_path = f"{object_path}.{os.getpid()}.tmp"
+            shutil.copy2(path, tmp_path)
+            os.replace(tmp_path, object_path)
+
+    def _collect_garbage(self):
+        referenced = set()
+        for name in self.snapshot_names():
+            referenced.update(entry["object"] for entry in self.load_snapshot(name)["files"].values())
+        if not os.path.isdir(self.objects_dir):
+            return
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for key in os.listdir(prefix_dir):
+                if key not in referenced:
+                    os.unlink(os.path.join(prefix_dir, key))
+
+    def _object_inodes(self) -> Dict[int, str]:
+        inodes = {}
+        if os.path.isdir(self.objects_dir):
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                for key in os.listdir(prefix_dir):
+                    inodes[os.lstat(os.path.join(prefix_dir, key)).st_ino] = key
+        return inodes
+
+    @staticmethod
+    def _inode_manifest(tree: str, inodes: Dict[int, str]) -> Dict[str, dict]:
+        # Files that are already hardlinks of an object need no hashing at all
+        manifest = {}
+        for dirpath, _, filenames in os.walk(tree):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                st = os.lstat(path)
+                key = inodes.get(st.st_ino)
+                if key and stat.S_ISREG(st.st_mode):
+                    manifest[os.path.relpath(path, tree)] = {
+                        "size": st.st_size,
+                        "mtime_ns": st.st_mtime_ns,
+                        "ino": st.st_ino,
+                        "sha256": key.split(".")[0],
+                    }
+        return manifest
+
+    @staticmethod
+    def _product_info(tree: str) -> dict:
+        info = {}
+        for name, keys in (("package.json", ("version",)), ("product.json", ("commit",))):
+            try:
+                with open(os.path.join(tree, "resources", "app", name)) as f:
+                    data = json.load(f)
+                info.update({key: data.get(key) for key in keys})
+            except (OSError, ValueError):
+                pass
+        return info
+
+    @staticmethod
+    def _write_json(path: str, data: dict):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+
+def read_index(root: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(root, "index.json")) as f:
+            index = json.load(f)
+        return index if index.get("format") == STORE_FORMAT else None
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Deduplicated VSCode backup store")
+    parser.add_argument("store", help="Backup store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", help="Store a VSCode tree as a named snapshot")
+    snapshot.add_argument("tree")
+    snapshot.add_argument("name")
+    snapshot.add_argument("--manifest", help="Hash manifest to reuse for unchanged files")
+
+    restore = commands.add_parser("restore", help="Hardlink a snapshot into a new directory")
+    restore.add_argument("name")
+    restore.add_argument("target")
+    restore.add_argument("--manifest", help="Write the restored tree's hash manifest here")
+
+    prune = commands.add_parser("prune", help="Apply retention limits and drop unreferenced objects")
+    prune.add_argument("--keep", type=int, default=3)
+    prune.add_argument("--max-age-days", type=float)
+    prune.add_argument("--max-bytes", type=int)
+
+    commands.add_parser("list", help="Print the store index as JSON")
+
+    args = parser.parse_args(argv)
+    store = BackupStore(args.store)
+
+    if args.command == "snapshot":
+        os.makedirs(args.store, exist_ok=True)
+        migrated = store.migrate_legacy(args.manifest)
+        if migrated:
+            print(f"BACKUP: migrated {len(migrated)} legacy backups")
+        snapshot = store.snapshot(args.tree, args.name, args.manifest)
+        print(f"BACKUP: stored snapshot {snapshot['name']}")
+    elif args.command == "restore":
+        store.restore(args.name, args.target, args.manifest)
+    elif args.command == "prune":
+        for name in store.prune(args.keep, args.max_age_days, args.max_bytes):
+            print(f"BACKUP: removed snapshot {name}")
+    elif args.command == "list":
+        print(json.dumps(store.reindex(), indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
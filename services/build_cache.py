@@ -0,0 +1,214 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import platform
+import re
+import stat
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.downloader import DOWNLOAD_TIMEOUT, USER_AGENT
+
+PYTHON_FTP_URL = "https://www.python.org/ftp/python/"
+CACHE_FORMAT = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def _command_output(cmd: List[str]) -> str:
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, stdin=subprocess.DEVNULL, check=False)
+        return (result.stdout or result.stderr).strip().splitlines()[0] if result.returncode == 0 else ""
+    except (OSError, IndexError):
+        return ""
+
+
+def toolchain_fingerprint(compiler: Optional[str] = None) -> dict:
+    # Everything that decides whether a build from one host runs on another: compiler, libc,
+    # distribution (for the shared libraries CPython links against) and architecture
+    compiler = compiler or os.environ.get("CC", "cc")
+    os_release = {}
+    try:
+        for line in Path("/etc/os-release").read_text().splitlines():
+            key, _, value = line.partition("=")
+            os_release[key] = value.strip('"')
+    except OSError:
+        pass
+
+    return {
+        "machine": platform.machine(),
+        "libc": " ".join(platform.libc_ver()),
+        "distro": f"{os_release.get('ID', '')} {os_release.get('VERSION_ID', '')}".strip(),
+        "compiler": _command_output(compiler.split() + ["--version"]),
+        "openssl": _command_output(["openssl", "version"]),
+    }
+
+
+def file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def owned_safely(path: Path) -> bool:
+    # Archives from the cache end up extracted as root: nobody but the user (or root) may be able to change them
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (
+        not stat.S_ISLNK(st.st_mode)
+        and st.st_uid in (os.getuid(), 0)
+        and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    )
+
+
+def _replace_file(path: Path, text: str, mode: int):
+    # A temporary name of its own per writer: threads of one process share the pid
+    fd, tmp_file = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.chmod(tmp_file, mode)
+        os.replace(tmp_file, path)
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
+
+
+def resolve_python_release(version: str) -> str:
+    # python.org publishes sources under full X.Y.Z directories; pick the newest final release of X.Y
+    if re.match(r"^\d+\.\d+\.\d+$", version):
+        return version
+
+    import urllib.error
+    import urllib.request
+
+    try:
+        request = urllib.request.Request(PYTHON_FTP_URL, headers={"User-Agent": USER_AGENT})
+        with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+            listing = response.read().decode("utf-8", errors="replace")
+    except (urllib.error.URLError, OSError) as e:
+        logger.warning(f"Could not list Python releases, using {version} as-is: {e}")
+        return version
+
+    pattern = re.compile(rf'href="({re.escape(version)}\.(\d+))/"')
+    candidates = sorted({(int(patch), release) for release, patch in pattern.findall(listing)}, reverse=True)
+    for _, release in candidates:
+        tarball = f"{PYTHON_FTP_URL}{release}/Python-{release}.tar.xz"
+        try:
+            head = urllib.request.Request(tarball, method="HEAD", headers={"User-Agent": USER_AGENT})
+            with urllib.request.urlopen(head, timeout=DOWNLOAD_TIMEOUT):
+                return release
+        except (urllib.error.URLError, OSError):
+            # Directories of upcoming releases only hold release candidates
+            continue
+    return version
+
+
+class BuildCache:
+    # Finished install trees (the DESTDIR of `make altinstall`) archived by a key over the release,
+    # configure flags and toolchain, so a shared directory serves every compatible host. Only archives whose
+    # digest is in the user-private digests_file are handed out; one built by another host is checked against
+    # the digest stored next to it once, then recorded there
+    def __init__(self, root: Path, digests_file: Path):
+        self.root = Path(root)
+        self.digests_file = Path(digests_file)
+
+    def trusted(self) -> bool:
+        # A directory that does not exist yet is created by store() with safe permissions
+        return not os.path.lexists(self.root) or (self.root.is_dir() and owned_safely(self.root))
+
+    @staticmethod
+    def key(release: str, configure_args: List[str], fingerprint: dict) -> str:
+        material = json.dumps(
+            {"format": CACHE_FORMAT, "release": release, "configure": configure_args, "toolchain": fingerprint},
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+    def archive_path(self, key: str) -> Path:
+        return self.root / f"{key}.tar.gz"
+
+    def metadata_path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        archive = self.archive_path(key)
+        if not archive.is_file() or not self.trusted() or not owned_safely(archive):
+            return None
+        if key not in self._digests():
+            try:
+                expected = json.loads(self.metadata_path(key).read_text()).get("sha256")
+                if not expected or not owned_safely(self.metadata_path(key)) or file_sha256(archive) != expected:
+                    logger.warning(f"Ignoring cached build {archive}: its digest does not match")
+                    return None
+            except (OSError, ValueError, AttributeError):
+                return None
+            self._record_digest(key, expected)
+        try:
+            os.utime(archive)
+        except OSError:
+            pass
+        return archive
+
+    def digest(self, key: str) -> Optional[str]:
+        return self._digests().get(key)
+
+    def store(self, key: str, destdir: Path, metadata: dict) -> Path:
+        if not os.path.lexists(self.root):
+            self.root.mkdir(parents=True)
+            self.root.chmod(0o755)
+        if not self.trusted():
+            raise PermissionError(f"Build cache {self.root} is writable by other users")
+        archive = self.archive_path(key)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{archive.name}.", suffix=".tmp", dir=self.root)
+        os.close(fd)
+        tmp_archive = Path(tmp_name)
+        roots = sorted(entry.name for entry in destdir.iterdir())
+        try:
+            subprocess.run(
+                ["tar", "-czf", str(tmp_archive), "--owner=0", "--group=0", "--numeric-owner", "-C", str(destdir)]
+                + roots,
+                check=True,
+                capture_output=True,
+            )
+            tmp_archive.chmod(0o644)
+            digest = file_sha256(tmp_archive)
+            # Renames are atomic on a shared cache directory, so other hosts never see a partial archive
+            os.replace(tmp_archive, archive)
+        finally:
+            tmp_archive.unlink(missing_ok=True)
+
+        metadata = dict(metadata, created=time.time(), size=archive.stat().st_size, sha256=digest)
+        _replace_file(self.metadata_path(key), json.dumps(metadata, indent=1), 0o644)
+        self._record_digest(key, digest)
+        return archive
+
+    def _digests(self) -> Dict[str, str]:
+        try:
+            if not owned_safely(self.digests_file):
+                return {}
+            return json.loads(self.digests_file.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _record_digest(self, key: str, digest: str):
+        # Parallel lookups and stores, of this and other processes, each add their key to the same index
+        self.digests_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.digests_file.with_name(self.digests_file.name + ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                digests = self._digests()
+                digests[key] = digest
+                _replace_file(self.digests_file, json.dumps(digests), 0o600)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
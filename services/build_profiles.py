@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import platform
+import re
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services import tracing
+from services.command_runner import stream_command
+from services.system_probes import read_meminfo
+
+# Compiler invocations in CPython's make output end with "-o <object>.o"
+COMPILE_PATTERN = re.compile(r"\s-o\s+\S+\.o(\s|$)")
+SOURCE_DIRS = ("Objects", "Python", "Parser", "Modules")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BuildProfile:
+    name: str
+    description: str
+    configure_args: List[str]
+    # Rough peak memory of one compiler job; LTO link steps need several times more
+    memory_per_job_mb: int
+    pgo: bool = False
+
+
+BUILD_PROFILES: Dict[str, BuildProfile] = {
+    profile.name: profile
+    for profile in (
+        BuildProfile("fast", "No optimizations, quickest build", ["--with-ensurepip=install"], 300),
+        BuildProfile("debug", "Debug build with assertions", ["--with-pydebug", "--with-ensurepip=install"], 300),
+        BuildProfile(
+            "optimized",
+            "Profile-guided optimization",
+            ["--enable-optimizations", "--with-ensurepip=install"],
+            500,
+            True,
+        ),
+        BuildProfile(
+            "full",
+            "Profile-guided and link-time optimization",
+            ["--enable-optimizations", "--with-lto", "--with-ensurepip=install"],
+            1500,
+            True,
+        ),
+    )
+}
+DEFAULT_BUILD_PROFILE = "optimized"
+
+
+@dataclass
+class PhaseResult:
+    name: str
+    command: List[str]
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_kb: int
+    returncode: int
+    objects: int = 0
+    output_tail: str = ""
+
+
+@dataclass
+class BuildRecord:
+    release: str
+    profile: str
+    jobs: int
+    host: str = field(default_factory=platform.node)
+    cpus: int = field(default_factory=lambda: os.cpu_count() or 1)
+    memory_total_mb: int = field(default_factory=lambda: read_meminfo().get("MemTotal", 0) // 1024)
+    started: float = field(default_factory=time.time)
+    phases: List[PhaseResult] = field(default_factory=list)
+
+
+def plan_jobs(profile: BuildProfile) -> Tuple[int, int]:
+    # Returns (make -j, make -l): no more jobs than idle CPUs or than available memory can hold,
+    # and make itself stops spawning while the load average stays above the CPU count
+    cpus = os.cpu_count() or 1
+    try:
+        load = os.getloadavg()[0]
+    except OSError:
+        load = 0.0
+    idle_cpus = max(1, cpus - int(load))
+
+    available_mb = read_meminfo().get("MemAvailable", 0) // 1024
+    memory_jobs = max(1, available_mb // profile.memory_per_job_mb) if available_mb else cpus
+
+    return max(1, min(idle_cpus, memory_jobs)), cpus
+
+
+def build_phases(profile: BuildProfile, jobs: int, load_limit: int, destdir: Path) -> List[Tuple[str, List[str]]]:
+    make = ["make", f"-j{jobs}", f"-l{load_limit}"]
+    phases = [("configure", ["./configure", *profile.configure_args])]
+    if profile.pgo:
+        # Splits CPython's profile-opt target so instrumented build, training run and final build are timed apart
+        phases += [
+            ("compile-instrumented", make + ["profile-gen-stamp"]),
+            ("profile-run", make + ["profile-run-stamp"]),
+            ("compile", make),
+        ]
+    else:
+        phases.append(("compile", make))
+    return phases + [("install", ["make", "altinstall", f"DESTDIR={destdir}"])]
+
+
+def expected_objects(records: List[dict], profile: BuildProfile, phase: str, build_dir: Path) -> int:
+    # The object count of the last successful run of this phase, or the number of C sources as a first guess
+    for record in reversed(records):
+        if record.get("profile") != profile.name:
+            continue
+        for result in record.get("phases", []):
+            if result.get("name") == phase and result.get("returncode") == 0 and result.get("objects"):
+                return result["objects"]
+    return max(1, sum(len(list((build_dir / name).rglob("*.c"))) for name in SOURCE_DIRS))
+
+
+def run_phase(
+    name: str, cmd: List[str], on_object: Optional[Callable[[int], None]] = None, **kwargs
+) -> PhaseResult:
+    objects = 0
+
+    def count_objects(line: str):
+        nonlocal objects
+        if COMPILE_PATTERN.search(line):
+            objects += 1
+            if on_object:
+                on_object(objects)
+
+    with tracing.span(f"python.{name}") as span:
+        streamed = stream_command(cmd, on_line=count_objects, merge_stderr=True, stdin=subprocess.DEVNULL, **kwargs)
+        span.set(objects=objects)
+    result = PhaseResult(
+        name,
+        cmd,
+        streamed.wall_seconds,
+        streamed.cpu_seconds,
+        streamed.peak_rss_kb,
+        streamed.returncode,
+        objects,
+    )
+    if streamed.returncode != 0:
+        result.output_tail = "\n".join(list(streamed.stdout_tail)[-40:])
+    return result
+
+
+def save_build_record(stats_file: Path, record: BuildRecord):
+    try:
+        stats_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(stats_file, "a") as f:
+            f.write(json.dumps(asdict(record)) + "\n")
+    except OSError as e:
+        logger.warning(f"Could not save build statistics to {stats_file}: {e}")
+
+
+def load_build_records(stats_file: Path) -> List[dict]:
+    records = []
+    try:
+        with open(stats_file) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return records
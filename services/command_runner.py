@@ -0,0 +1,268 @@
+import codecs
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Deque, List, Optional, Set
+
+from services import tracing
+
+OUTPUT_TAIL_LINES = 2000
+MAX_LINE_LENGTH = 8192
+READ_SIZE = 64 * 1024
+# Lines are handed to listeners at most this often, so a compiler flood becomes a few batches per second
+FLUSH_INTERVAL = 0.1
+# Time a cancelled process group gets between SIGTERM and SIGKILL
+KILL_GRACE = 5.0
+
+LineCallback = Callable[[str], None]
+OutputListener = Callable[[List[str]], None]
+
+_context = threading.local()
+
+
+class JobCancelled(BaseException):
+    # A BaseException, so the broad `except Exception` fallbacks in the services let it through
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._groups: Set[int] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def process_groups(self) -> Set[int]:
+        with self._lock:
+            return set(self._groups)
+
+    def check(self):
+        if self._event.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        # Safe to call from any thread: terminates every process group started under this token
+        self._event.set()
+        with self._lock:
+            groups = set(self._groups)
+        for pgid in groups:
+            self._signal(pgid, signal.SIGTERM)
+        if groups:
+            timer = threading.Timer(KILL_GRACE, self._kill, args=(groups,))
+            timer.daemon = True
+            timer.start()
+
+    def _register(self, pgid: int):
+        with self._lock:
+            self._groups.add(pgid)
+        if self._event.is_set():
+            self._signal(pgid, signal.SIGTERM)
+
+    def _unregister(self, pgid: int):
+        with self._lock:
+            self._groups.discard(pgid)
+
+    def _kill(self, groups: Set[int]):
+        with self._lock:
+            alive = groups & self._groups
+        for pgid in alive:
+            self._signal(pgid, signal.SIGKILL)
+
+    @staticmethod
+    def _signal(pgid: int, signum: int):
+        try:
+            os.killpg(pgid, signum)
+        except (ProcessLookupError, PermissionError):
+            # Already gone, or a privileged child (sudo relays the signal to its command)
+            pass
+
+
+@contextmanager
+def forward_output(listener: OutputListener):
+    # Every command streamed by this thread inside the block also sends its output lines to listener
+    previous = getattr(_context, "listener", None)
+    _context.listener = listener
+    try:
+        yield
+    finally:
+        _context.listener = previous
+
+
+@contextmanager
+def cancellable(token: CancelToken):
+    # Commands streamed by this thread inside the block run in their own process group so that
+    # token.cancel() can terminate the whole tree; they raise JobCancelled once it has been cancelled
+    previous = getattr(_context, "token", None)
+    _context.token = token
+    try:
+        yield
+    finally:
+        _context.token = previous
+
+
+def bind_context(func: Callable, prefix: str = "") -> Callable:
+    # Carries this thread's output listener and cancel token into work handed to a thread pool;
+    # prefix tags the forwarded lines when several commands write to the same listener
+    listener: Optional[OutputListener] = getattr(_context, "listener", None)
+    token: Optional[CancelToken] = getattr(_context, "token", None)
+    parent_span = tracing.current_span()
+    if listener and prefix:
+        parent = listener
+
+        def listener(lines: List[str]):
+            parent([f"{prefix}{line}" for line in lines])
+
+    def run(*args, **kwargs):
+        with forward_output(listener), cancellable(token), tracing.activate(parent_span):
+            return func(*args, **kwargs)
+
+    return run
+
+
+def check_cancelled():
+    token: Optional[CancelToken] = getattr(_context, "token", None)
+    if token:
+        token.check()
+
+
+def is_cancelled() -> bool:
+    token: Optional[CancelToken] = getattr(_context, "token", None)
+    return bool(token and token.cancelled)
+
+
+def emit_output(lines: List[str]):
+    # For output that does not come from stream_command, such as the privileged helper's
+    listener: Optional[OutputListener] = getattr(_context, "listener", None)
+    if listener:
+        listener(lines)
+
+
+@dataclass
+class StreamResult:
+    args: List[str]
+    returncode: int
+    stdout_tail: Deque[str] = field(default_factory=deque)
+    stderr_tail: Deque[str] = field(default_factory=deque)
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_kb: int = 0
+
+    @property
+    def stdout(self) -> str:
+        return "".join(f"{line}\n" for line in self.stdout_tail)
+
+    @property
+    def stderr(self) -> str:
+        return "".join(f"{line}\n" for line in self.stderr_tail)
+
+
+class _LineSplitter:
+    def __init__(self, tail: Deque[str]):
+        self.tail = tail
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.pending = ""
+
+    def feed(self, data: bytes) -> List[str]:
+        text = self.pending + self.decoder.decode(data, final=not data)
+        lines = text.splitlines(keepends=True)
+        self.pending = ""
+        # A trailing bare \r may be the first half of \r\n; progress bars also redraw with \r
+        if data and lines and (not lines[-1].endswith(("\n", "\r")) or lines[-1].endswith("\r")):
+            self.pending = lines.pop()
+            if len(self.pending) > MAX_LINE_LENGTH:
+                lines.append(self.pending)
+                self.pending = ""
+        lines = [line.rstrip("\r\n") for line in lines]
+        self.tail.extend(lines)
+        return lines
+
+
+def stream_command(
+    cmd: List[str],
+    on_line: Optional[LineCallback] = None,
+    tail_lines: int = OUTPUT_TAIL_LINES,
+    merge_stderr: bool = False,
+    **kwargs,
+) -> StreamResult:
+    # Reads stdout and stderr as they are produced and keeps only the last tail_lines of each, so a
+    # verbose build costs constant memory; the process is reaped with wait4 to report its resource usage
+    with tracing.span(f"exec.{os.path.basename(str(cmd[0]))}") as span:
+        result = _stream_command(cmd, on_line, tail_lines, merge_stderr, **kwargs)
+        span.record_process(result.returncode, result.cpu_seconds, result.peak_rss_kb)
+        return result
+
+
+def _stream_command(
+    cmd: List[str], on_line: Optional[LineCallback], tail_lines: int, merge_stderr: bool, **kwargs
+) -> StreamResult:
+    listener: Optional[OutputListener] = getattr(_context, "listener", None)
+    token: Optional[CancelToken] = getattr(_context, "token", None)
+    if token:
+        token.check()
+        kwargs.setdefault("start_new_session", True)
+    stderr = subprocess.STDOUT if merge_stderr else subprocess.PIPE
+    started = time.monotonic()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, **kwargs)
+    if token:
+        token._register(process.pid)
+
+    result = StreamResult(list(map(str, cmd)), -1, deque(maxlen=tail_lines), deque(maxlen=tail_lines))
+    selector = selectors.DefaultSelector()
+    selector.register(process.stdout, selectors.EVENT_READ, _LineSplitter(result.stdout_tail))
+    if process.stderr:
+        selector.register(process.stderr, selectors.EVENT_READ, _LineSplitter(result.stderr_tail))
+
+    batch: List[str] = []
+    last_flush = time.monotonic()
+    try:
+        while selector.get_map():
+            for key, _ in selector.select(timeout=FLUSH_INTERVAL):
+                data = os.read(key.fd, READ_SIZE)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                lines = key.data.feed(data)
+                if on_line:
+                    for line in lines:
+                        on_line(line)
+                if listener:
+                    batch.extend(lines)
+            if batch and time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                listener(batch)
+                batch = []
+                last_flush = time.monotonic()
+    except BaseException:
+        process.kill()
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        process.wait()
+        if token:
+            token._signal(process.pid, signal.SIGKILL)
+            token._unregister(process.pid)
+        raise
+    finally:
+        selector.close()
+        if batch:
+            listener(batch)
+
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    finally:
+        if token:
+            token._unregister(process.pid)
+    process.returncode = result.returncode = os.waitstatus_to_exitcode(status)
+    result.wall_seconds = time.monotonic() - started
+    result.cpu_seconds = usage.ru_utime + usage.ru_stime
+    result.peak_rss_kb = usage.ru_maxrss
+    if token:
+        token.check()
+    return result
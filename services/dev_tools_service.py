@@ -1,16 +1,76 @@
+import json
 import logging
 import os
 import re
 import shutil
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Callable, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services import tracing
+from services.artifact_cache import ArtifactCache
+from services.backup_store import read_index
+from services.build_cache import BuildCache, resolve_python_release, toolchain_fingerprint
+from services.build_profiles import (
+    BUILD_PROFILES,
+    DEFAULT_BUILD_PROFILE,
+    BuildProfile,
+    BuildRecord,
+    build_phases,
+    expected_objects,
+    load_build_records,
+    plan_jobs,
+    run_phase,
+    save_build_record,
+)
+from services.command_runner import bind_context, check_cancelled, stream_command
+from services.downloader import DownloadError, ProgressCallback, fetch_json, format_bytes, format_eta
+from services.package_managers import PackageManager, PackageManagerError, detect_package_manager
+from services.privileged_session import PrivilegedError, PrivilegedSession
+from services.python_registry import InterpreterIndex, InterpreterRegistry
+from services.task_graph import PRIVILEGED, DependencyFailed, TaskGraph
+from services.system_probes import is_rotational, probe_disk, probe_memory, probe_system, probe_vscode
+from services.venv_inventory import VenvInfo, VenvInventory, delete_venv
+from services.venv_templates import VenvTemplateCache
+from services.wheelhouse import Wheelhouse, WheelhouseError
 
 VENV_NAME = ".venv"
 TEMP_DIR = Path("/tmp/dev-tools")
-BACKUP_DIR = Path("/opt/vscode-backup")
-VSCODE_PATH = Path("/opt/vscode")
+BACKUP_DIR = Path(os.environ.get("DEV_TOOLS_VSCODE_BACKUP_DIR") or "/opt/vscode-backup")
+# Command that runs the privileged helper as root; empty runs it as the current user (already root, or testing)
+PRIVILEGE_LAUNCHER = os.environ.get("DEV_TOOLS_PRIVILEGE_LAUNCHER", "pkexec").split()
+# 0 goes back to one authorization per privileged action
+PRIVILEGED_SESSION = os.environ.get("DEV_TOOLS_PRIVILEGED_SESSION", "1") != "0"
+# Only a helper started without a launcher (DEV_TOOLS_PRIVILEGE_LAUNCHER empty) updates another VSCode tree
+VSCODE_PATH = Path(os.environ.get("DEV_TOOLS_VSCODE_PATH") or "/opt/vscode")
 VSCODE_DOWNLOAD_URL = "https://code.visualstudio.com/sha/download?build=stable&os=linux-x64"
+VSCODE_UPDATE_API = "https://update.code.visualstudio.com/api/update/linux-x64/stable/latest"
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "dev-tools"
+ARTIFACT_CACHE_DIR = CACHE_DIR / "artifacts"
+ARTIFACT_CACHE_BUDGET = 2 * 1024**3
+PRIVATE_BUILD_CACHE_DIR = CACHE_DIR / "python-builds"
+# Point this at a shared directory (e.g. NFS) to reuse CPython builds across hosts; it must be owned by the user or
+# root and not writable by anyone else, since its archives get installed as root
+PYTHON_BUILD_CACHE_DIR = Path(os.environ.get("DEV_TOOLS_BUILD_CACHE") or PRIVATE_BUILD_CACHE_DIR)
+# Digests of the build archives this user stored or verified; never kept in the (possibly shared) cache itself
+PYTHON_BUILD_DIGESTS_FILE = CACHE_DIR / "python-build-digests.json"
+PYTHON_BUILD_STATS_FILE = CACHE_DIR / "python-build-stats.jsonl"
+VENV_TEMPLATE_DIR = CACHE_DIR / "venv-templates"
+VENV_INDEX_FILE = CACHE_DIR / "venv-index.json"
+PACKAGE_CACHE_FILE = CACHE_DIR / "packages.json"
+# Wheels shared by every venv; kept on the same filesystem as the projects, installed files get hardlinked
+WHEELHOUSE_DIR = Path(os.environ.get("DEV_TOOLS_WHEELHOUSE") or CACHE_DIR / "wheelhouse")
+PROJECT_MARKERS = {"requirements.txt", "pyproject.toml", "setup.py", "setup.cfg"}
+PROJECT_SEARCH_SKIP = {"node_modules", "venv", "site-packages", "__pycache__", "build", "dist"}
+PROJECT_SEARCH_DEPTH = 4
+BATCH_VENV_JOBS_SSD = 8
+BATCH_VENV_JOBS_HDD = 2
+SYSTEM_INFO_CACHE_FILE = CACHE_DIR / "system-info.json"
+SYSTEM_INFO_CACHE_FORMAT = 1
 
 logger = logging.getLogger(__name__)
 
@@ -19,227 +79,514 @@ class SystemCommandError(Exception):
     pass
 
 
+@dataclass
+class ActionResult:
+    # What a user-facing action returns: whether it succeeded, and the message to show (its str())
+    ok: bool
+    message: str
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class _HeldBackPipe:
+    # Holds the last chunk back until the download is verified; closing the pipe without
+    # it truncates the gzip stream, which makes the extracting side abort
+    def __init__(self, stream):
+        self._stream = stream
+        self._held: Optional[bytes] = None
+
+    def write(self, chunk: memoryview):
+        try:
+            if self._held is not None:
+                self._stream.write(self._held)
+        except BrokenPipeError as e:
+            raise DownloadError("Update process exited before the download finished") from e
+        self._held = bytes(chunk)
+
+    def flush(self):
+        if self._held is not None:
+            try:
+                self._stream.write(self._held)
+            except BrokenPipeError as e:
+                raise DownloadError("Update process exited before the download finished") from e
+            self._held = None
+
+    def close(self):
+        try:
+            self._stream.close()
+        except BrokenPipeError:
+            pass
+
+
+class _VersionProgress:
+    # Folds the progress of several versions into one callback: their mean, and one status line per version
+    def __init__(self, versions: List[str], callback: Optional[Callable[[int, str], None]]):
+        self._callback = callback
+        self._states = {version: (0, "Waiting...") for version in versions}
+        self._lock = threading.Lock()
+
+    def __call__(self, version: str) -> Callable[[int, str], None]:
+        def report(value: int, message: str):
+            with self._lock:
+                self._states[version] = (value, message)
+                if not self._callback:
+                    return
+                total = sum(value for value, _ in self._states.values()) // len(self._states)
+                lines = [f"Python {name}: {value}% {message}" for name, (value, message) in self._states.items()]
+                # 100 means every version succeeded, which only the caller knows
+                self._callback(min(total, 99), "\n".join(lines))
+
+        return report
+
+
 class DevToolsService:
     PYTHON_PATHS = ["/usr/bin", "/usr/local/bin", "/opt/homebrew/bin", os.path.expanduser("~/.local/bin")]
 
     @staticmethod
     def _run_command(cmd: List[str], check: bool = True, **kwargs) -> subprocess.CompletedProcess:
         try:
-            result = subprocess.run(cmd, check=check, capture_output=True, text=True, **kwargs)
-            return result
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Command failed: {e.cmd}, error: {e.stderr}")
-            raise SystemCommandError(f"Command '{e.cmd}' failed: {e.stderr}") from e
+            streamed = stream_command(cmd, **kwargs)
         except FileNotFoundError as e:
             logger.error(f"Command not found: {cmd[0]}")
             raise SystemCommandError(f"Command '{cmd[0]}' not found") from e
 
-    @staticmethod
-    def _find_python_executables() -> List[Path]:
-        python_patterns = ["python*", "python3*"]
-        executables = []
+        result = subprocess.CompletedProcess(cmd, streamed.returncode, streamed.stdout, streamed.stderr)
+        if check and result.returncode != 0:
+            logger.error(f"Command failed: {cmd}, error: {result.stderr}")
+            raise SystemCommandError(f"Command '{cmd}' failed: {result.stderr}")
+        return result
 
-        for path in DevToolsService.PYTHON_PATHS:
-            if not os.path.isdir(path):
-                continue
-            try:
-                for pattern in python_patterns:
-                    for file_path in Path(path).glob(pattern):
-                        if file_path.is_file() and os.access(file_path, os.X_OK):
-                            real_path = file_path.resolve()
-                            if real_path not in executables:
-                                executables.append(real_path)
-            except OSError:
-                continue
+    _registry: Optional[InterpreterRegistry] = None
+    _package_manager_instance: Optional[PackageManager] = None
+    _package_manager_detected = False
+    _privileged_session: Optional[PrivilegedSession] = None
+    # install_pythons resolves and stores several builds at once; cache calls are serialized
+    _build_cache_lock = threading.Lock()
+
+    @staticmethod
+    def _interpreter_index() -> InterpreterIndex:
+        if DevToolsService._registry is None:
+            DevToolsService._registry = InterpreterRegistry(CACHE_DIR / "interpreters.json")
+        return DevToolsService._registry.index(DevToolsService.PYTHON_PATHS)
 
-        return executables
+    @staticmethod
+    def _find_python_executables() -> List[Path]:
+        return DevToolsService._interpreter_index().executables
 
     @staticmethod
     def detect_python_versions() -> List[str]:
-        version_pattern = re.compile(r"python(\d+\.\d+(?:\.\d+)?)")
-        found_versions = set()
+        return DevToolsService._interpreter_index().versions()
 
-        for executable in DevToolsService._find_python_executables():
-            match = version_pattern.match(executable.name)
-            if match:
-                found_versions.add(match.group(1))
-                continue
+    @staticmethod
+    def get_python_command(version: str) -> Optional[str]:
+        resolved = DevToolsService._interpreter_index().resolve(version)
+        return resolved[0] if resolved else None
 
-            try:
-                result = DevToolsService._run_command([str(executable), "--version"], check=False)
-                if result.returncode == 0:
-                    version_output = result.stdout.strip()
-                    version_match = re.search(r"(\d+\.\d+\.\d+)", version_output)
-                    if version_match:
-                        found_versions.add(version_match.group(1))
-                    else:
-                        version_match = re.search(r"(\d+\.\d+)", version_output)
-                        if version_match:
-                            found_versions.add(version_match.group(1))
-            except (SystemCommandError, Exception):
-                continue
+    @staticmethod
+    def python_installations() -> List[Tuple[str, str, str]]:
+        index = DevToolsService._interpreter_index()
+        installations = []
+        for version in index.versions():
+            resolved = index.resolve(version)
+            if resolved:
+                python_cmd, interpreter = resolved
+                installations.append((version, python_cmd, interpreter.version_output))
+        return installations
 
-        return sorted(found_versions, key=lambda v: tuple(map(int, v.split("."))))
+    @staticmethod
+    def _artifact_cache() -> ArtifactCache:
+        return ArtifactCache(ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_BUDGET)
 
     @staticmethod
-    def get_python_command(version: str) -> Optional[str]:
-        python_cmd = f"python{version}"
+    def _installed_vscode_commit() -> Optional[str]:
         try:
-            result = DevToolsService._run_command(["which", python_cmd], check=False)
-            if result.returncode == 0:
-                return python_cmd
-        except SystemCommandError:
-            pass
+            product = json.loads((VSCODE_PATH / "resources" / "app" / "product.json").read_text())
+            return product.get("commit")
+        except (OSError, ValueError):
+            return None
 
-        for executable in DevToolsService._find_python_executables():
-            try:
-                result = DevToolsService._run_command([str(executable), "--version"], check=False)
-                if result.returncode == 0:
-                    output_version = result.stdout.strip().split()[-1]
-                    if output_version.startswith(version):
-                        return executable.name
-            except (SystemCommandError, Exception):
-                continue
+    @staticmethod
+    def _vscode_latest_release() -> dict:
+        try:
+            return fetch_json(VSCODE_UPDATE_API)
+        except DownloadError as e:
+            logger.warning(f"VSCode release metadata unavailable, downloading without checksum: {e}")
+            return {}
+
+    @staticmethod
+    def _download_progress(
+        progress_callback: Optional[Callable[[int, str], None]], start: int, end: int, label: str
+    ) -> Optional[ProgressCallback]:
+        if not progress_callback:
+            return None
+
+        def report(done: int, total: Optional[int], rate: float, eta: Optional[float]):
+            if total:
+                value = start + (end - start) * done // total
+                progress_callback(
+                    value,
+                    f"{label}... {format_bytes(done)} of {format_bytes(total)} "
+                    f"at {format_bytes(rate)}/s, ETA {format_eta(eta)}",
+                )
+            else:
+                progress_callback(start, f"{label}... {format_bytes(done)} at {format_bytes(rate)}/s")
 
-        return None
+        return report
 
     @staticmethod
-    def update_vscode(progress_callback: Optional[Callable[[int, str], None]] = None) -> str:
-        import time
+    def _build_progress(
+        progress_callback: Optional[Callable[[int, str], None]], start: int, end: int, label: str, expected: int
+    ) -> Optional[Callable[[int], None]]:
+        if not progress_callback:
+            return None
+        last_report = 0.0
+
+        def report(objects: int):
+            nonlocal last_report
+            now = time.monotonic()
+            if now - last_report < 0.25:
+                return
+            last_report = now
+            # The estimate comes from the previous build or a source count, so never claim the phase is done
+            fraction = min(objects / expected, 0.99)
+            progress_callback(int(start + (end - start) * fraction), f"{label} ({objects} of ~{expected} objects)...")
+
+        return report
 
+    @staticmethod
+    @tracing.traced("vscode.update")
+    def update_vscode(progress_callback: Optional[Callable[[int, str], None]] = None) -> ActionResult:
         if not VSCODE_PATH.exists():
-            return "VSCode not found in /opt/vscode"
+            return ActionResult(False, f"VSCode not found in {VSCODE_PATH}")
 
         backup_timestamp = time.strftime("%Y%m%d_%H%M%S")
-        temp_dir = TEMP_DIR / f"vscode_update_{backup_timestamp}"
 
         try:
-            temp_dir.mkdir(parents=True, exist_ok=True)
-
             if progress_callback:
-                progress_callback(10, "Downloading VSCode...")
+                progress_callback(5, "Checking for VSCode updates...")
 
-            download_path = temp_dir / "vscode.tar.gz"
-            try:
-                DevToolsService._run_command(
-                    ["wget", "-q", "--show-progress", "-O", str(download_path), VSCODE_DOWNLOAD_URL]
+            with tracing.span("vscode.check"):
+                release = DevToolsService._vscode_latest_release()
+                installed_commit = DevToolsService._installed_vscode_commit()
+            if installed_commit and installed_commit == release.get("version"):
+                if progress_callback:
+                    progress_callback(100, "VSCode is already up to date")
+                return ActionResult(
+                    True, f"VSCode is already up to date ({release.get('name') or installed_commit[:10]})."
                 )
-            except SystemCommandError as e:
-                return f"Download failed: {e}"
 
             if progress_callback:
-                progress_callback(70, "Updating VSCode...")
+                progress_callback(10, "Downloading VSCode...")
 
-            script_path = Path(__file__).parent / "update_vscode_root.sh"
-            if not script_path.exists():
-                return f"Update script not found: {script_path}"
+            # The privileged script extracts from stdin into a staging directory next to
+            # VSCODE_PATH, so extraction runs while the archive is still downloading. Leaving the block early
+            # (an error or a cancelled job) truncates the stream: the root script aborts and keeps the installed tree
+            with DevToolsService._privileged().start("vscode-update", timestamp=backup_timestamp) as request:
+                pipe = _HeldBackPipe(request)
+                download_error = None
+                try:
+                    with tracing.span("vscode.download-extract"):
+                        DevToolsService._artifact_cache().fetch(
+                            release.get("url") or VSCODE_DOWNLOAD_URL,
+                            sha256=release.get("sha256hash"),
+                            progress=DevToolsService._download_progress(
+                                progress_callback, 10, 70, "Downloading and extracting VSCode"
+                            ),
+                            sink=pipe.write,
+                        )
+                        pipe.flush()
+                except DownloadError as e:
+                    download_error = e
+                finally:
+                    pipe.close()
 
-            script_path.chmod(0o755)
+                if progress_callback:
+                    progress_callback(70, "Updating VSCode...")
 
-            result = DevToolsService._run_command(
-                ["pkexec", str(script_path), backup_timestamp], check=False, cwd=temp_dir
-            )
+                # The privileged request's own span covers the swap, this one only the wait after the download
+                with tracing.span("vscode.swap"):
+                    result = request.wait(cancellable=False)
+            output = result.stdout.strip()
 
-            if result.returncode == 0 and result.stdout.strip().startswith("OK:"):
+            if download_error:
+                return ActionResult(False, f"Download failed: {download_error}" + (f"\n{output}" if output else ""))
+
+            lines = output.splitlines()
+            if result.returncode == 0 and lines and lines[-1].startswith("OK:"):
                 if progress_callback:
                     progress_callback(100, "Update completed")
-                return "VSCode updated successfully."
+                delta = next((line[len("DELTA: ") :] for line in lines if line.startswith("DELTA: ")), None)
+                return ActionResult(
+                    True, f"VSCode updated successfully ({delta})." if delta else "VSCode updated successfully."
+                )
             else:
-                error_msg = result.stderr.strip() or result.stdout.strip()
-                return f"Update failed: {error_msg}"
+                return ActionResult(False, f"Update failed: {output}")
 
         except Exception as e:
             logger.error(f"VSCode update error: {e}")
-            return f"Error updating VSCode: {e}"
-        finally:
-            if temp_dir.exists():
-                shutil.rmtree(temp_dir, ignore_errors=True)
+            return ActionResult(False, f"Error updating VSCode: {e}")
+
+    @staticmethod
+    def list_vscode_backups() -> List[Tuple[str, str]]:
+        backup_index = read_index(str(BACKUP_DIR))
+        if not backup_index:
+            return []
+        return [
+            (name, info.get("version") or "unknown version")
+            for name, info in sorted(backup_index["snapshots"].items(), reverse=True)
+        ]
+
+    @staticmethod
+    @tracing.traced("vscode.restore")
+    def restore_vscode(snapshot: str, progress_callback: Optional[Callable[[int, str], None]] = None) -> ActionResult:
+        try:
+            if progress_callback:
+                progress_callback(20, f"Restoring VSCode backup {snapshot}...")
+
+            result = DevToolsService._privileged().run(
+                "vscode-restore", snapshot=snapshot, timestamp=time.strftime("%Y%m%d_%H%M%S")
+            )
+
+            lines = result.stdout.strip().splitlines()
+            if result.returncode == 0 and lines and lines[-1].startswith("OK:"):
+                if progress_callback:
+                    progress_callback(100, "Restore completed")
+                return ActionResult(True, f"VSCode backup {snapshot} restored successfully.")
+            return ActionResult(False, f"Restore failed: {result.stdout.strip()}")
+        except Exception as e:
+            logger.error(f"VSCode restore error: {e}")
+            return ActionResult(False, f"Error restoring VSCode: {e}")
+
+    @staticmethod
+    def _privileged() -> PrivilegedSession:
+        if not DevToolsService._privileged_session:
+            DevToolsService._privileged_session = PrivilegedSession(PRIVILEGE_LAUNCHER, persistent=PRIVILEGED_SESSION)
+        return DevToolsService._privileged_session
+
+    @staticmethod
+    def close_privileged_session():
+        if DevToolsService._privileged_session:
+            DevToolsService._privileged_session.close()
+
+    @staticmethod
+    def _package_manager() -> Optional[PackageManager]:
+        if not DevToolsService._package_manager_detected:
+            DevToolsService._package_manager_instance = detect_package_manager(
+                PACKAGE_CACHE_FILE, DevToolsService._privileged()
+            )
+            DevToolsService._package_manager_detected = True
+        return DevToolsService._package_manager_instance
 
     @staticmethod
     def _install_from_package_manager(version: str) -> bool:
+        manager = DevToolsService._package_manager()
+        if not manager:
+            return False
+        package = manager.python_package(version)
         try:
-            result = DevToolsService._run_command(["pacman", "-Ss", f"python{version}"], check=False)
-            if result.returncode == 0 and f"python{version}" in result.stdout:
-                DevToolsService._run_command(["sudo", "pacman", "-S", "--noconfirm", f"python{version}"])
+            with tracing.span("python.package-manager", package=package) as span:
+                if package not in manager.available([package]):
+                    span.set(available=False)
+                    return False
+                manager.install([package])
                 return True
+        except (PackageManagerError, OSError) as e:
+            logger.error(f"Package manager installation failed: {e}")
+            return False
 
-            result = DevToolsService._run_command(["apt-cache", "search", f"python{version}"], check=False)
-            if result.returncode == 0 and f"python{version}" in result.stdout:
-                DevToolsService._run_command(["sudo", "apt", "update"])
-                DevToolsService._run_command(["sudo", "apt", "install", "-y", f"python{version}"])
-                return True
+    @staticmethod
+    def _build_cache() -> BuildCache:
+        build_cache = BuildCache(PYTHON_BUILD_CACHE_DIR, PYTHON_BUILD_DIGESTS_FILE)
+        if build_cache.trusted():
+            return build_cache
+        logger.warning(
+            f"Not using build cache {PYTHON_BUILD_CACHE_DIR}: it belongs to another user or others can write to it"
+        )
+        return BuildCache(PRIVATE_BUILD_CACHE_DIR, PYTHON_BUILD_DIGESTS_FILE)
 
-        except SystemCommandError:
-            pass
+    @staticmethod
+    def _lookup_build(release: str, profile: BuildProfile) -> Tuple[str, Optional[Path]]:
+        # The fingerprint covers the compiler, so on a fresh host the key is only final once the build
+        # dependencies are installed
+        build_cache = DevToolsService._build_cache()
+        cache_key = build_cache.key(release, profile.configure_args, toolchain_fingerprint())
+        with DevToolsService._build_cache_lock:
+            return cache_key, build_cache.lookup(cache_key)
 
-        return False
+    @staticmethod
+    def _resolve_source_build(version: str, profile: BuildProfile) -> Tuple[str, str, Optional[Path]]:
+        # (release, build cache key, cached build archive if any)
+        with tracing.span("python.resolve", version=version) as span:
+            release = resolve_python_release(version)
+            cache_key, cached = DevToolsService._lookup_build(release, profile)
+            span.set(release=release, cached=cached is not None)
+            return release, cache_key, cached
 
     @staticmethod
-    def _install_from_source(version: str, progress_callback: Optional[Callable[[int, str], None]] = None) -> bool:
-        source_dir = TEMP_DIR / f"python_source_{version}"
+    @tracing.traced("python.build-dependencies")
+    def _install_build_dependencies():
+        manager = DevToolsService._package_manager()
+        if manager:
+            manager.install(manager.build_dependencies)
+        else:
+            logger.warning("No supported package manager found, assuming the build dependencies are installed")
 
+    @staticmethod
+    def _fetch_python_source(release: str, progress_callback: Optional[Callable[[int, str], None]] = None) -> Path:
+        python_url = f"https://www.python.org/ftp/python/{release}/Python-{release}.tar.xz"
         try:
-            source_dir.mkdir(parents=True, exist_ok=True)
+            with tracing.span("python.download", release=release):
+                return DevToolsService._artifact_cache().fetch(
+                    python_url,
+                    progress=DevToolsService._download_progress(progress_callback, 45, 55, "Downloading Python source"),
+                )
+        except DownloadError as e:
+            raise SystemCommandError(f"Download of {python_url} failed: {e}") from e
 
+    @staticmethod
+    @tracing.traced("python.build")
+    def _build_python_source(
+        version: str,
+        release: str,
+        cache_key: str,
+        archive_path: Path,
+        profile: BuildProfile,
+        jobs: int,
+        load_limit: int,
+        progress_callback: Optional[Callable[[int, str], None]] = None,
+    ) -> Path:
+        # Builds into a DESTDIR and returns the build cache archive of the result
+        source_dir = TEMP_DIR / f"python_source_{version}"
+        try:
+            source_dir.mkdir(parents=True, exist_ok=True)
             if progress_callback:
-                progress_callback(40, "Installing build dependencies...")
+                progress_callback(55, "Extracting source...")
+
+            DevToolsService._run_command(["tar", "-xf", str(archive_path)], cwd=source_dir)
 
+            build_dir = source_dir / f"Python-{release}"
+            build_env = dict(os.environ)
+            ccache = shutil.which("ccache")
+            if ccache:
+                # Reuses compiled objects across partial and repeated builds of the same sources
+                build_env["CC"] = f"{ccache} {os.environ.get('CC', 'gcc')}"
+
+            destdir = source_dir / "destdir"
+            record = BuildRecord(release, profile.name, jobs)
+            # Share of the progress bar per phase; compile phases advance with the objects make reports
+            phase_progress = {
+                "configure": (56, 60, "Configuring build"),
+                "compile-instrumented": (60, 76, "Compiling instrumented Python"),
+                "profile-run": (76, 82, "Running the PGO training workload"),
+                "compile": (82 if profile.pgo else 60, 92, f"Compiling Python with {jobs} jobs"),
+                "install": (92, 93, "Packaging build"),
+            }
+            history = load_build_records(PYTHON_BUILD_STATS_FILE)
             try:
-                DevToolsService._run_command(
-                    ["sudo", "pacman", "-S", "--noconfirm", "--needed", "base-devel", "wget", "tk"]
+                for phase, cmd in build_phases(profile, jobs, load_limit, destdir):
+                    start, end, label = phase_progress[phase]
+                    if progress_callback:
+                        progress_callback(start, f"{label}...")
+                    on_object = DevToolsService._build_progress(
+                        progress_callback, start, end, label, expected_objects(history, profile, phase, build_dir)
+                    )
+                    result = run_phase(phase, cmd, on_object, cwd=build_dir, env=build_env)
+                    record.phases.append(result)
+                    if result.returncode != 0:
+                        raise SystemCommandError(f"Command '{cmd}' failed: {result.output_tail}")
+            finally:
+                save_build_record(PYTHON_BUILD_STATS_FILE, record)
+
+            with tracing.span("python.store-build"), DevToolsService._build_cache_lock:
+                return DevToolsService._build_cache().store(
+                    cache_key,
+                    destdir,
+                    {"release": release, "profile": profile.name, "configure": profile.configure_args},
                 )
-            except SystemCommandError:
-                DevToolsService._run_command(["sudo", "apt", "update"])
-                DevToolsService._run_command(
-                    ["sudo", "apt", "install", "-y", "build-essential", "wget", "tk-dev", "libssl-dev"]
-                )
-
-            if progress_callback:
-                progress_callback(60, "Downloading Python source...")
-
-            python_url = f"https://www.python.org/ftp/python/{version}/Python-{version}.tar.xz"
-            archive_path = source_dir / f"Python-{version}.tar.xz"
+        finally:
+            if source_dir.exists():
+                shutil.rmtree(source_dir, ignore_errors=True)
 
-            DevToolsService._run_command(["wget", "-q", "--show-progress", "-O", str(archive_path), python_url])
+    @staticmethod
+    def _install_from_source(
+        version: str,
+        progress_callback: Optional[Callable[[int, str], None]] = None,
+        profile_name: str = DEFAULT_BUILD_PROFILE,
+    ) -> bool:
+        profile = BUILD_PROFILES[profile_name]
 
+        try:
             if progress_callback:
-                progress_callback(75, "Extracting source...")
-
-            DevToolsService._run_command(["tar", "-xf", str(archive_path)], cwd=source_dir)
+                progress_callback(35, "Checking build cache...")
 
-            build_dir = source_dir / f"Python-{version}"
+            release, cache_key, cached_build = DevToolsService._resolve_source_build(version, profile)
+            if cached_build:
+                if progress_callback:
+                    progress_callback(90, f"Installing cached {profile.name} build of Python {release}...")
+                DevToolsService._install_build_archive(cached_build)
+                return True
 
             if progress_callback:
-                progress_callback(80, "Configuring build...")
+                progress_callback(40, "Installing build dependencies...")
 
-            DevToolsService._run_command(
-                ["./configure", "--enable-optimizations", "--with-ensurepip=install"], cwd=build_dir
-            )
+            DevToolsService._install_build_dependencies()
+            cache_key, cached_build = DevToolsService._lookup_build(release, profile)
+            if cached_build:
+                if progress_callback:
+                    progress_callback(90, f"Installing cached {profile.name} build of Python {release}...")
+                DevToolsService._install_build_archive(cached_build)
+                return True
 
             if progress_callback:
-                progress_callback(85, "Compiling Python...")
+                progress_callback(45, "Downloading Python source...")
 
-            cpu_count = os.cpu_count() or 1
-            DevToolsService._run_command(["make", f"-j{cpu_count}"], cwd=build_dir)
+            archive_path = DevToolsService._fetch_python_source(release, progress_callback)
+            jobs, load_limit = plan_jobs(profile)
+            build_archive = DevToolsService._build_python_source(
+                version, release, cache_key, archive_path, profile, jobs, load_limit, progress_callback
+            )
 
             if progress_callback:
                 progress_callback(95, "Installing...")
 
-            DevToolsService._run_command(["sudo", "make", "altinstall"], cwd=build_dir)
+            DevToolsService._install_build_archive(build_archive)
             return True
 
-        except SystemCommandError as e:
+        except (SystemCommandError, PackageManagerError, OSError, subprocess.CalledProcessError) as e:
             logger.error(f"Source installation failed: {e}")
             return False
-        finally:
-            if source_dir.exists():
-                shutil.rmtree(source_dir, ignore_errors=True)
 
     @staticmethod
-    def install_python(version: str, progress_callback: Optional[Callable[[int, str], None]] = None) -> str:
+    @tracing.traced("python.install-build")
+    def _install_build_archive(archive: Path):
+        archive = archive.resolve()
+        # The helper installs nothing but an archive of the cache directory matching the digest recorded for it
+        with DevToolsService._build_cache_lock:
+            digest = BuildCache(archive.parent, PYTHON_BUILD_DIGESTS_FILE).digest(archive.name[: -len(".tar.gz")])
+        if not digest:
+            raise SystemCommandError(f"Installing {archive.name} failed: no recorded digest")
+        try:
+            result = DevToolsService._privileged().run(
+                "install-build", archive=str(archive), cache_dir=str(archive.parent), sha256=digest
+            )
+        except PrivilegedError as e:
+            raise SystemCommandError(f"Installing {archive.name} failed: {e}") from e
+        if result.returncode != 0:
+            raise SystemCommandError(f"Installing {archive.name} failed: {result.stdout.strip()}")
+
+    @staticmethod
+    @tracing.traced("python.install")
+    def install_python(
+        version: str,
+        progress_callback: Optional[Callable[[int, str], None]] = None,
+        build_profile: str = DEFAULT_BUILD_PROFILE,
+    ) -> ActionResult:
         try:
             if not re.match(r"^\d+\.\d+$", version):
-                return f"Invalid Python version format: {version}"
+                return ActionResult(False, f"Invalid Python version format: {version}")
+            if build_profile not in BUILD_PROFILES:
+                return ActionResult(False, f"Unknown build profile: {build_profile}")
 
             if progress_callback:
                 progress_callback(20, "Checking package manager...")
@@ -247,87 +594,504 @@ class DevToolsService:
             if DevToolsService._install_from_package_manager(version):
                 if progress_callback:
                     progress_callback(100, "Installation completed")
-                return f"Python {version} installed via package manager."
+                return ActionResult(True, f"Python {version} installed via package manager.")
 
             if progress_callback:
                 progress_callback(30, "Package not found, building from source...")
 
-            if DevToolsService._install_from_source(version, progress_callback):
+            if DevToolsService._install_from_source(version, progress_callback, build_profile):
                 if progress_callback:
                     progress_callback(100, "Installation completed")
-                return f"Python {version} installed from source."
+                return ActionResult(True, f"Python {version} installed from source.")
 
-            return "Failed to install Python from both package manager and source."
+            return ActionResult(False, "Failed to install Python from both package manager and source.")
 
         except Exception as e:
             logger.error(f"Python installation error: {e}")
-            return f"Error installing Python: {e}"
+            return ActionResult(False, f"Error installing Python: {e}")
 
     @staticmethod
+    @tracing.traced("python.install-many")
+    def install_pythons(
+        versions: List[str],
+        progress_callback: Optional[Callable[[int, str], None]] = None,
+        build_profile: str = DEFAULT_BUILD_PROFILE,
+    ) -> ActionResult:
+        # Installs several versions as one task graph: the package manager and build dependencies are handled
+        # once, downloads overlap, and source builds share the CPUs and memory instead of running one by one
+        versions = list(dict.fromkeys(versions))
+        invalid = [version for version in versions if not re.match(r"^\d+\.\d+$", version)]
+        if invalid:
+            return ActionResult(False, f"Invalid Python version format: {', '.join(invalid)}")
+        if build_profile not in BUILD_PROFILES:
+            return ActionResult(False, f"Unknown build profile: {build_profile}")
+        if len(versions) == 1:
+            return DevToolsService.install_python(versions[0], progress_callback, build_profile)
+
+        profile = BUILD_PROFILES[build_profile]
+        progress = _VersionProgress(versions, progress_callback)
+        manager = DevToolsService._package_manager()
+        packaged = []
+        if manager:
+            for version in versions:
+                progress(version)(20, "Checking package manager...")
+            try:
+                available = manager.available([manager.python_package(version) for version in versions])
+                packaged = [version for version in versions if manager.python_package(version) in available]
+            except (PackageManagerError, OSError) as e:
+                logger.warning(f"Package manager lookup failed, building every version from source: {e}")
+        from_source = [version for version in versions if version not in packaged]
+
+        # The graph admits as many builds as the CPUs hold; each make's -l keeps their combined load in check
+        jobs, load_limit = plan_jobs(profile)
+        build_jobs = max(1, min(jobs, (os.cpu_count() or 1) // max(1, len(from_source))))
+        graph = TaskGraph()
+        resolved: Dict[str, dict] = {}
+        package_errors: List[Exception] = []
+
+        def install_packages():
+            for version in packaged:
+                progress(version)(30, "Installing from the package manager...")
+            try:
+                manager.install([manager.python_package(version) for version in packaged])
+            except (PackageManagerError, OSError) as e:
+                # Like install_python, these versions then go through the source build chain
+                logger.error(f"Package manager installation failed: {e}")
+                package_errors.append(e)
+                return
+            for version in packaged:
+                progress(version)(100, "Installed via package manager")
+
+        def resolve(version: str):
+            if version in packaged and not package_errors:
+                resolved[version] = {"packaged": True}
+                return
+            # Failures are kept for the version's own chain, so they cannot fail the shared dependency step
+            progress(version)(35, "Checking build cache...")
+            try:
+                release, cache_key, cached_build = DevToolsService._resolve_source_build(version, profile)
+                resolved[version] = {"release": release, "key": cache_key, "archive": cached_build}
+            except (SystemCommandError, OSError) as e:
+                resolved[version] = {"error": e}
+
+        def install_build_dependencies():
+            pending = [
+                version
+                for version, info in resolved.items()
+                if not info.get("archive") and "error" not in info and not info.get("packaged")
+            ]
+            if not pending:
+                return
+            DevToolsService._install_build_dependencies()
+            # Keys resolved before the compiler was installed carry the wrong fingerprint; updated in place, since
+            # download() may already hold the version's entry
+            for version in pending:
+                try:
+                    cache_key, cached_build = DevToolsService._lookup_build(resolved[version]["release"], profile)
+                    resolved[version].update(key=cache_key, archive=cached_build)
+                except OSError as e:
+                    resolved[version]["error"] = e
+
+        def download(version: str):
+            info = resolved[version]
+            if "error" in info:
+                raise info["error"]
+            if not info.get("packaged") and not info["archive"]:
+                progress(version)(45, "Downloading Python source...")
+                info["source"] = DevToolsService._fetch_python_source(info["release"], progress(version))
+
+        def build(version: str):
+            info = resolved[version]
+            if "error" in info:
+                raise info["error"]
+            if not info.get("packaged") and not info["archive"]:
+                info["archive"] = DevToolsService._build_python_source(
+                    version,
+                    info["release"],
+                    info["key"],
+                    info["source"],
+                    profile,
+                    build_jobs,
+                    load_limit,
+                    progress(version),
+                )
+
+        def install(version: str):
+            if resolved[version].get("packaged"):
+                return
+            progress(version)(95, "Installing...")
+            DevToolsService._install_build_archive(resolved[version]["archive"])
+            progress(version)(100, f"Installed Python {resolved[version]['release']} from source")
+
+        # Packaged versions get a source chain too, which only does work when the package installation failed
+        if packaged:
+            graph.add("packages", install_packages, exclusive=[PRIVILEGED])
+        for version in versions:
+            deps = ["packages"] if version in packaged else []
+            graph.add(f"resolve:{version}", lambda version=version: resolve(version), deps=deps)
+        graph.add(
+            "build-deps",
+            install_build_dependencies,
+            deps=[f"resolve:{version}" for version in versions],
+            exclusive=[PRIVILEGED],
+        )
+        for version in versions:
+            graph.add(f"download:{version}", lambda version=version: download(version), deps=[f"resolve:{version}"])
+            graph.add(
+                f"build:{version}",
+                lambda version=version: build(version),
+                deps=["build-deps", f"download:{version}"],
+                cpus=build_jobs,
+                memory_mb=build_jobs * profile.memory_per_job_mb,
+            )
+            graph.add(
+                f"install:{version}",
+                lambda version=version: install(version),
+                deps=[f"build:{version}"],
+                exclusive=[PRIVILEGED],
+            )
+
+        if progress_callback:
+            progress_callback(0, f"Installing Python {', '.join(versions)}...")
+        outcomes = graph.run()
+
+        lines = []
+        for version in versions:
+            chain = [f"{step}:{version}" for step in ("download", "build", "install")]
+            errors = [outcomes[name].error for name in chain if not outcomes[name].ok]
+            if not errors:
+                lines.append(f"✓ Python {version}")
+                continue
+            # The root cause rather than the dependency failures it triggered
+            error = next((e for e in errors if not isinstance(e, DependencyFailed)), errors[0])
+            if isinstance(error, DependencyFailed) and "build-deps" in str(error):
+                error = outcomes["build-deps"].error
+            lines.append(f"✗ Python {version}: {error}")
+
+        failed = sum(1 for line in lines if line.startswith("✗"))
+        summary = f"{len(versions) - failed} of {len(versions)} Python versions installed."
+        if not failed and progress_callback:
+            progress_callback(100, summary)
+        return ActionResult(not failed, "\n".join([summary] + lines))
+
+    @staticmethod
+    def build_profiles() -> List[Tuple[str, str]]:
+        return [(profile.name, profile.description) for profile in BUILD_PROFILES.values()]
+
+    @staticmethod
+    def build_statistics() -> List[dict]:
+        return load_build_records(PYTHON_BUILD_STATS_FILE)
+
+    @staticmethod
+    @tracing.traced("venv.create")
     def create_venv(
-        target_dir: str, python_version: str, progress_callback: Optional[Callable[[int, str], None]] = None
-    ) -> str:
-        python_cmd = DevToolsService.get_python_command(python_version)
-        if not python_cmd:
-            return f"Python {python_version} not found."
+        target_dir: str,
+        python_version: str,
+        progress_callback: Optional[Callable[[int, str], None]] = None,
+        install_requirements: bool = False,
+    ) -> ActionResult:
+        resolved = DevToolsService._interpreter_index().resolve(python_version)
+        if not resolved:
+            return ActionResult(False, f"Python {python_version} not found.")
+
+        python_cmd, interpreter = resolved
+        if interpreter.ok and not (interpreter.has_venv and interpreter.has_ensurepip):
+            return ActionResult(
+                False,
+                f"{python_cmd} cannot create virtual environments: the venv/ensurepip modules are missing "
+                f"(install the python{python_version}-venv package).",
+            )
 
         venv_path = Path(target_dir) / VENV_NAME
         try:
-            if progress_callback:
-                progress_callback(10, f"Creating virtual environment with {python_cmd}...")
-            result = DevToolsService._run_command([python_cmd, "-m", "venv", str(venv_path)])
-            if result.returncode == 0:
+            created = False
+            if interpreter.ok and not venv_path.exists():
+                try:
+                    if progress_callback:
+                        progress_callback(10, f"Cloning the {python_cmd} venv template...")
+                    with tracing.span("venv.clone-template"):
+                        templates = VenvTemplateCache(VENV_TEMPLATE_DIR)
+                        templates.clone(templates.template(python_cmd, interpreter, VENV_NAME), venv_path)
+                    created = True
+                except (OSError, subprocess.CalledProcessError) as e:
+                    logger.warning(f"Venv template unavailable, running venv directly: {e}")
+
+            if not created:
+                if progress_callback:
+                    progress_callback(10, f"Creating virtual environment with {python_cmd}...")
+                result = DevToolsService._run_command([python_cmd, "-m", "venv", str(venv_path)], check=False)
+                if result.returncode != 0:
+                    return ActionResult(False, f"Failed to create virtual environment: {result.stderr.strip()}")
+            message = f"Virtual environment created at {venv_path} using {python_cmd}."
+
+            requirements = Path(target_dir) / "requirements.txt"
+            if install_requirements and requirements.is_file():
                 if progress_callback:
-                    progress_callback(100, "Virtual environment created successfully.")
-                return f"Virtual environment created at {venv_path} using {python_cmd}."
-            return f"Failed to create virtual environment: {result.stderr.strip()}"
+                    progress_callback(40, "Installing requirements...")
+                try:
+                    with tracing.span("venv.requirements"):
+                        linked = Wheelhouse(WHEELHOUSE_DIR).install(
+                            str(venv_path / "bin" / "python"),
+                            requirements,
+                            (lambda text: progress_callback(60, text)) if progress_callback else None,
+                        )
+                except (WheelhouseError, DownloadError, OSError) as e:
+                    return ActionResult(False, f"{message}\nFailed to install requirements: {e}")
+                shared = format_bytes(linked["linked_bytes"])
+                message += f"\nRequirements installed from the wheelhouse ({shared} shared with other venvs)."
+
+            if progress_callback:
+                progress_callback(100, "Virtual environment created successfully.")
+            return ActionResult(True, message)
         except Exception as e:
             logger.error(f"Error creating virtual environment: {e}")
-            return f"Error creating virtual environment: {e}"
+            return ActionResult(False, f"Error creating virtual environment: {e}")
 
     @staticmethod
-    def system_info() -> str:
-        info_lines = []
+    def find_venv_projects(roots: List[str], max_depth: int = PROJECT_SEARCH_DEPTH) -> List[Path]:
+        # Directories with Python project metadata and no venv yet, up to max_depth levels below each root
+        projects = []
+        for root in roots:
+            root_path = Path(root).resolve()
+            pending = [(root_path, 0)]
+            while pending:
+                directory, depth = pending.pop()
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError:
+                    continue
+                names = {entry.name for entry in entries}
+                if names & PROJECT_MARKERS and not (directory / VENV_NAME / "pyvenv.cfg").exists():
+                    projects.append(directory)
+                if depth < max_depth:
+                    pending.extend(
+                        (Path(entry.path), depth + 1)
+                        for entry in entries
+                        if entry.is_dir(follow_symlinks=False)
+                        and not entry.name.startswith(".")
+                        and entry.name not in PROJECT_SEARCH_SKIP
+                    )
+        return sorted(set(projects))
 
-        try:
-            info_lines.append(f"System: {subprocess.getoutput('uname -srm')}")
-
-            python_versions = DevToolsService.detect_python_versions()
-            if python_versions:
-                info_lines.append("Python versions installed:")
-                for version in python_versions:
-                    py_cmd = DevToolsService.get_python_command(version)
-                    if py_cmd:
-                        try:
-                            ver_output = DevToolsService._run_command([py_cmd, "--version"], check=False)
-                            info_lines.append(f"• {py_cmd}: {ver_output.stdout.strip()}")
-                        except SystemCommandError:
-                            info_lines.append(f"• {py_cmd}: version check failed")
-            else:
-                info_lines.append("Python: Not installed")
+    @staticmethod
+    def _provision_venv(project: Path, python_version: str, install_requirements: bool) -> Tuple[bool, str]:
+        check_cancelled()
+        result = DevToolsService.create_venv(str(project), python_version, install_requirements=install_requirements)
+        if not result.ok:
+            return False, result.message.splitlines()[-1]
+        if install_requirements and (project / "requirements.txt").is_file():
+            return True, "venv created, requirements installed"
+        return True, "venv created"
 
-            vscode_binary = VSCODE_PATH / "bin" / "code"
-            if vscode_binary.exists():
+    @staticmethod
+    @tracing.traced("venv.provision")
+    def provision_venvs(
+        projects: List[str],
+        python_version: str,
+        install_requirements: bool = False,
+        progress_callback: Optional[Callable[[int, str], None]] = None,
+    ) -> ActionResult:
+        if not projects:
+            if progress_callback:
+                progress_callback(100, "Nothing to do")
+            return ActionResult(True, "No projects need a virtual environment.")
+        resolved = DevToolsService._interpreter_index().resolve(python_version)
+        if not resolved:
+            return ActionResult(False, f"Python {python_version} not found.")
+
+        python_cmd, interpreter = resolved
+        if interpreter.ok:
+            # Built once up front rather than by several workers racing for the same template
+            try:
+                VenvTemplateCache(VENV_TEMPLATE_DIR).template(python_cmd, interpreter, VENV_NAME)
+            except (OSError, subprocess.CalledProcessError) as e:
+                logger.warning(f"Venv template unavailable: {e}")
+
+        # venv cloning is metadata-bound and pip installs are CPU-bound: cap by both
+        cpus = os.cpu_count() or 1
+        rotational = is_rotational(str(Path(projects[0]).parent))
+        disk_jobs = BATCH_VENV_JOBS_HDD if rotational else BATCH_VENV_JOBS_SSD
+        workers = max(1, min(cpus, disk_jobs, len(projects)))
+
+        if progress_callback:
+            progress_callback(0, f"Provisioning {len(projects)} projects with {workers} workers...")
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    bind_context(DevToolsService._provision_venv, prefix=f"[{Path(project).name}] "),
+                    Path(project),
+                    python_version,
+                    install_requirements,
+                ): project
+                for project in projects
+            }
+            for future in as_completed(futures):
+                project = futures[future]
                 try:
-                    vscode_version = DevToolsService._run_command([str(vscode_binary), "--version"], check=False)
-                    info_lines.append(f"VSCode: {vscode_version.stdout.splitlines()[0]}")
-                except SystemCommandError:
-                    info_lines.append("VSCode: Installed (version check failed)")
-            else:
-                info_lines.append("VSCode: Not installed")
+                    results[project] = future.result()
+                except Exception as e:
+                    results[project] = (False, str(e))
+                if progress_callback:
+                    progress_callback(
+                        int(100 * len(results) / len(projects)) if len(results) < len(projects) else 99,
+                        f"{len(results)} of {len(projects)} projects done ({Path(project).name})",
+                    )
+
+        failed = [project for project, (ok, _) in results.items() if not ok]
+        lines = [f"{'✓' if results[project][0] else '✗'} {project}: {results[project][1]}" for project in projects]
+        summary = f"{len(projects) - len(failed)} of {len(projects)} virtual environments provisioned."
+        if not failed and progress_callback:
+            progress_callback(100, summary)
+        return ActionResult(not failed, "\n".join([summary] + lines))
 
-            disk_info = subprocess.getoutput("df -h / | awk 'NR==2 {print $4 \" free of \" $2}'")
-            info_lines.append(f"Disk: {disk_info}")
+    @staticmethod
+    def _venv_inventory() -> VenvInventory:
+        # The venv templates live in the cache and are not user venvs
+        inventory = VenvInventory(VENV_INDEX_FILE, exclude=[str(CACHE_DIR)])
+        if not inventory.roots:
+            inventory.roots = [str(Path.home())]
+        return inventory
 
-            mem_info = subprocess.getoutput("free -h | awk 'NR==2 {print $7 \" free of \" $2}'")
-            info_lines.append(f"Memory: {mem_info}")
+    @staticmethod
+    def venv_roots() -> List[str]:
+        return DevToolsService._venv_inventory().roots
 
-            if BACKUP_DIR.exists():
-                backup_count = len(list(BACKUP_DIR.iterdir()))
-                info_lines.append(f"VSCode Backups: {backup_count}")
+    @staticmethod
+    def cached_venvs() -> List[VenvInfo]:
+        return DevToolsService._venv_inventory().cached()
 
-        except Exception as e:
-            logger.error(f"Error gathering system info: {e}")
-            info_lines.append(f"Error gathering system information: {e}")
+    @staticmethod
+    def scan_venvs(
+        roots: Optional[List[str]] = None, on_venv: Optional[Callable[[VenvInfo], None]] = None
+    ) -> List[VenvInfo]:
+        # Given roots replace the remembered ones
+        return DevToolsService._venv_inventory().scan(roots, on_venv)
+
+    @staticmethod
+    @tracing.traced("venv.delete")
+    def delete_venvs(paths: List[str], progress_callback: Optional[Callable[[int, str], None]] = None) -> ActionResult:
+        inventory = DevToolsService._venv_inventory()
+        deleted, failed = [], []
+        try:
+            for i, path in enumerate(paths):
+                check_cancelled()
+                if progress_callback:
+                    progress_callback(int(100 * i / len(paths)), f"Deleting {path}...")
+                try:
+                    delete_venv(path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not delete venv {path}: {e}")
+                    failed.append(f"{path}: {e}")
+                    continue
+                deleted.append(path)
+        finally:
+            inventory.forget(deleted)
+        if deleted:
+            # Files the deleted venvs shared through the wheelhouse store may now be held by the store alone
+            try:
+                Wheelhouse(WHEELHOUSE_DIR).prune_objects()
+            except OSError as e:
+                logger.warning(f"Could not prune the wheelhouse store: {e}")
+
+        summary = f"{len(paths) - len(failed)} of {len(paths)} virtual environments deleted."
+        if not failed and progress_callback:
+            progress_callback(100, summary)
+        return ActionResult(not failed, "\n".join([summary] + failed))
+
+    @staticmethod
+    def _system_probe() -> str:
+        return str(probe_system())
 
+    @staticmethod
+    def _python_probe() -> str:
+        python_installations = DevToolsService.python_installations()
+        if not python_installations:
+            return "Not installed"
+        return "\n".join(
+            f"• {py_cmd}: {version_output or 'version check failed'}"
+            for _, py_cmd, version_output in python_installations
+        )
+
+    @staticmethod
+    def _vscode_probe() -> str:
+        vscode = probe_vscode(VSCODE_PATH)
+        return str(vscode) if vscode else "Not installed"
+
+    @staticmethod
+    def _disk_probe() -> str:
+        return str(probe_disk("/"))
+
+    @staticmethod
+    def _memory_probe() -> str:
+        memory = probe_memory()
+        return str(memory) if memory else "Unknown"
+
+    @staticmethod
+    def _backups_probe() -> str:
+        backup_index = read_index(str(BACKUP_DIR))
+        if not backup_index:
+            return "None"
+        # Indexes written before shared_bytes existed counted shared objects as stored
+        shared = backup_index.get("shared_bytes")
+        return (
+            f"{len(backup_index['snapshots'])} "
+            f"({format_bytes(backup_index['stored_bytes'])} on disk"
+            + (f", {format_bytes(shared)} shared with the installed VSCode" if shared else "")
+            + f", {format_bytes(backup_index['logical_bytes'])} before deduplication)"
+        )
+
+    @staticmethod
+    def system_info_probes() -> List[Tuple[str, str, Callable[[], str]]]:
+        # (key, label, probe) in display order; every probe is independent of the others
+        return [
+            ("system", "System", DevToolsService._system_probe),
+            ("python", "Python", DevToolsService._python_probe),
+            ("vscode", "VSCode", DevToolsService._vscode_probe),
+            ("disk", "Disk", DevToolsService._disk_probe),
+            ("memory", "Memory", DevToolsService._memory_probe),
+            ("backups", "VSCode Backups", DevToolsService._backups_probe),
+        ]
+
+    @staticmethod
+    def cached_system_info() -> Dict[str, str]:
+        try:
+            data = json.loads(SYSTEM_INFO_CACHE_FILE.read_text())
+            return data["rows"] if data.get("format") == SYSTEM_INFO_CACHE_FORMAT else {}
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    @staticmethod
+    def refresh_system_info(on_row: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        # Runs every probe in parallel and reports each row as soon as its probe finishes
+        probes = DevToolsService.system_info_probes()
+        rows = {}
+        with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+            futures = {executor.submit(probe): key for key, _, probe in probes}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    rows[key] = future.result()
+                except Exception as e:
+                    logger.error(f"System info probe {key} failed: {e}")
+                    rows[key] = f"Error: {e}"
+                if on_row:
+                    on_row(key, rows[key])
+
+        try:
+            SYSTEM_INFO_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = SYSTEM_INFO_CACHE_FILE.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(json.dumps({"format": SYSTEM_INFO_CACHE_FORMAT, "updated": time.time(), "rows": rows}))
+            os.replace(tmp_file, SYSTEM_INFO_CACHE_FILE)
+        except OSError as e:
+            logger.warning(f"Could not cache system information: {e}")
+        return rows
+
+    @staticmethod
+    def system_info() -> str:
+        rows = DevToolsService.refresh_system_info()
+        info_lines = []
+        for key, label, _ in DevToolsService.system_info_probes():
+            value = rows.get(key, "")
+            info_lines.append(f"{label}:\n{value}" if "\n" in value else f"{label}: {value}")
         return "\n".join(info_lines)
@@ -0,0 +1,327 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+from services import tracing
+from services.command_runner import check_cancelled
+
+CHUNK_SIZE = 256 * 1024
+DOWNLOAD_TIMEOUT = 30
+DOWNLOAD_RETRIES = 3
+PROGRESS_INTERVAL = 0.25
+USER_AGENT = "dev-tools"
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, Optional[int], float, Optional[float]], None]
+ChunkSink = Callable[[memoryview], None]
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ChecksumError(DownloadError):
+    pass
+
+
+class NotModified(DownloadError):
+    pass
+
+
+@dataclass
+class DownloadResult:
+    path: Path
+    size: int
+    sha256: str
+    resumed_from: int = 0
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def read_chunks(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while True:
+            read = f.readinto(view)
+            if not read:
+                break
+            yield view[:read]
+
+
+def fetch_json(url: str, timeout: float = DOWNLOAD_TIMEOUT) -> dict:
+    import http.client
+    import urllib.error
+    import urllib.request
+
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, "Accept": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
+        raise DownloadError(f"Could not fetch {url}: {e}") from e
+
+
+class _SinkFeed:
+    # Retries replay bytes the sink has already seen, so only what lies past them is forwarded. When a retry
+    # starts over from the first byte, the replayed prefix must match what the sink got: it cannot be taken back
+    def __init__(self, sink: Optional[ChunkSink]):
+        self.sink = sink
+        self.fed = 0
+        self._expected: Optional[str] = None
+        self._check = None
+
+    def restart(self, part_file: Path):
+        # Called before part_file, which still starts with every byte fed so far, is truncated
+        if not self.fed or self._expected is not None:
+            return
+        hasher = hashlib.sha256()
+        remaining = self.fed
+        try:
+            with open(part_file, "rb") as f:
+                while remaining:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    remaining -= len(chunk)
+        except OSError:
+            pass
+        if remaining:
+            raise DownloadError("Download restarted and the data already streamed can no longer be verified")
+        self._expected = hasher.hexdigest()
+        self._check = hashlib.sha256()
+
+    def finish(self):
+        if self._check is not None:
+            raise DownloadError("Download restarted and came back shorter than the data already streamed")
+
+    def __call__(self, position: int, chunk: memoryview):
+        end = position + len(chunk)
+        if self._check is not None and position < self.fed:
+            self._check.update(chunk[: self.fed - position])
+            if end >= self.fed:
+                if self._check.hexdigest() != self._expected:
+                    raise DownloadError("Download restarted with different content than the data already streamed")
+                self._expected = self._check = None
+        if self.sink is None or end <= self.fed:
+            return
+        self.sink(chunk[self.fed - position :] if position < self.fed else chunk)
+        self.fed = end
+
+
+class Downloader:
+    def __init__(
+        self, chunk_size: int = CHUNK_SIZE, timeout: float = DOWNLOAD_TIMEOUT, retries: int = DOWNLOAD_RETRIES
+    ):
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+
+    def download(
+        self,
+        url: str,
+        dest: Path,
+        sha256: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        sink: Optional[ChunkSink] = None,
+    ) -> DownloadResult:
+        dest = Path(dest)
+        feed = _SinkFeed(sink)
+        conditions = {}
+        if etag:
+            conditions["If-None-Match"] = etag
+        if last_modified:
+            conditions["If-Modified-Since"] = last_modified
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with tracing.span("download", url=url):
+            return self._download(url, dest, sha256, progress, conditions, feed)
+
+    def _download(
+        self,
+        url: str,
+        dest: Path,
+        sha256: Optional[str],
+        progress: Optional[ProgressCallback],
+        conditions: Dict[str, str],
+        feed: _SinkFeed,
+    ) -> DownloadResult:
+        # Imported on first use: urllib.request pulls in http.client, email and ssl, which would
+        # otherwise dominate the startup time of the command-line entry point
+        import http.client
+        import urllib.error
+
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(url, dest, sha256, progress, conditions, feed)
+            except DownloadError:
+                raise
+            except urllib.error.HTTPError as e:
+                if e.code < 500:
+                    raise DownloadError(f"Download of {url} failed: HTTP {e.code} {e.reason}") from e
+                error = e
+            except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+                error = e
+
+            attempt += 1
+            if attempt > self.retries:
+                raise DownloadError(f"Download of {url} failed after {attempt} attempts: {error}") from error
+            logger.warning(f"Download of {url} interrupted ({error}), resuming (attempt {attempt}/{self.retries})")
+            time.sleep(min(2**attempt, 10))
+
+    def _attempt(
+        self,
+        url: str,
+        dest: Path,
+        sha256: Optional[str],
+        progress: Optional[ProgressCallback],
+        conditions: Dict[str, str],
+        feed: _SinkFeed,
+    ) -> DownloadResult:
+        import http.client
+        import urllib.error
+        import urllib.request
+
+        part_file = dest.with_name(dest.name + ".part")
+        meta_file = dest.with_name(dest.name + ".part.json")
+
+        offset = part_file.stat().st_size if part_file.exists() else 0
+        meta = self._read_meta(meta_file)
+        if offset and meta.get("url") != url:
+            offset = 0
+
+        headers = {"User-Agent": USER_AGENT}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            validator = meta.get("etag") or meta.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+        else:
+            headers.update(conditions)
+
+        try:
+            response = urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and not offset:
+                raise NotModified(f"{url} not modified") from e
+            if e.code == 416 and offset:
+                # The partial file no longer fits the remote object, start over
+                feed.restart(part_file)
+                part_file.unlink(missing_ok=True)
+                meta_file.unlink(missing_ok=True)
+                return self._attempt(url, dest, sha256, progress, conditions, feed)
+            raise
+
+        with response:
+            hasher = hashlib.sha256()
+            if offset and response.status == 206:
+                self._hash_file(part_file, hasher, feed)
+                mode = "ab"
+            else:
+                # A 200 to a range request: the object may have changed under the bytes the sink already consumed
+                feed.restart(part_file)
+                offset = 0
+                mode = "wb"
+
+            length = response.headers.get("Content-Length")
+            total = offset + int(length) if length is not None else None
+            meta = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+            self._write_meta(meta_file, meta)
+
+            done = offset
+            started = time.monotonic()
+            last_report = 0.0
+            buffer = bytearray(self.chunk_size)
+            view = memoryview(buffer)
+
+            try:
+                with open(part_file, mode) as f:
+                    while True:
+                        # A cancelled job stops here and leaves the .part file for the next attempt to resume
+                        check_cancelled()
+                        read = response.readinto(view)
+                        if not read:
+                            break
+                        chunk = view[:read]
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        feed(done, chunk)
+                        done += read
+
+                        now = time.monotonic()
+                        if progress and now - last_report >= PROGRESS_INTERVAL:
+                            last_report = now
+                            progress(done, total, *self._rate(done - offset, now - started, total, done))
+            finally:
+                # Interrupted attempts count too: their bytes went over the network
+                tracing.current_span().add_bytes(done - offset)
+
+        if total is not None and done < total:
+            raise http.client.IncompleteRead(b"", total - done)
+        feed.finish()
+
+        if progress:
+            progress(done, total, *self._rate(done - offset, time.monotonic() - started, total, done))
+
+        digest = hasher.hexdigest()
+        if sha256 and digest.lower() != sha256.lower():
+            part_file.unlink(missing_ok=True)
+            meta_file.unlink(missing_ok=True)
+            raise ChecksumError(f"Checksum mismatch for {url}: expected {sha256}, got {digest}")
+
+        os.replace(part_file, dest)
+        meta_file.unlink(missing_ok=True)
+        return DownloadResult(dest, done, digest, offset, meta["etag"], meta["last_modified"])
+
+    @staticmethod
+    def _rate(transferred: int, elapsed: float, total: Optional[int], done: int):
+        rate = transferred / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if total is not None and rate > 0 else None
+        return rate, eta
+
+    def _hash_file(self, path: Path, hasher, feed: Callable[[int, memoryview], None]):
+        position = 0
+        for chunk in read_chunks(path, self.chunk_size):
+            hasher.update(chunk)
+            feed(position, chunk)
+            position += len(chunk)
+
+    @staticmethod
+    def _read_meta(meta_file: Path) -> Dict[str, Optional[str]]:
+        try:
+            return json.loads(meta_file.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_meta(meta_file: Path, meta: Dict[str, Optional[str]]):
+        meta_file.write_text(json.dumps(meta))
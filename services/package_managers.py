@@ -0,0 +1,226 @@
+import glob
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Type
+
+from services.command_runner import stream_command
+from services.privileged_session import HelperResult, PrivilegedError, PrivilegedSession
+
+OS_RELEASE = "/etc/os-release"
+INDEX_CACHE_FORMAT = 1
+# Answers to "does the distro ship this package" only change when the package lists do, or after this long
+AVAILABILITY_TTL = 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+
+class PackageManagerError(Exception):
+    pass
+
+
+def read_os_release(path: str = OS_RELEASE) -> Dict[str, str]:
+    fields = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, sep, value = line.strip().partition("=")
+                if sep:
+                    fields[key] = value.strip("\"'")
+    except OSError:
+        pass
+    return fields
+
+
+class PackageManager:
+    name = ""
+    binary = ""
+    distro_ids: Sequence[str] = ()
+    build_dependencies: List[str] = []
+    # How old the local package lists may get before an install refreshes them; None never refreshes
+    index_max_age: Optional[float] = None
+
+    def __init__(self, cache_file: Path, privileged: PrivilegedSession):
+        self.cache_file = cache_file
+        self.privileged = privileged
+        self._cache: Optional[dict] = None
+
+    def python_package(self, version: str) -> str:
+        return f"python{version}"
+
+    def available(self, packages: List[str]) -> Set[str]:
+        cache = self._load()
+        now = time.time()
+        answers = cache["packages"]
+        unknown = [
+            package for package in packages if now - answers.get(package, {}).get("checked", 0) > AVAILABILITY_TTL
+        ]
+        if unknown:
+            found = self._query_available(unknown)
+            for package in unknown:
+                answers[package] = {"available": package in found, "checked": now}
+            self._save()
+        return {package for package in packages if answers[package]["available"]}
+
+    def installed(self, packages: List[str]) -> Set[str]:
+        # Never cached: packages come and go outside of this tool
+        return self._query_installed(packages)
+
+    def install(self, packages: List[str]) -> List[str]:
+        # Returns what actually had to be installed; nothing runs privileged when everything is present
+        installed = self.installed(packages)
+        missing = [package for package in packages if package not in installed]
+        if not missing:
+            return []
+        if self.index_max_age is not None and self._index_age() > self.index_max_age:
+            self.refresh_index()
+        result = self._run_privileged("install-packages", packages=missing)
+        if result.returncode != 0:
+            raise PackageManagerError(f"{self.name} could not install {', '.join(missing)}: {result.output[-1]}")
+        return missing
+
+    def refresh_index(self):
+        result = self._run_privileged("refresh-index")
+        if result.returncode != 0:
+            raise PackageManagerError(f"{self.name} could not refresh its package lists: {result.output[-1]}")
+        cache = self._load()
+        cache["refreshed"] = time.time()
+        # New lists may add or drop packages
+        cache["packages"] = {}
+        cache["index_stamp"] = self._index_stamp()
+        self._save()
+
+    def _index_age(self) -> float:
+        cache = self._load()
+        return time.time() - max(self._index_stamp() or 0, cache.get("refreshed", 0))
+
+    def _index_stamp(self) -> Optional[float]:
+        raise NotImplementedError
+
+    def _query_available(self, packages: List[str]) -> Set[str]:
+        raise NotImplementedError
+
+    def _query_installed(self, packages: List[str]) -> Set[str]:
+        raise NotImplementedError
+
+    def _run_privileged(self, command: str, **args) -> HelperResult:
+        # The helper builds the actual apt-get/pacman command line from its own whitelist
+        try:
+            result = self.privileged.run(command, manager=self.name, **args)
+        except PrivilegedError as e:
+            raise PackageManagerError(str(e)) from e
+        if not result.output:
+            result.output.append(f"exit status {result.returncode}")
+        return result
+
+    def _run(self, cmd: List[str]) -> str:
+        return stream_command(cmd, stdin=subprocess.DEVNULL, env=dict(os.environ, LC_ALL="C")).stdout
+
+    def _load(self) -> dict:
+        # Read once per process, but checked against the package lists on every use: the GUI lives through
+        # refreshes by other jobs or by hand
+        stamp = self._index_stamp()
+        cache = self._cache
+        if cache is None:
+            try:
+                cache = json.loads(self.cache_file.read_text())
+                if cache.get("format") != INDEX_CACHE_FORMAT or cache.get("backend") != self.name:
+                    raise ValueError("stale format")
+            except (OSError, ValueError, AttributeError):
+                cache = {"format": INDEX_CACHE_FORMAT, "backend": self.name, "index_stamp": stamp, "packages": {}}
+        # The package lists changed since: every availability answer may be wrong
+        if cache.get("index_stamp") != stamp:
+            cache["packages"] = {}
+            cache["index_stamp"] = stamp
+        self._cache = cache
+        return cache
+
+    def _save(self):
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(json.dumps(self._cache))
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.warning(f"Could not write package cache {self.cache_file}: {e}")
+
+
+class Pacman(PackageManager):
+    name = "pacman"
+    binary = "pacman"
+    distro_ids = ("arch",)
+    build_dependencies = ["base-devel", "wget", "tk"]
+    # No index_max_age: refreshing the databases without upgrading leaves Arch partially upgraded
+    sync_dir = "/var/lib/pacman/sync"
+
+    def _index_stamp(self) -> Optional[float]:
+        mtimes = [os.stat(path).st_mtime for path in glob.glob(os.path.join(self.sync_dir, "*.db"))]
+        return max(mtimes) if mtimes else None
+
+    def _query_available(self, packages: List[str]) -> Set[str]:
+        # -Si prints a "Name : pkg" block for every package the sync databases know
+        output = self._run(["pacman", "-Si", *packages])
+        return set(re.findall(r"^Name\s*:\s*(\S+)", output, re.MULTILINE)) & set(packages)
+
+    def _query_installed(self, packages: List[str]) -> Set[str]:
+        output = self._run(["pacman", "-Q", *packages])
+        return {line.split()[0] for line in output.splitlines() if line.strip()} & set(packages)
+
+
+class Apt(PackageManager):
+    name = "apt"
+    binary = "apt-get"
+    distro_ids = ("debian", "ubuntu")
+    build_dependencies = ["build-essential", "wget", "tk-dev", "libssl-dev"]
+    index_max_age = 6 * 3600
+    lists_dir = "/var/lib/apt/lists"
+
+    def _index_stamp(self) -> Optional[float]:
+        try:
+            return os.stat(self.lists_dir).st_mtime
+        except OSError:
+            return None
+
+    def _policy(self, packages: List[str]) -> Dict[str, Dict[str, str]]:
+        # One `apt-cache policy` answers both questions for every package at once
+        policies = {}
+        current = None
+        for line in self._run(["apt-cache", "policy", *packages]).splitlines():
+            if line and not line[0].isspace() and line.endswith(":"):
+                current = policies.setdefault(line[:-1], {})
+            elif current is not None and ":" in line and line.startswith("  ") and not line.startswith("   "):
+                key, _, value = line.strip().partition(":")
+                current[key] = value.strip()
+        return policies
+
+    def _query_available(self, packages: List[str]) -> Set[str]:
+        policies = self._policy(packages)
+        return {package for package in packages if policies.get(package, {}).get("Candidate", "(none)") != "(none)"}
+
+    def _query_installed(self, packages: List[str]) -> Set[str]:
+        policies = self._policy(packages)
+        return {package for package in packages if policies.get(package, {}).get("Installed", "(none)") != "(none)"}
+
+
+BACKENDS: List[Type[PackageManager]] = [Pacman, Apt]
+
+
+def detect_package_manager(
+    cache_file: Path, privileged: PrivilegedSession, os_release: str = OS_RELEASE
+) -> Optional[PackageManager]:
+    # The distro's own manager first; a foreign one that merely happens to be installed only as a fallback
+    release = read_os_release(os_release)
+    distro_ids = {release.get("ID", "")} | set(release.get("ID_LIKE", "").split())
+    installed = [backend for backend in BACKENDS if shutil.which(backend.binary)]
+    for backend in installed:
+        if distro_ids & set(backend.distro_ids):
+            return backend(cache_file, privileged)
+    if installed:
+        logger.info(f"Unrecognized distribution {release.get('ID')}, using {installed[0].name}")
+        return installed[0](cache_file, privileged)
+    return None
@@ -0,0 +1,299 @@
+import hashlib
+import json
+import os
+import pwd
+import re
+import signal
+import stat
+import subprocess
+import sys
+import tarfile
+import threading
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+# Runs as root for a whole session, started once through pkexec by privileged_session.py, so it must only use the
+# standard library. It reads one JSON message per line on stdin and only runs the commands listed in COMMANDS,
+# with every argument validated; "data" messages are followed by that many raw bytes for the command's stdin.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VSCODE_SCRIPT = os.path.join(SCRIPT_DIR, "update_vscode_root.sh")
+PACKAGE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9+._-]*$")
+SNAPSHOT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+SHA256_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+MAX_DATA_SIZE = 16 * 1024 * 1024
+# Build archives hold the DESTDIR of `make altinstall` with the default prefix; nothing outside it is installed
+BUILD_PREFIX = "usr/local"
+# Let a stand-in helper work on a scratch VSCode tree; never honoured once a launcher elevated it for another user
+STAND_IN_VARIABLES = ("DEV_TOOLS_VSCODE_PATH", "DEV_TOOLS_VSCODE_BACKUP_DIR")
+ELEVATION_MARKERS = ("PKEXEC_UID", "SUDO_UID", "DOAS_USER")
+
+
+# What a command reads: subprocess.PIPE for "data" messages, subprocess.DEVNULL, or a file the helper opened
+Stdin = Union[int, BinaryIO]
+
+
+class Rejected(Exception):
+    pass
+
+
+def _name(value, pattern=SNAPSHOT_NAME) -> str:
+    if not isinstance(value, str) or not pattern.match(value):
+        raise Rejected(f"Invalid argument: {value!r}")
+    return value
+
+
+def _packages(args: dict) -> List[str]:
+    packages = args.get("packages")
+    if not isinstance(packages, list) or not packages:
+        raise Rejected("No packages given")
+    return [_name(package, PACKAGE_NAME) for package in packages]
+
+
+def _invoking_uid() -> int:
+    if os.environ.get("PKEXEC_UID", "").isdigit():
+        return int(os.environ["PKEXEC_UID"])
+    if os.environ.get("SUDO_UID", "").isdigit():
+        return int(os.environ["SUDO_UID"])
+    if os.environ.get("DOAS_USER"):
+        try:
+            return pwd.getpwnam(os.environ["DOAS_USER"]).pw_uid
+        except KeyError:
+            pass
+    return os.getuid()
+
+
+def _owned_safely(st: os.stat_result) -> bool:
+    # Only root and the user who started the session may be able to change what gets installed
+    return st.st_uid in (0, _invoking_uid()) and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _command_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    if os.geteuid() == 0 and any(marker in env for marker in ELEVATION_MARKERS):
+        for name in STAND_IN_VARIABLES:
+            env.pop(name, None)
+    return env
+
+
+def _vscode_update(args: dict) -> Tuple[List[str], Stdin]:
+    # The archive arrives on stdin while it downloads
+    return ["/bin/bash", VSCODE_SCRIPT, _name(args.get("timestamp")), "-"], subprocess.PIPE
+
+
+def _vscode_restore(args: dict) -> Tuple[List[str], Stdin]:
+    argv = ["/bin/bash", VSCODE_SCRIPT, "restore", _name(args.get("snapshot")), _name(args.get("timestamp"))]
+    return argv, subprocess.DEVNULL
+
+
+def _install_packages(args: dict) -> Tuple[List[str], Stdin]:
+    manager = args.get("manager")
+    if manager == "apt":
+        return ["apt-get", "install", "-y", "--", *_packages(args)], subprocess.DEVNULL
+    if manager == "pacman":
+        return ["pacman", "-S", "--noconfirm", "--needed", "--", *_packages(args)], subprocess.DEVNULL
+    raise Rejected(f"Unsupported package manager: {manager!r}")
+
+
+def _refresh_index(args: dict) -> Tuple[List[str], Stdin]:
+    if args.get("manager") == "apt":
+        return ["apt-get", "update"], subprocess.DEVNULL
+    raise Rejected(f"Unsupported package manager: {args.get('manager')!r}")
+
+
+def _in_prefix(path: str) -> bool:
+    return path == BUILD_PREFIX or path.startswith(BUILD_PREFIX + "/")
+
+
+def _check_build_members(archive: BinaryIO):
+    # Every path must stay below BUILD_PREFIX, and so must what links point to; tar would otherwise follow them
+    try:
+        with tarfile.open(fileobj=archive, mode="r:gz") as tar:
+            for member in tar:
+                name = member.name.rstrip("/")
+                while name.startswith("./"):
+                    name = name[2:]
+                if not name or os.path.isabs(name) or ".." in name.split("/"):
+                    raise Rejected(f"Unsafe path in build archive: {member.name!r}")
+                if member.isdir() and (BUILD_PREFIX + "/").startswith(name + "/"):
+                    # usr and usr/local themselves; --no-overwrite-dir keeps their metadata
+                    continue
+                if not name.startswith(BUILD_PREFIX + "/"):
+                    raise Rejected(f"Build archive installs outside /{BUILD_PREFIX}: {member.name!r}")
+                if member.issym():
+                    target = os.path.normpath(os.path.join(os.path.dirname(name), member.linkname))
+                elif member.islnk():
+                    target = os.path.normpath(member.linkname)
+                elif member.isfile() or member.isdir():
+                    continue
+                else:
+                    raise Rejected(f"Unsupported member in build archive: {member.name!r}")
+                if os.path.isabs(member.linkname) or not _in_prefix(target):
+                    raise Rejected(f"Link leaves /{BUILD_PREFIX} in build archive: {member.name!r}")
+    except (tarfile.TarError, OSError, EOFError) as e:
+        raise Rejected(f"Unreadable build archive: {e}") from e
+
+
+def _install_build(args: dict) -> Tuple[List[str], Stdin]:
+    # A DESTDIR build of `make altinstall`, archived by the build cache; files become root-owned and existing
+    # directories such as /usr keep their metadata. Only an archive directly inside the build cache directory is
+    # accepted, both owned by root or the user and writable by nobody else, and its digest must match the one the
+    # user recorded when storing or verifying it
+    archive, cache_dir, digest = args.get("archive"), args.get("cache_dir"), args.get("sha256")
+    if not isinstance(cache_dir, str) or not os.path.isabs(cache_dir):
+        raise Rejected(f"Invalid build cache directory: {cache_dir!r}")
+    if not isinstance(archive, str) or not os.path.isabs(archive) or not archive.endswith(".tar.gz"):
+        raise Rejected(f"Invalid build archive: {archive!r}")
+    if not isinstance(digest, str) or not SHA256_DIGEST.match(digest):
+        raise Rejected(f"Invalid build archive digest: {digest!r}")
+    cache_dir = os.path.realpath(cache_dir)
+    try:
+        cache_stat = os.stat(cache_dir)
+    except OSError as e:
+        raise Rejected(f"Build cache directory not found: {cache_dir}") from e
+    if not stat.S_ISDIR(cache_stat.st_mode) or not _owned_safely(cache_stat):
+        raise Rejected(f"Build cache directory is writable by other users: {cache_dir}")
+    archive = os.path.realpath(archive)
+    if os.path.dirname(archive) != cache_dir or not archive.endswith(".tar.gz"):
+        raise Rejected(f"Build archive outside the build cache: {archive}")
+
+    try:
+        f = os.fdopen(os.open(archive, os.O_RDONLY | os.O_NOFOLLOW), "rb")
+    except OSError as e:
+        raise Rejected(f"Build archive not found: {archive}") from e
+    try:
+        archive_stat = os.fstat(f.fileno())
+        if not stat.S_ISREG(archive_stat.st_mode) or not _owned_safely(archive_stat):
+            raise Rejected(f"Build archive is writable by other users: {archive}")
+        hasher = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+        if hasher.hexdigest() != digest:
+            raise Rejected(f"Build archive does not match its recorded digest: {archive}")
+        f.seek(0)
+        _check_build_members(f)
+        # tar reads the very file that was checked, not whatever the path points to by now
+        f.seek(0)
+    except BaseException:
+        f.close()
+        raise
+    return ["tar", "-xzf", "-", "-C", "/", "--no-same-owner", "--no-overwrite-dir"], f
+
+
+COMMANDS: Dict[str, Callable[[dict], Tuple[List[str], Stdin]]] = {
+    "vscode-update": _vscode_update,
+    "vscode-restore": _vscode_restore,
+    "install-packages": _install_packages,
+    "refresh-index": _refresh_index,
+    "install-build": _install_build,
+}
+
+
+class Helper:
+    def __init__(self, stdin, stdout):
+        self._stdin = stdin
+        self._stdout = stdout
+        self._write_lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+
+    def send(self, message: dict):
+        with self._write_lock:
+            self._stdout.write(json.dumps(message).encode() + b"\n")
+            self._stdout.flush()
+
+    def serve(self):
+        self.send({"type": "ready", "uid": os.getuid()})
+        while True:
+            line = self._stdin.readline()
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            kind = message.get("type")
+            if kind == "data":
+                size = int(message.get("size", 0))
+                if not 0 <= size <= MAX_DATA_SIZE:
+                    break
+                # Always consumed, even when no command wants it any more
+                self._write_input(self._stdin.read(size))
+            elif kind == "eof":
+                self._close_input()
+            elif kind == "cancel":
+                self._cancel()
+            elif kind == "run":
+                self._run(message.get("command"), message.get("args") or {})
+        # The session ended (or its client died): a running command still finishes, e.g. a VSCode swap half done
+        self._close_input()
+        if self._process:
+            self._process.wait()
+
+    def _run(self, command, args: dict):
+        if self._process and self._process.poll() is None:
+            self.send({"type": "rejected", "message": "Another command is still running"})
+            return
+        try:
+            if command not in COMMANDS:
+                raise Rejected(f"Unknown command: {command!r}")
+            argv, stdin = COMMANDS[command](args)
+            try:
+                process = subprocess.Popen(
+                    argv,
+                    stdin=stdin,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    cwd="/",
+                    env=_command_env(),
+                    start_new_session=True,
+                )
+            finally:
+                if not isinstance(stdin, int):
+                    stdin.close()
+        except (Rejected, OSError) as e:
+            self.send({"type": "rejected", "message": str(e)})
+            return
+        self._process = process
+        threading.Thread(target=self._pump, args=(process,), daemon=True).start()
+
+    def _pump(self, process: subprocess.Popen):
+        for raw in process.stdout:
+            self.send({"type": "output", "line": raw.decode(errors="replace").rstrip("\n")})
+        self.send({"type": "exit", "returncode": process.wait()})
+
+    def _write_input(self, payload: bytes):
+        process = self._process
+        if process and process.stdin and not process.stdin.closed:
+            try:
+                process.stdin.write(payload)
+            except BrokenPipeError:
+                pass
+
+    def _close_input(self):
+        process = self._process
+        if process and process.stdin and not process.stdin.closed:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def _cancel(self):
+        process = self._process
+        if process and process.poll() is None:
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def main(argv: List[str]) -> int:
+    if argv[1:] != ["serve"]:
+        print(f"Usage: {argv[0]} serve", file=sys.stderr)
+        return 2
+    # Files the commands create get the usual root permissions, whatever the user's umask
+    os.umask(0o022)
+    Helper(sys.stdin.buffer, sys.stdout.buffer).serve()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, Optional, Sequence
+
+from services import tracing
+from services.command_runner import OUTPUT_TAIL_LINES, JobCancelled, bind_context, emit_output, is_cancelled
+
+HELPER_SCRIPT = Path(__file__).parent / "privileged_helper.py"
+# Largest stdin chunk per message; the helper refuses anything bigger
+DATA_CHUNK_SIZE = 1024 * 1024
+CANCEL_POLL_INTERVAL = 0.2
+
+logger = logging.getLogger(__name__)
+
+
+class PrivilegedError(Exception):
+    pass
+
+
+@dataclass
+class HelperResult:
+    returncode: int
+    output: Deque[str] = field(default_factory=deque)
+
+    @property
+    def stdout(self) -> str:
+        return "".join(f"{line}\n" for line in self.output)
+
+
+def system_python() -> str:
+    # The helper runs as root: never through a user-writable venv interpreter
+    for candidate in ("/usr/bin/python3", "/usr/local/bin/python3"):
+        if os.access(candidate, os.X_OK):
+            return candidate
+    return shutil.which("python3") or sys.executable
+
+
+class PrivilegedRequest:
+    def __init__(self, session: "PrivilegedSession", command: str):
+        self._session = session
+        self._span = tracing.span(f"privileged.{command}")
+        self._done = threading.Event()
+        self._input_closed = False
+        self._waited = False
+        self._emit = bind_context(emit_output)
+        self.result = HelperResult(-1, deque(maxlen=OUTPUT_TAIL_LINES))
+        self.rejected: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def write(self, chunk: bytes):
+        # Same contract as a pipe to the command: BrokenPipeError once it no longer reads
+        if self.done or self._input_closed:
+            raise BrokenPipeError("Privileged command is no longer reading its input")
+        for start in range(0, len(chunk), DATA_CHUNK_SIZE):
+            part = chunk[start : start + DATA_CHUNK_SIZE]
+            self._session._send({"type": "data", "size": len(part)}, part)
+            self._span.add_bytes(len(part))
+
+    def close(self):
+        if not self._input_closed:
+            self._input_closed = True
+            if not self.done:
+                self._session._send({"type": "eof"})
+
+    def wait(self, cancellable: bool = True) -> HelperResult:
+        # Cancelling the job terminates the privileged command; with cancellable=False it is left to finish,
+        # for commands that abort cleanly on their own once their input is cut short
+        try:
+            cancel_sent = False
+            while not self._done.wait(CANCEL_POLL_INTERVAL):
+                if cancellable and not cancel_sent and is_cancelled():
+                    self._session._send({"type": "cancel"})
+                    cancel_sent = True
+            self._span.record_process(self.result.returncode, 0.0, 0)
+            if self.rejected is not None:
+                raise PrivilegedError(self.rejected)
+            if cancel_sent:
+                raise JobCancelled()
+            return self.result
+        except BaseException as e:
+            self._span.fail(e)
+            raise
+        finally:
+            self._waited = True
+            self._span.finish()
+            self._session._finish(self)
+
+    def __enter__(self) -> "PrivilegedRequest":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Leaving the block without wait(), e.g. on an error while feeding the input, still ends the request and
+        # releases the session; the command sees its input end and is left to finish
+        if self._waited:
+            return
+        try:
+            self.close()
+        except OSError:
+            pass
+        try:
+            self.wait(cancellable=False)
+        except PrivilegedError:
+            if exc is None:
+                raise
+
+    def _output(self, line: str):
+        self.result.output.append(line)
+        self._emit([line])
+
+    def _exit(self, returncode: int, rejected: Optional[str] = None):
+        self.result.returncode = returncode
+        self.rejected = rejected
+        self._done.set()
+
+
+class PrivilegedSession:
+    # One helper process authorized once (a single pkexec prompt) and reused by every privileged step. Commands
+    # run one at a time; with persistent=False the helper is started and stopped around each command instead
+    def __init__(self, launcher: Sequence[str] = ("pkexec",), persistent: bool = True, python: Optional[str] = None):
+        self.launcher = list(launcher)
+        self.persistent = persistent
+        self.python = python or system_python()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._ready = threading.Event()
+        self._current: Optional[PrivilegedRequest] = None
+        self._startup_error: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self._process is not None and self._process.poll() is None and self._ready.is_set()
+
+    def start(self, command: str, **args) -> PrivilegedRequest:
+        # The session stays locked to this request until its wait() returns
+        self._lock.acquire()
+        try:
+            self._ensure_started()
+            request = PrivilegedRequest(self, command)
+            self._current = request
+            self._send({"type": "run", "command": command, "args": args})
+            return request
+        except BaseException:
+            self._current = None
+            self._lock.release()
+            raise
+
+    def run(self, command: str, **args) -> HelperResult:
+        with self.start(command, **args) as request:
+            request.close()
+            return request.wait()
+
+    def close(self):
+        process = self._process
+        if not process:
+            return
+        self._process = None
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            logger.warning("Privileged helper did not exit, leaving it to finish on its own")
+
+    def _ensure_started(self):
+        if self._process and self._process.poll() is None:
+            return
+        # Mostly the time the user takes to answer the password prompt
+        with tracing.span("privileged.auth"):
+            self._launch()
+
+    def _launch(self):
+        cmd = self.launcher + [self.python, "-E", "-s", str(HELPER_SCRIPT), "serve"]
+        self._ready.clear()
+        self._startup_error = None
+        # Its own session: cancelling a job or Ctrl-C in a terminal must not hit the root helper directly
+        self._process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True
+        )
+        threading.Thread(target=self._read, args=(self._process,), daemon=True).start()
+        threading.Thread(target=self._read_errors, args=(self._process,), daemon=True).start()
+        # Waits for the password prompt to be answered
+        while not self._ready.wait(CANCEL_POLL_INTERVAL):
+            if self._process.poll() is not None:
+                self._process = None
+                raise PrivilegedError(f"Authorization failed: {self._startup_error or 'helper exited'}")
+            if is_cancelled():
+                self.close()
+                raise JobCancelled()
+
+    def _read(self, process: subprocess.Popen):
+        for raw in process.stdout:
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+            kind = message.get("type")
+            request = self._current
+            if kind == "ready":
+                self._ready.set()
+            elif request and kind == "output":
+                request._output(message.get("line", ""))
+            elif request and kind == "exit":
+                request._exit(message.get("returncode", -1))
+            elif request and kind == "rejected":
+                request._exit(-1, message.get("message", "rejected"))
+        process.wait()
+        request = self._current
+        if request and not request.done:
+            request._exit(-1, f"Privileged helper exited ({process.returncode})")
+
+    def _read_errors(self, process: subprocess.Popen):
+        for raw in process.stderr:
+            line = raw.decode(errors="replace").strip()
+            if line:
+                self._startup_error = line
+                logger.warning(f"Privileged helper: {line}")
+
+    def _send(self, message: dict, payload: bytes = b""):
+        process = self._process
+        if not process:
+            raise BrokenPipeError("Privileged helper is not running")
+        with self._write_lock:
+            process.stdin.write(json.dumps(message).encode() + b"\n" + payload)
+            process.stdin.flush()
+
+    def _finish(self, request: PrivilegedRequest):
+        if self._current is request:
+            self._current = None
+            if not self.persistent:
+                self.close()
+            self._lock.release()
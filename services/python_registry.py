@@ -0,0 +1,353 @@
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import stat
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services import tracing
+
+REGISTRY_FORMAT = 2
+NAME_VERSION_PATTERN = re.compile(r"python(\d+\.\d+(?:\.\d+)?)")
+PROBE_TIMEOUT = 5.0
+PROBE_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+PROBE_FIELDS = {"ok", "version", "implementation", "architecture", "has_venv", "has_ensurepip"}
+
+# Runs inside the probed interpreter, so it must stay valid for Python 2 as well
+PROBE_SCRIPT = """
+import json, platform, sys
+try:
+    from importlib.util import find_spec
+    def has(name):
+        return find_spec(name) is not None
+except ImportError:
+    import imp
+    def has(name):
+        try:
+            imp.find_module(name)
+            return True
+        except ImportError:
+            return False
+sys.stdout.write("DEVTOOLS-PROBE " + json.dumps({
+    "version": platform.python_version(),
+    "implementation": platform.python_implementation(),
+    "architecture": platform.machine(),
+    "has_venv": has("venv"),
+    "has_ensurepip": has("ensurepip"),
+}) + "\\n")
+"""
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Interpreter:
+    path: str
+    mtime_ns: int
+    size: int
+    inode: int
+    ok: bool = False
+    version: str = ""
+    implementation: str = ""
+    architecture: str = ""
+    has_venv: bool = False
+    has_ensurepip: bool = False
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    @property
+    def full_version(self) -> Optional[str]:
+        return self.version if self.ok and self.version else None
+
+    @property
+    def version_output(self) -> str:
+        if not self.full_version:
+            return ""
+        if self.implementation and self.implementation != "CPython":
+            return f"Python {self.version} ({self.implementation})"
+        return f"Python {self.version}"
+
+    @property
+    def detected_version(self) -> Optional[str]:
+        # Versioned names (python3.11) are trusted as-is, like the original scan did
+        match = NAME_VERSION_PATTERN.match(self.name)
+        return match.group(1) if match else self.full_version
+
+    def matches(self, st: os.stat_result) -> bool:
+        return (self.mtime_ns, self.size, self.inode) == (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def probe_interpreter(path: str, timeout: float = PROBE_TIMEOUT) -> dict:
+    with tracing.span("python.probe", path=path) as span:
+        facts = _probe_interpreter(path, timeout)
+        span.set(ok=facts["ok"])
+        return facts
+
+
+def _probe_interpreter(path: str, timeout: float) -> dict:
+    try:
+        process = subprocess.Popen(
+            [path, "-E", "-s", "-c", PROBE_SCRIPT],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            start_new_session=True,
+        )
+    except OSError as e:
+        logger.debug(f"Probe of {path} failed to start: {e}")
+        return {"ok": False}
+
+    try:
+        stdout, _ = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # Kill the whole session so a wrapper script cannot keep the pipe open
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        process.communicate()
+        logger.warning(f"Probe of {path} timed out after {timeout}s")
+        return {"ok": False}
+
+    if process.returncode != 0:
+        return {"ok": False}
+    for line in stdout.splitlines():
+        if line.startswith("DEVTOOLS-PROBE "):
+            try:
+                facts = json.loads(line[len("DEVTOOLS-PROBE ") :])
+            except ValueError:
+                break
+            facts["ok"] = True
+            return facts
+    return {"ok": False}
+
+
+def probe_interpreters(
+    paths: List[str], timeout: float = PROBE_TIMEOUT, max_workers: int = PROBE_WORKERS
+) -> Dict[str, dict]:
+    if not paths:
+        return {}
+    parent = tracing.current_span()
+
+    def probe(path: str) -> dict:
+        with tracing.activate(parent):
+            return probe_interpreter(path, timeout)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        results = executor.map(probe, paths)
+        return dict(zip(paths, results))
+
+
+def _version_key(version: str) -> Tuple[int, ...]:
+    return tuple(map(int, version.split(".")))
+
+
+class InterpreterIndex:
+    def __init__(self, registry: "InterpreterRegistry", interpreters: List[Interpreter]):
+        self._registry = registry
+        self.interpreters = interpreters
+        self._resolved: Dict[str, Optional[Tuple[str, Interpreter]]] = {}
+
+    @property
+    def executables(self) -> List[Path]:
+        return [Path(interpreter.path) for interpreter in self.interpreters]
+
+    def versions(self) -> List[str]:
+        found = {interpreter.detected_version for interpreter in self.interpreters}
+        found.discard(None)
+        return sorted(found, key=_version_key)
+
+    def resolve(self, version: str) -> Optional[Tuple[str, Interpreter]]:
+        if version not in self._resolved:
+            self._resolved[version] = self._resolve(version)
+        return self._resolved[version]
+
+    def _resolve(self, version: str) -> Optional[Tuple[str, Interpreter]]:
+        python_cmd = f"python{version}"
+        on_path = shutil.which(python_cmd)
+        if on_path:
+            interpreter = self._registry.lookup(os.path.realpath(on_path))
+            if interpreter:
+                return python_cmd, interpreter
+
+        for interpreter in self.interpreters:
+            full_version = interpreter.full_version
+            if full_version and (full_version == version or full_version.startswith(f"{version}.")):
+                return interpreter.name, interpreter
+
+        return None
+
+
+class InterpreterRegistry:
+    def __init__(self, cache_file: Path, probe: Callable[[List[str]], Dict[str, dict]] = probe_interpreters):
+        self.cache_file = cache_file
+        self._probe = probe
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dirs: Dict[str, dict] = {}
+        self._interpreters: Dict[str, Interpreter] = {}
+        self._order: List[str] = []
+        self._index: Optional[InterpreterIndex] = None
+
+    def index(self, search_paths: List[str]) -> InterpreterIndex:
+        with self._lock, tracing.span("python.interpreter-index"):
+            self._load()
+            order, changed = self._refresh(search_paths)
+            if changed:
+                self._save()
+            if changed or order != self._order or self._index is None:
+                self._order = order
+                self._index = InterpreterIndex(self, [self._interpreters[path] for path in order])
+            return self._index
+
+    def lookup(self, real_path: str) -> Optional[Interpreter]:
+        with self._lock:
+            self._load()
+            interpreter, changed = self._validate(real_path)
+            if changed:
+                self._save()
+            return interpreter
+
+    def _refresh(self, search_paths: List[str]) -> Tuple[List[str], bool]:
+        changed = False
+        dirs = {}
+        order = []
+
+        for directory in search_paths:
+            try:
+                st = os.stat(directory)
+            except OSError:
+                continue
+            if not stat.S_ISDIR(st.st_mode):
+                continue
+
+            cached = self._dirs.get(directory)
+            if cached and cached["mtime_ns"] == st.st_mtime_ns:
+                candidates = cached["candidates"]
+            else:
+                candidates = self._scan_dir(directory)
+                changed = True
+            dirs[directory] = {"mtime_ns": st.st_mtime_ns, "candidates": candidates}
+
+            for real_path in candidates:
+                if real_path not in order:
+                    order.append(real_path)
+
+        for directory in self._dirs:
+            if directory not in dirs and directory not in search_paths:
+                dirs[directory] = self._dirs[directory]
+        self._dirs = dirs
+
+        for real_path in list(self._interpreters):
+            if real_path not in order:
+                _, stale = self._validate(real_path, probe=False)
+                changed = changed or stale
+
+        pending = []
+        for real_path in order:
+            interpreter, stale = self._validate(real_path, probe=False)
+            changed = changed or stale
+            if interpreter is None and os.path.exists(real_path):
+                pending.append(real_path)
+        changed = changed or bool(pending)
+        self._probe_all(pending)
+
+        present = [real_path for real_path in order if real_path in self._interpreters]
+        return present, changed
+
+    def _validate(self, real_path: str, probe: bool = True) -> Tuple[Optional[Interpreter], bool]:
+        cached = self._interpreters.get(real_path)
+        try:
+            st = os.stat(real_path)
+        except OSError:
+            if cached:
+                del self._interpreters[real_path]
+                return None, True
+            return None, False
+
+        if cached and cached.matches(st):
+            return cached, False
+        if cached:
+            del self._interpreters[real_path]
+        if not probe:
+            return None, cached is not None
+
+        self._probe_all([real_path])
+        return self._interpreters.get(real_path), True
+
+    def _probe_all(self, paths: List[str]):
+        stats = {}
+        for path in paths:
+            try:
+                stats[path] = os.stat(path)
+            except OSError:
+                continue
+
+        facts = self._probe(list(stats))
+        for path, st in stats.items():
+            fields = {key: value for key, value in facts.get(path, {}).items() if key in PROBE_FIELDS}
+            self._interpreters[path] = Interpreter(path, st.st_mtime_ns, st.st_size, st.st_ino, **fields)
+
+    @staticmethod
+    def _scan_dir(directory: str) -> List[str]:
+        candidates = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.name.startswith("python"):
+                        continue
+                    try:
+                        if not entry.is_file() or not os.access(entry.path, os.X_OK):
+                            continue
+                    except OSError:
+                        continue
+                    real_path = os.path.realpath(entry.path)
+                    if real_path not in candidates:
+                        candidates.append(real_path)
+        except OSError:
+            pass
+        return candidates
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            data = json.loads(self.cache_file.read_text())
+            if data.get("format") != REGISTRY_FORMAT:
+                return
+            self._dirs = data["dirs"]
+            self._interpreters = {
+                path: Interpreter(path=path, **fields) for path, fields in data["interpreters"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Ignoring unreadable interpreter registry {self.cache_file}: {e}")
+            self._dirs = {}
+            self._interpreters = {}
+
+    def _save(self):
+        interpreters = {}
+        for path, interpreter in self._interpreters.items():
+            fields = asdict(interpreter)
+            del fields["path"]
+            interpreters[path] = fields
+
+        data = {"format": REGISTRY_FORMAT, "dirs": self._dirs, "interpreters": interpreters}
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(json.dumps(data, indent=1))
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.warning(f"Could not write interpreter registry {self.cache_file}: {e}")
@@ -0,0 +1,167 @@
+import csv
+import os
+import time
+from array import array
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.system_probes import read_meminfo
+
+DEFAULT_CAPACITY = 600
+# Partitions, device-mapper and md devices repeat I/O that is already counted on the underlying disk
+VIRTUAL_DISK_PREFIXES = ("loop", "ram", "zram", "dm-", "md")
+SECTOR_SIZE = 512
+
+
+@dataclass
+class ResourceSample:
+    timestamp: float
+    cpu_percent: float
+    iowait_percent: float
+    memory_percent: float
+    swap_used_bytes: float
+    disk_read_bps: float
+    disk_write_bps: float
+    job_cpu_percent: float
+    job_rss_bytes: float
+
+
+METRICS = [field.name for field in fields(ResourceSample)]
+
+
+class RingBuffer:
+    # Fixed-size array of doubles: appending never allocates once the buffer is full
+    def __init__(self, capacity: int):
+        self._data = array("d", bytes(8 * capacity))
+        self._capacity = capacity
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: float):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self._capacity
+        self._count = min(self._count + 1, self._capacity)
+
+    def values(self) -> List[float]:
+        if self._count < self._capacity:
+            return self._data[: self._count].tolist()
+        return self._data[self._next :].tolist() + self._data[: self._next].tolist()
+
+    def last(self) -> Optional[float]:
+        return self._data[self._next - 1] if self._count else None
+
+
+class ResourceHistory:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.series: Dict[str, RingBuffer] = {name: RingBuffer(capacity) for name in METRICS}
+
+    def record(self, sample: ResourceSample):
+        for name, value in asdict(sample).items():
+            self.series[name].append(value)
+
+    def export_csv(self, path: Path):
+        columns = [self.series[name].values() for name in METRICS]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(METRICS)
+            writer.writerows(zip(*columns))
+
+
+def _read_cpu_times() -> Tuple[int, int, int]:
+    # (total, idle, iowait) jiffies from the aggregate cpu line
+    with open("/proc/stat") as f:
+        values = [int(value) for value in f.readline().split()[1:]]
+    idle, iowait = values[3], values[4] if len(values) > 4 else 0
+    # guest time is already included in user and nice
+    return sum(values[:8]), idle + iowait, iowait
+
+
+def _read_disk_sectors() -> Tuple[int, int]:
+    read = written = 0
+    try:
+        with open("/proc/diskstats") as f:
+            for line in f:
+                parts = line.split()
+                name = parts[2]
+                if name.startswith(VIRTUAL_DISK_PREFIXES) or not os.path.exists(f"/sys/block/{name}"):
+                    continue
+                read += int(parts[5])
+                written += int(parts[9])
+    except (OSError, ValueError, IndexError):
+        pass
+    return read, written
+
+
+def _read_group_usage(groups: Iterable[int]) -> Tuple[int, int]:
+    # (CPU jiffies, RSS bytes) of every process in the given process groups; the children's
+    # cumulative times keep short-lived compiler processes counted after they are reaped
+    groups = set(groups)
+    if not groups:
+        return 0, 0
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    jiffies = rss = 0
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        values = stat[stat.rfind(")") + 2 :].split()
+        if int(values[2]) in groups:
+            jiffies += sum(int(value) for value in values[11:15])
+            rss += int(values[21]) * page_size
+    return jiffies, rss
+
+
+class ResourceSampler:
+    # Every sample is a handful of /proc reads; the process table is only walked while a job runs
+    def __init__(self):
+        self._clock_ticks = os.sysconf("SC_CLK_TCK")
+        self._cpus = os.cpu_count() or 1
+        self._previous_time = time.monotonic()
+        self._previous_cpu = _read_cpu_times()
+        self._previous_disk = _read_disk_sectors()
+        self._previous_job: Dict[frozenset, int] = {}
+
+    def sample(self, job_groups: Iterable[int] = ()) -> ResourceSample:
+        now = time.monotonic()
+        elapsed = max(now - self._previous_time, 1e-6)
+
+        cpu = _read_cpu_times()
+        total = max(cpu[0] - self._previous_cpu[0], 1)
+        cpu_percent = 100.0 * (total - (cpu[1] - self._previous_cpu[1])) / total
+        iowait_percent = 100.0 * (cpu[2] - self._previous_cpu[2]) / total
+
+        meminfo = read_meminfo()
+        memory_total = meminfo.get("MemTotal", 0)
+        memory_percent = 100.0 * (memory_total - meminfo.get("MemAvailable", 0)) / memory_total if memory_total else 0
+        swap_used = (meminfo.get("SwapTotal", 0) - meminfo.get("SwapFree", 0)) * 1024
+
+        disk = _read_disk_sectors()
+        disk_read = (disk[0] - self._previous_disk[0]) * SECTOR_SIZE / elapsed
+        disk_write = (disk[1] - self._previous_disk[1]) * SECTOR_SIZE / elapsed
+
+        groups = frozenset(job_groups)
+        job_jiffies, job_rss = _read_group_usage(groups)
+        previous_jiffies = self._previous_job.get(groups, job_jiffies)
+        job_cpu = max(0, job_jiffies - previous_jiffies) / self._clock_ticks / elapsed / self._cpus * 100.0
+        self._previous_job = {groups: job_jiffies}
+
+        self._previous_time, self._previous_cpu, self._previous_disk = now, cpu, disk
+        return ResourceSample(
+            time.time(),
+            cpu_percent,
+            iowait_percent,
+            memory_percent,
+            swap_used,
+            disk_read,
+            disk_write,
+            job_cpu,
+            job_rss,
+        )
@@ -0,0 +1,118 @@
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from services.downloader import format_bytes
+
+# Every probe reads kernel or file data directly: no shell, no child process, no locale-dependent output
+
+
+@dataclass
+class SystemProbe:
+    sysname: str
+    release: str
+    machine: str
+
+    def __str__(self) -> str:
+        return f"{self.sysname} {self.release} {self.machine}"
+
+
+@dataclass
+class DiskUsage:
+    path: str
+    total_bytes: int
+    free_bytes: int
+    # What an unprivileged user can still write, i.e. free space minus the root reserve (what df shows)
+    available_bytes: int
+
+    def __str__(self) -> str:
+        return f"{format_bytes(self.available_bytes)} free of {format_bytes(self.total_bytes)}"
+
+
+@dataclass
+class MemoryInfo:
+    total_bytes: int
+    available_bytes: int
+    swap_total_bytes: int
+    swap_free_bytes: int
+
+    def __str__(self) -> str:
+        return f"{format_bytes(self.available_bytes)} free of {format_bytes(self.total_bytes)}"
+
+
+@dataclass
+class VSCodeInfo:
+    path: str
+    version: Optional[str]
+    commit: Optional[str]
+
+    def __str__(self) -> str:
+        if not self.version:
+            return "Installed (version check failed)"
+        return f"{self.version} ({self.commit[:10]})" if self.commit else self.version
+
+
+def read_meminfo() -> Dict[str, int]:
+    # Values in kB, as the kernel reports them
+    meminfo = {}
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                meminfo[key] = int(value.split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    return meminfo
+
+
+def probe_system() -> SystemProbe:
+    uname = os.uname()
+    return SystemProbe(uname.sysname, uname.release, uname.machine)
+
+
+def probe_disk(path: str = "/") -> DiskUsage:
+    st = os.statvfs(path)
+    return DiskUsage(path, st.f_blocks * st.f_frsize, st.f_bfree * st.f_frsize, st.f_bavail * st.f_frsize)
+
+
+def probe_memory() -> Optional[MemoryInfo]:
+    meminfo = read_meminfo()
+    if "MemTotal" not in meminfo:
+        return None
+    # MemAvailable appeared in Linux 3.14; free + page cache is the usual estimate before that
+    available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0) + meminfo.get("Cached", 0))
+    return MemoryInfo(
+        meminfo["MemTotal"] * 1024,
+        available * 1024,
+        meminfo.get("SwapTotal", 0) * 1024,
+        meminfo.get("SwapFree", 0) * 1024,
+    )
+
+
+def is_rotational(path: str) -> Optional[bool]:
+    # Whether the disk holding path is a spinning one, from the block device's queue attributes
+    st = os.stat(path)
+    device = Path("/sys/dev/block") / f"{os.major(st.st_dev)}:{os.minor(st.st_dev)}"
+    # Partitions have no queue of their own; theirs is the parent disk's
+    for queue in (device / "queue", device / ".." / "queue"):
+        try:
+            return (queue / "rotational").read_text().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+def probe_vscode(install_path: Path) -> Optional[VSCodeInfo]:
+    # package.json and product.json hold what `code --version` prints, without starting Electron
+    if not (install_path / "bin" / "code").exists():
+        return None
+    app_dir = install_path / "resources" / "app"
+    info = {}
+    for name, key in (("package.json", "version"), ("product.json", "commit")):
+        try:
+            info[key] = json.loads((app_dir / name).read_text()).get(key)
+        except (OSError, ValueError, AttributeError):
+            info[key] = None
+    return VSCodeInfo(str(install_path), info["version"], info["commit"])
@@ -0,0 +1,108 @@
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from services.command_runner import JobCancelled, bind_context, check_cancelled
+from services.system_probes import read_meminfo
+
+MAX_GRAPH_WORKERS = 16
+# Exclusive resource for tasks running privileged commands: one password prompt and one package manager lock at a time
+PRIVILEGED = "privileged"
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyFailed(Exception):
+    pass
+
+
+@dataclass
+class Task:
+    name: str
+    func: Callable[[], Any]
+    deps: Sequence[str] = ()
+    # Share of the graph's budget held while running
+    cpus: int = 0
+    memory_mb: int = 0
+    # Named resources only one task may hold at a time, e.g. the package manager's lock
+    exclusive: Sequence[str] = ()
+
+
+@dataclass
+class TaskOutcome:
+    ok: bool
+    value: Any = None
+    error: Optional[BaseException] = None
+
+
+class TaskGraph:
+    # Runs each task once its dependencies succeeded, as many at a time as the CPU and memory budget allows;
+    # a task that fails takes every task depending on it down with it, the others carry on
+    def __init__(self, cpus: Optional[int] = None, memory_mb: Optional[int] = None):
+        self.cpus = cpus or os.cpu_count() or 1
+        self.memory_mb = memory_mb or read_meminfo().get("MemAvailable", 0) // 1024
+        self._tasks: Dict[str, Task] = {}
+
+    def add(self, name: str, func: Callable[[], Any], deps: Sequence[str] = (), **claims) -> str:
+        for dep in deps:
+            if dep not in self._tasks:
+                raise ValueError(f"Task {name} depends on unknown task {dep}")
+        self._tasks[name] = Task(name, func, tuple(deps), **claims)
+        return name
+
+    def run(self) -> Dict[str, TaskOutcome]:
+        outcomes: Dict[str, TaskOutcome] = {}
+        waiting: List[Task] = list(self._tasks.values())
+        running: Dict[Future, Task] = {}
+        used_cpus = used_memory = 0
+        held = set()
+
+        def fits(task: Task) -> bool:
+            if held & set(task.exclusive):
+                return False
+            # A task larger than the whole budget still runs, alone, rather than never
+            if task.cpus and used_cpus and used_cpus + task.cpus > self.cpus:
+                return False
+            if task.memory_mb and used_memory and self.memory_mb and used_memory + task.memory_mb > self.memory_mb:
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=min(MAX_GRAPH_WORKERS, max(1, len(waiting)))) as executor:
+            try:
+                while waiting or running:
+                    check_cancelled()
+                    for task in list(waiting):
+                        failed = [dep for dep in task.deps if dep in outcomes and not outcomes[dep].ok]
+                        if failed:
+                            waiting.remove(task)
+                            outcomes[task.name] = TaskOutcome(False, error=DependencyFailed(f"{failed[0]} failed"))
+                            continue
+                        if any(dep not in outcomes for dep in task.deps) or not fits(task):
+                            continue
+                        waiting.remove(task)
+                        used_cpus += task.cpus
+                        used_memory += task.memory_mb
+                        held.update(task.exclusive)
+                        running[executor.submit(bind_context(task.func))] = task
+
+                    if not running:
+                        continue
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        task = running.pop(future)
+                        used_cpus -= task.cpus
+                        used_memory -= task.memory_mb
+                        held.difference_update(task.exclusive)
+                        try:
+                            outcomes[task.name] = TaskOutcome(True, future.result())
+                        except Exception as e:
+                            logger.error(f"Task {task.name} failed: {e}")
+                            outcomes[task.name] = TaskOutcome(False, error=e)
+            except JobCancelled:
+                # Running tasks share the job's cancel token and stop on their own
+                for future in running:
+                    future.cancel()
+                raise
+        return outcomes
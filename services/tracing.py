@@ -0,0 +1,278 @@
+import fcntl
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# Span-based instrumentation of the service operations. Nothing is recorded unless a trace file (JSON lines, one
+# record per finished span) or a metrics file (Prometheus textfile collector format) is configured; span() then
+# returns a shared no-op object, so instrumented code costs a function call.
+
+TRACE_FILE = os.environ.get("DEV_TOOLS_TRACE_FILE")
+# e.g. /var/lib/node_exporter/textfile_collector/dev_tools.prom; totals of earlier runs are kept next to it
+METRICS_FILE = os.environ.get("DEV_TOOLS_METRICS_FILE")
+TRACE_FORMAT = 1
+METRICS_PREFIX = "dev_tools_span"
+
+logger = logging.getLogger(__name__)
+
+_context = threading.local()
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(8).hex()
+        self.span_id = os.urandom(4).hex()
+        self.attrs = attrs
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.exit_status: Optional[int] = None
+        # CPU of child processes and of work done on other threads; the span's own thread is measured directly
+        self.child_cpu = 0.0
+        self.bytes = 0
+        self.peak_rss_kb = 0
+        self._started = time.time()
+        self._wall = time.perf_counter()
+        self._thread = threading.get_ident()
+        self._cpu = time.thread_time()
+        self._previous: Optional[Span] = None
+        self._finished = False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add_bytes(self, count: int):
+        with self.tracer.lock:
+            self.bytes += count
+
+    def record_process(self, returncode: int, cpu_seconds: float, peak_rss_kb: int):
+        with self.tracer.lock:
+            self.exit_status = returncode
+            self.child_cpu += cpu_seconds
+            self.peak_rss_kb = max(self.peak_rss_kb, peak_rss_kb)
+
+    def fail(self, error: BaseException):
+        # Exceptions outside Exception (JobCancelled, KeyboardInterrupt) interrupted the work rather than failed it
+        self.status = "error" if isinstance(error, Exception) else "interrupted"
+        self.error = str(error) or type(error).__name__
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        wall = time.perf_counter() - self._wall
+        own_cpu = time.thread_time() - self._cpu if threading.get_ident() == self._thread else 0.0
+        with self.tracer.lock:
+            parent = self.parent
+            if parent:
+                # The parent's thread clock already covers children that ran on the same thread
+                parent.child_cpu += self.child_cpu + (0.0 if parent._thread == self._thread else own_cpu)
+                parent.bytes += self.bytes
+                parent.peak_rss_kb = max(parent.peak_rss_kb, self.peak_rss_kb)
+        self.tracer.export(self, wall, own_cpu + self.child_cpu)
+
+    def __enter__(self) -> "Span":
+        self._previous = getattr(_context, "span", None)
+        _context.span = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _context.span = self._previous
+        if exc is not None:
+            self.fail(exc)
+        self.finish()
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+    def add_bytes(self, count: int):
+        pass
+
+    def record_process(self, returncode: int, cpu_seconds: float, peak_rss_kb: int):
+        pass
+
+    def fail(self, error: BaseException):
+        pass
+
+    def finish(self):
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self, trace_file: Optional[str] = None, metrics_file: Optional[str] = None):
+        self.trace_file = Path(trace_file) if trace_file else None
+        self.metrics_file = Path(metrics_file) if metrics_file else None
+        self.lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: Dict[tuple, dict] = {}
+
+    def export(self, span: Span, wall: float, cpu: float):
+        record = {
+            "format": TRACE_FORMAT,
+            "trace": span.trace_id,
+            "span": span.span_id,
+            "parent": span.parent.span_id if span.parent else None,
+            "name": span.name,
+            "start": round(span._started, 6),
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "bytes": span.bytes,
+            "peak_rss_kb": span.peak_rss_kb,
+            "exit_status": span.exit_status,
+            "status": span.status,
+        }
+        if span.error:
+            record["error"] = span.error
+        if span.attrs:
+            record["attrs"] = span.attrs
+        with self._write_lock:
+            if self.trace_file:
+                self._append(record)
+            if self.metrics_file:
+                totals = self._pending.setdefault((span.name, span.status), _empty_totals())
+                _add_totals(totals, record)
+        # Root spans end an operation; the textfile is rewritten once per operation, not per command
+        if self.metrics_file and span.parent is None:
+            self.flush_metrics()
+
+    def flush_metrics(self):
+        with self._write_lock:
+            pending, self._pending = self._pending, {}
+        if not pending or not self.metrics_file:
+            return
+        state_file = self.metrics_file.with_name(self.metrics_file.name + ".json")
+        try:
+            self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+            # Several dev-tools processes may share the textfile: totals are merged under a lock
+            with open(self.metrics_file.with_name(self.metrics_file.name + ".lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    state = json.loads(state_file.read_text())
+                except (OSError, ValueError):
+                    state = {}
+                for (name, status), totals in pending.items():
+                    _add_totals(state.setdefault(f"{name}\0{status}", _empty_totals()), totals)
+                _replace(state_file, json.dumps(state))
+                _replace(self.metrics_file, _prometheus_text(state))
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.metrics_file}: {e}")
+
+    def _append(self, record: dict):
+        try:
+            self.trace_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.trace_file, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write trace to {self.trace_file}: {e}")
+
+
+def _empty_totals() -> dict:
+    return {"count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "bytes": 0, "peak_rss_kb": 0}
+
+
+def _add_totals(totals: dict, record: dict):
+    totals["count"] += record.get("count", 1)
+    totals["wall_seconds"] += record["wall_seconds"]
+    totals["cpu_seconds"] += record["cpu_seconds"]
+    totals["bytes"] += record["bytes"]
+    totals["peak_rss_kb"] = max(totals["peak_rss_kb"], record["peak_rss_kb"])
+
+
+def _replace(path: Path, text: str):
+    tmp_file = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_file.write_text(text)
+    os.replace(tmp_file, path)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prometheus_text(state: Dict[str, dict]) -> str:
+    metrics = [
+        ("total", "counter", "Finished spans", "count", 1),
+        ("wall_seconds_total", "counter", "Wall time spent in spans", "wall_seconds", 1),
+        ("cpu_seconds_total", "counter", "CPU time of spans and their child processes", "cpu_seconds", 1),
+        ("bytes_total", "counter", "Bytes transferred within spans", "bytes", 1),
+        ("peak_rss_bytes", "gauge", "Largest child process peak RSS seen in spans", "peak_rss_kb", 1024),
+    ]
+    lines = []
+    for suffix, kind, help_text, key, scale in metrics:
+        name = f"{METRICS_PREFIX}_{suffix}"
+        lines += [f"# HELP {name} {help_text}.", f"# TYPE {name} {kind}"]
+        for label in sorted(state):
+            span, _, status = label.partition("\0")
+            lines.append(f'{name}{{span="{_label(span)}",status="{_label(status)}"}} {state[label][key] * scale}')
+    return "\n".join(lines) + "\n"
+
+
+_tracer: Optional[Tracer] = Tracer(TRACE_FILE, METRICS_FILE) if TRACE_FILE or METRICS_FILE else None
+
+
+def configure(trace_file: Optional[str] = None, metrics_file: Optional[str] = None):
+    global _tracer
+    if _tracer:
+        _tracer.flush_metrics()
+    _tracer = Tracer(trace_file, metrics_file) if trace_file or metrics_file else None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def current_span():
+    return getattr(_context, "span", None) or NULL_SPAN
+
+
+def span(name: str, **attrs):
+    # Use as a context manager, which also makes it the parent of spans started inside the block, or call
+    # finish() on it for work that ends elsewhere (e.g. a privileged request waited for later)
+    if _tracer is None:
+        return NULL_SPAN
+    return Span(_tracer, name, getattr(_context, "span", None), attrs)
+
+
+class activate:
+    # Makes span the parent of spans started by this thread inside the block, for work handed to a thread pool
+    def __init__(self, parent):
+        self._parent = parent if isinstance(parent, Span) else None
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(_context, "span", None)
+        _context.span = self._parent
+
+    def __exit__(self, exc_type, exc, tb):
+        _context.span = self._previous
+
+
+def traced(name: str) -> Callable:
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
@@ -1,45 +1,120 @@
 #!/bin/bash
 set -e
 
-VSCODE_PATH="/opt/vscode"
-BACKUP_DIR="/opt/vscode-backup"
-TEMP_DIR="/tmp/dev-tools"
-BACKUP_TIMESTAMP="$1"
-CURRENT_BACKUP="$BACKUP_DIR/$BACKUP_TIMESTAMP"
+# Usage: update_vscode_root.sh <timestamp> [archive|-]
+#        update_vscode_root.sh restore <snapshot> <timestamp>
 
-# 1. Backup
-mkdir -p "$BACKUP_DIR"
-cp -r "$VSCODE_PATH" "$CURRENT_BACKUP"
+# Overridable for stand-in runs only: the privileged helper drops these variables when pkexec or sudo elevated it
+VSCODE_PATH="${DEV_TOOLS_VSCODE_PATH:-/opt/vscode}"
+BACKUP_DIR="${DEV_TOOLS_VSCODE_BACKUP_DIR:-/opt/vscode-backup}"
+KEEP_BACKUPS=3
+MAX_BACKUP_AGE_DAYS=180
+MAX_BACKUP_BYTES=$((2 * 1024 * 1024 * 1024))
+MANIFEST="$BACKUP_DIR/manifest.json"
+PREVIOUS_MANIFEST="$BACKUP_DIR/manifest.previous.json"
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+
+if [ "$1" = "restore" ]; then
+    MODE="restore"
+    SNAPSHOT="$2"
+    BACKUP_TIMESTAMP="$3"
+else
+    MODE="update"
+    BACKUP_TIMESTAMP="$1"
+    ARCHIVE="${2:--}"
+fi
 
+# Same filesystem as VSCODE_PATH, so every swap below is a rename
+STAGING="$(dirname "$VSCODE_PATH")/.vscode-staging-$BACKUP_TIMESTAMP"
+PREVIOUS="$(dirname "$VSCODE_PATH")/.vscode-previous-$BACKUP_TIMESTAMP"
 
-# 2. Remove old VSCode
-rm -rf "$VSCODE_PATH"
+# A failure between the renames below must not leave VSCODE_PATH missing: the previous tree goes back
+rollback() {
+    if [ ! -e "$VSCODE_PATH" ] && [ -d "$PREVIOUS" ]; then
+        mv -T "$PREVIOUS" "$VSCODE_PATH" && echo "ERROR: Update failed, previous version restored"
+    fi
+    rm -rf "$STAGING"
+}
+trap rollback EXIT
 
-# 3. Extract and move new VSCode
-cd "$TEMP_DIR"
-tar -xzf vscode.tar.gz
-mv VSCode-linux-x64 "$VSCODE_PATH"
+HAVE_PYTHON=0
+command -v python3 >/dev/null 2>&1 && HAVE_PYTHON=1
+
+# 1. Build the new VSCode in the staging directory
+if [ "$MODE" = "restore" ]; then
+    if [ $HAVE_PYTHON -eq 0 ]; then
+        echo "ERROR: python3 is required to restore a backup"
+        exit 1
+    fi
+    # Hardlinks every file from the backup store: metadata operations only
+    python3 -E -s "$SCRIPT_DIR/backup_store.py" "$BACKUP_DIR" restore "$SNAPSHOT" "$STAGING" --manifest "$MANIFEST.restored"
+elif [ -d "$VSCODE_PATH" ] && [ $HAVE_PYTHON -eq 1 ]; then
+    # Incremental mode starts from a hardlink clone and rewrites only files whose content changed;
+    # "-" streams the archive from stdin
+    cp -al "$VSCODE_PATH" "$STAGING"
+    python3 -E -s "$SCRIPT_DIR/vscode_delta.py" "$ARCHIVE" "$VSCODE_PATH" "$STAGING" "$MANIFEST" \
+        --previous-manifest "$PREVIOUS_MANIFEST"
+else
+    mkdir "$STAGING"
+    tar -xzf "$ARCHIVE" -C "$STAGING" --strip-components=1
+fi
 
-# 4. Verify
+if [ ! -f "$STAGING/bin/code" ]; then
+    echo "ERROR: New tree does not contain bin/code, VSCode left untouched"
+    exit 1
+fi
+
+# 2. Swap the staged tree in. With mv --exchange (coreutils >= 9.5) VSCODE_PATH never
+#    disappears; otherwise it is missing only between two back-to-back renames
+if mv --exchange "$STAGING" "$VSCODE_PATH" 2>/dev/null; then
+    # STAGING now holds the previous tree, which the EXIT trap would delete
+    if ! mv -T "$STAGING" "$PREVIOUS"; then
+        mv --exchange "$STAGING" "$VSCODE_PATH"
+        echo "ERROR: Could not move the previous version aside, VSCode left untouched"
+        exit 1
+    fi
+else
+    mv -T "$VSCODE_PATH" "$PREVIOUS"
+    mv -T "$STAGING" "$VSCODE_PATH"
+fi
+
+# 3. Verify, rolling back by renaming the previous tree into place
 if [ ! -f "$VSCODE_PATH/bin/code" ]; then
-    rm -rf "$VSCODE_PATH"
-    mv "$CURRENT_BACKUP" "$VSCODE_PATH"
-    echo "ERROR: Update failed, backup restored: $CURRENT_BACKUP"
+    mv -T "$VSCODE_PATH" "$STAGING"
+    mv -T "$PREVIOUS" "$VSCODE_PATH"
+    echo "ERROR: Update failed, previous version restored"
     exit 1
 fi
 
-# 5. Cleanup: keep only the 3 most recent backups (excluding the current one)
-cd "$BACKUP_DIR"
-backups=( $(ls -dt */ 2>/dev/null | grep -v "/$BACKUP_TIMESTAMP/" | head -n 3) )
-for b in $(ls -d */ 2>/dev/null | grep -v "/$BACKUP_TIMESTAMP/"); do
-    skip=0
-    for keep in "${backups[@]}"; do
-        [[ "$b" == "$keep" ]] && skip=1 && break
-    done
-    [[ $skip -eq 0 ]] && rm -rf "$b"
-done
+if [ "$MODE" = "restore" ]; then
+    mv -f "$MANIFEST.restored" "$MANIFEST"
+fi
+
+mkdir -p "$BACKUP_DIR"
+if [ $HAVE_PYTHON -eq 1 ]; then
+    # 4. Store the previous tree in the deduplicated backup store. Objects are hardlinks, so the
+    #    snapshot and the removal of the previous tree are metadata operations
+    python3 -E -s "$SCRIPT_DIR/backup_store.py" "$BACKUP_DIR" snapshot "$PREVIOUS" "$BACKUP_TIMESTAMP" \
+        --manifest "$PREVIOUS_MANIFEST"
+    rm -rf "$PREVIOUS" "$PREVIOUS_MANIFEST"
+
+    # 5. Retention by count, age and stored bytes
+    python3 -E -s "$SCRIPT_DIR/backup_store.py" "$BACKUP_DIR" prune --keep "$KEEP_BACKUPS" \
+        --max-age-days "$MAX_BACKUP_AGE_DAYS" --max-bytes "$MAX_BACKUP_BYTES"
+else
+    # 4. Keep the previous tree as a plain directory backup; the store migrates it later
+    if [ "$(stat -c %d "$PREVIOUS")" = "$(stat -c %d "$BACKUP_DIR")" ]; then
+        mv -T "$PREVIOUS" "$BACKUP_DIR/$BACKUP_TIMESTAMP"
+    else
+        cp -a --reflink=auto "$PREVIOUS" "$BACKUP_DIR/$BACKUP_TIMESTAMP"
+        rm -rf "$PREVIOUS"
+    fi
 
-# 6. Remove the backup just created (only if update succeeded)
-rm -rf "$CURRENT_BACKUP"
+    # 5. Keep only the most recent plain backups (names are timestamps)
+    cd "$BACKUP_DIR"
+    ls -1d -- [0-9]*_[0-9]*/ 2>/dev/null | sort -r | tail -n +$((KEEP_BACKUPS + 1)) | while read -r b; do
+        rm -rf -- "$b"
+    done
+fi
 
-echo "OK: VSCode updated successfully"
\ No newline at end of file
+echo "OK: VSCode ${MODE}d successfully, previous version kept as backup $BACKUP_TIMESTAMP"
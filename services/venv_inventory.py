@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import shutil
+import stat
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+INVENTORY_FORMAT = 1
+SCAN_WORKERS = 8
+SCAN_DEPTH = 8
+# Never hold venvs worth listing, and are among the largest trees in a home directory
+SCAN_SKIP = {
+    ".git",
+    ".hg",
+    ".svn",
+    "node_modules",
+    "__pycache__",
+    "site-packages",
+    ".cache",
+    ".npm",
+    ".cargo",
+    ".rustup",
+    ".mozilla",
+    "Trash",
+}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VenvInfo:
+    path: str
+    version: Optional[str]
+    interpreter: Optional[str]
+    interpreter_exists: bool
+    size_bytes: int
+    # Bytes in files hardlinked with other venvs or the wheelhouse store: deleting the venv does not free them
+    shared_bytes: int
+    last_used: float
+
+
+def _read_cfg(path: str) -> Dict[str, str]:
+    cfg = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, sep, value = line.partition("=")
+                if sep:
+                    cfg[key.strip()] = value.strip()
+    except (OSError, UnicodeDecodeError):
+        pass
+    return cfg
+
+
+def _disk_usage(path: str) -> Tuple[int, int]:
+    # Allocated blocks rather than apparent sizes, each inode counted once
+    total = shared = 0
+    seen = set()
+    pending = [path]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if stat.S_ISDIR(st.st_mode):
+                        pending.append(entry.path)
+                    if st.st_ino in seen:
+                        continue
+                    seen.add(st.st_ino)
+                    size = st.st_blocks * 512
+                    total += size
+                    if st.st_nlink > 1 and not stat.S_ISDIR(st.st_mode):
+                        shared += size
+        except OSError:
+            continue
+    return total, shared
+
+
+class VenvInventory:
+    # Directory listings are cached by mtime, so a rescan only stats unchanged directories instead of listing
+    # them; a venv is only re-measured when its pyvenv.cfg, top directory or site-packages changed
+    def __init__(
+        self, index_file: Path, workers: int = SCAN_WORKERS, max_depth: int = SCAN_DEPTH, exclude: List[str] = ()
+    ):
+        self.index_file = index_file
+        self.exclude = set(exclude)
+        self.workers = workers
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._dirs: Dict[str, dict] = {}
+        self._venvs: Dict[str, dict] = {}
+        self.roots: List[str] = []
+        self._load()
+
+    def cached(self) -> List[VenvInfo]:
+        return [VenvInfo(**record["info"]) for record in self._venvs.values()]
+
+    def scan(self, roots: Optional[List[str]] = None, on_venv: Optional[Callable[[VenvInfo], None]] = None):
+        if roots:
+            self.roots = [str(Path(root).expanduser().resolve()) for root in roots]
+        dirs: Dict[str, dict] = {}
+        venvs: Dict[str, dict] = {}
+
+        # Overlapping roots and children are only visited once
+        seen = set(self.roots) | self.exclude
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {executor.submit(self._visit, root, dirs, venvs): 0 for root in self.roots}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth = pending.pop(future)
+                    children, venv = future.result()
+                    if venv and on_venv:
+                        on_venv(venv)
+                    if depth < self.max_depth:
+                        for child in children:
+                            if child not in seen:
+                                seen.add(child)
+                                pending[executor.submit(self._visit, child, dirs, venvs)] = depth + 1
+
+        self._dirs, self._venvs = dirs, venvs
+        self._save()
+        return self.cached()
+
+    def forget(self, paths: List[str]):
+        for path in paths:
+            self._venvs.pop(path, None)
+            self._dirs.pop(path, None)
+        self._save()
+
+    def _visit(self, directory: str, dirs: Dict[str, dict], venvs: Dict[str, dict]):
+        try:
+            st = os.stat(directory)
+        except OSError:
+            return [], None
+
+        cached = self._dirs.get(directory)
+        if cached and cached["mtime_ns"] == st.st_mtime_ns:
+            children, is_venv = cached["children"], cached["venv"]
+        else:
+            children, is_venv = [], False
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name == "pyvenv.cfg":
+                            is_venv = True
+                        elif entry.is_dir(follow_symlinks=False) and entry.name not in SCAN_SKIP:
+                            children.append(entry.path)
+            except OSError:
+                return [], None
+
+        venv = None
+        if is_venv:
+            # Nothing inside a venv is worth walking
+            children = []
+            record = self._venv_record(directory, st)
+            if record:
+                venv = VenvInfo(**record["info"])
+                with self._lock:
+                    venvs[directory] = record
+        with self._lock:
+            dirs[directory] = {"mtime_ns": st.st_mtime_ns, "children": children, "venv": is_venv}
+        return children, venv
+
+    def _venv_record(self, directory: str, st: os.stat_result) -> Optional[dict]:
+        cfg_path = os.path.join(directory, "pyvenv.cfg")
+        try:
+            cfg_st = os.stat(cfg_path)
+        except OSError:
+            return None
+        site_mtimes = []
+        try:
+            with os.scandir(os.path.join(directory, "lib")) as entries:
+                for entry in entries:
+                    try:
+                        site_mtimes.append(os.stat(os.path.join(entry.path, "site-packages")).st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        signature = [st.st_mtime_ns, cfg_st.st_mtime_ns] + sorted(site_mtimes)
+
+        # pyvenv.cfg is read by every interpreter start in the venv, so its atime tracks use (relatime permitting)
+        last_used = max([cfg_st.st_atime, st.st_mtime] + [mtime / 1e9 for mtime in site_mtimes])
+        python = os.path.join(directory, "bin", "python")
+        # The interpreter can vanish without touching the venv, so this is checked on every scan
+        interpreter_exists = os.path.exists(python)
+
+        cached = self._venvs.get(directory)
+        if cached and cached["signature"] == signature:
+            info = dict(cached["info"], last_used=last_used, interpreter_exists=interpreter_exists)
+            return {"signature": signature, "info": info}
+
+        cfg = _read_cfg(cfg_path)
+        interpreter = cfg.get("executable") or (os.path.realpath(python) if os.path.islink(python) else None)
+        if not interpreter and cfg.get("home"):
+            interpreter = os.path.join(cfg["home"], "python3")
+        size, shared = _disk_usage(directory)
+        info = VenvInfo(
+            path=directory,
+            version=cfg.get("version") or cfg.get("version_info"),
+            interpreter=interpreter,
+            interpreter_exists=interpreter_exists,
+            size_bytes=size,
+            shared_bytes=shared,
+            last_used=last_used,
+        )
+        return {"signature": signature, "info": asdict(info)}
+
+    def _load(self):
+        try:
+            data = json.loads(self.index_file.read_text())
+            if data.get("format") != INVENTORY_FORMAT:
+                return
+            self.roots = data["roots"]
+            self._dirs = data["dirs"]
+            self._venvs = data["venvs"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Ignoring unreadable venv index {self.index_file}: {e}")
+            self._dirs = {}
+            self._venvs = {}
+
+    def _save(self):
+        data = {"format": INVENTORY_FORMAT, "roots": self.roots, "dirs": self._dirs, "venvs": self._venvs}
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.index_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(json.dumps(data))
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            logger.warning(f"Could not write venv index {self.index_file}: {e}")
+
+
+def delete_venv(path: str):
+    # Refuses anything that is not a venv, whatever the index says
+    if not os.path.isfile(os.path.join(path, "pyvenv.cfg")) or os.path.islink(path):
+        raise ValueError(f"{path} is not a virtual environment")
+    shutil.rmtree(path)
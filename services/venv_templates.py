@@ -0,0 +1,144 @@
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+from pathlib import Path
+
+from services.command_runner import stream_command
+from services.python_registry import Interpreter
+
+TEMPLATE_FORMAT = 1
+# ioctl(FICLONE): share the source's extents copy-on-write (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+# Files embedding the venv's own path (pyvenv.cfg, activate scripts, pip shebangs) are all small
+REWRITE_MAX_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def _clone_file(source: str, target: str):
+    # Reflink when the filesystem supports it, otherwise hardlink; both are near-free and share the data.
+    # Files that must differ per venv are rewritten as new inodes, so a shared link is never written through
+    with open(source, "rb") as src:
+        try:
+            with open(target, "xb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copystat(source, target)
+            return
+        except OSError as e:
+            if os.path.exists(target):
+                os.unlink(target)
+            if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+                raise
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class VenvTemplateCache:
+    # One pristine `python -m venv` per interpreter binary, keyed by its path and stat identity so an
+    # upgraded interpreter gets a fresh template; new venvs are clones of it with their paths rewritten
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    @staticmethod
+    def key(python_cmd: str, interpreter: Interpreter) -> str:
+        material = json.dumps(
+            {
+                "format": TEMPLATE_FORMAT,
+                "command": shutil.which(python_cmd) or python_cmd,
+                "path": interpreter.path,
+                "stat": [interpreter.mtime_ns, interpreter.size, interpreter.inode],
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode()).hexdigest()[:24]
+
+    def template(self, python_cmd: str, interpreter: Interpreter, venv_name: str) -> Path:
+        key = self.key(python_cmd, interpreter)
+        template_dir = self.root / key / venv_name
+        if (template_dir / "pyvenv.cfg").is_file():
+            return template_dir
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=self.root))
+        try:
+            # Built under the final path, so the paths it embeds are the ones clone() looks for
+            build_dir = staging / venv_name
+            result = stream_command([python_cmd, "-m", "venv", str(build_dir)], stdin=subprocess.DEVNULL)
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+            self._rewrite_paths(build_dir, str(build_dir), str(template_dir))
+            with open(staging / "template.json", "w") as f:
+                json.dump({"format": TEMPLATE_FORMAT, "interpreter": interpreter.path, "command": python_cmd}, f)
+            try:
+                os.rename(staging, self.root / key)
+            except OSError:
+                # Another process published the same template first
+                pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self._prune_stale(interpreter.path, keep=key)
+        return template_dir
+
+    def clone(self, template_dir: Path, target: Path):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        staging = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        try:
+            for dirpath, dirnames, filenames in os.walk(template_dir):
+                relative = os.path.relpath(dirpath, template_dir)
+                destination = os.path.normpath(os.path.join(staging, relative))
+                os.makedirs(destination, exist_ok=True)
+                shutil.copystat(dirpath, destination)
+                for name in dirnames + filenames:
+                    source = os.path.join(dirpath, name)
+                    if os.path.islink(source):
+                        # bin/python points at the interpreter and lib64 at lib: both are valid as-is
+                        os.symlink(os.readlink(source), os.path.join(destination, name))
+                        if name in dirnames:
+                            dirnames.remove(name)
+                    elif name in filenames:
+                        _clone_file(source, os.path.join(destination, name))
+            self._rewrite_paths(staging, str(template_dir), str(target))
+            os.rename(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def _rewrite_paths(venv_dir: Path, old: str, new: str):
+        old_bytes, new_bytes = old.encode(), new.encode()
+        candidates = [venv_dir / "pyvenv.cfg"] + [entry for entry in (venv_dir / "bin").iterdir()]
+        for path in candidates:
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode) or st.st_size > REWRITE_MAX_SIZE:
+                continue
+            content = path.read_bytes()
+            if old_bytes not in content:
+                continue
+            # A new inode: the template's copy of this file stays untouched
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            tmp_path.write_bytes(content.replace(old_bytes, new_bytes))
+            os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+            os.replace(tmp_path, path)
+
+    def _prune_stale(self, interpreter_path: str, keep: str):
+        for entry in self.root.iterdir():
+            if entry.name == keep or entry.name.startswith("."):
+                continue
+            try:
+                with open(entry / "template.json") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get("interpreter") == interpreter_path:
+                logger.info(f"Removing outdated venv template {entry.name} for {interpreter_path}")
+                shutil.rmtree(entry, ignore_errors=True)
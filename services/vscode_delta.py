@@ -0,0 +1,249 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import stat
+import sys
+import tarfile
+import tempfile
+from typing import Dict, Optional
+
+# Runs as root from update_vscode_root.sh through the system python3, so it must only use the standard library
+
+MANIFEST_FORMAT = 1
+CHUNK_SIZE = 256 * 1024
+SPOOL_SIZE = 32 * 1024 * 1024
+
+
+def _hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def load_manifest(path: str) -> Dict[str, dict]:
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("format") == MANIFEST_FORMAT:
+            return data["files"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def save_manifest(path: str, files: Dict[str, dict]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"format": MANIFEST_FORMAT, "files": files}, f)
+    os.replace(tmp_path, path)
+
+
+def build_manifest(root: str, cached: Optional[Dict[str, dict]] = None) -> Dict[str, dict]:
+    # Files whose size, mtime and inode match the cached entry keep their hash without being read again
+    cached = cached or {}
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            relpath = os.path.relpath(path, root)
+            entry = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "ino": st.st_ino,
+                "mode": stat.S_IMODE(st.st_mode),
+            }
+            previous = cached.get(relpath)
+            if previous and all(previous.get(key) == entry[key] for key in ("size", "mtime_ns", "ino")):
+                entry["sha256"] = previous["sha256"]
+            else:
+                entry["sha256"] = _hash_file(path)
+            files[relpath] = entry
+    return files
+
+
+def _member_path(name: str) -> Optional[str]:
+    # Drop the top-level VSCode-linux-x64/ directory and refuse anything escaping the tree
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if len(parts) < 2 or ".." in parts:
+        return None
+    return os.path.join(*parts[1:])
+
+
+def _remove(path: str):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.unlink(path)
+
+
+def _make_dirs(staging: str, reldir: str) -> str:
+    # One component at a time without following symlinks: a link in the archive or in the cloned tree must not
+    # redirect the members below it out of staging (this runs as root)
+    path = staging
+    for part in reldir.split(os.sep) if reldir else []:
+        path = os.path.join(path, part)
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            os.mkdir(path)
+            continue
+        if not stat.S_ISDIR(st.st_mode):
+            _remove(path)
+            os.mkdir(path)
+    real = os.path.realpath(path)
+    if real != staging and not real.startswith(staging + os.sep):
+        raise ValueError(f"{reldir} resolves outside of the staging tree")
+    return path
+
+
+def apply_archive(archive, staging: str, manifest: Dict[str, dict]) -> dict:
+    # staging starts as a hardlink clone of the installed tree; unchanged files keep their inode and
+    # changed ones are unlinked before writing, so the live tree is never modified through a shared link
+    stats = {"unchanged": 0, "changed": 0, "added": 0, "removed": 0, "written": 0}
+    seen_files = set()
+    seen_dirs = set()
+    new_manifest = {}
+
+    staging = os.path.realpath(staging)
+    gz = gzip.GzipFile(fileobj=archive, mode="rb")
+    with tarfile.open(fileobj=gz, mode="r|") as tar:
+        for member in tar:
+            relpath = _member_path(member.name)
+            if relpath is None:
+                continue
+            if member.isdir():
+                seen_dirs.add(relpath)
+                os.chmod(_make_dirs(staging, relpath), member.mode & 0o7777)
+                continue
+
+            target = os.path.join(_make_dirs(staging, os.path.dirname(relpath)), os.path.basename(relpath))
+
+            if member.issym():
+                seen_files.add(relpath)
+                if os.path.islink(target) and os.readlink(target) == member.linkname:
+                    stats["unchanged"] += 1
+                    continue
+                stats["changed" if os.path.lexists(target) else "added"] += 1
+                _remove(target)
+                os.symlink(member.linkname, target)
+                continue
+
+            if member.islnk():
+                # Another name for a file extracted earlier in this archive
+                source_relpath = _member_path(member.linkname)
+                if source_relpath not in new_manifest:
+                    raise ValueError(f"{member.name} links to {member.linkname}, which is not a file before it")
+                seen_files.add(relpath)
+                source = os.path.join(
+                    _make_dirs(staging, os.path.dirname(source_relpath)), os.path.basename(source_relpath)
+                )
+                new_manifest[relpath] = dict(new_manifest[source_relpath])
+                if os.path.lexists(target) and os.lstat(target).st_ino == os.lstat(source).st_ino:
+                    stats["unchanged"] += 1
+                    continue
+                stats["changed" if os.path.lexists(target) else "added"] += 1
+                _remove(target)
+                os.link(source, target)
+                continue
+
+            if not member.isfile():
+                continue
+
+            seen_files.add(relpath)
+            mode = member.mode & 0o7777
+            previous = manifest.get(relpath)
+            source = tar.extractfile(member)
+            hasher = hashlib.sha256()
+
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, dir=os.path.dirname(target)) as spool:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+                    spool.write(chunk)
+                digest = hasher.hexdigest()
+
+                if (
+                    previous
+                    and previous["sha256"] == digest
+                    and previous["mode"] == mode
+                    and os.path.isfile(target)
+                    and not os.path.islink(target)
+                ):
+                    stats["unchanged"] += 1
+                    new_manifest[relpath] = dict(previous)
+                    continue
+
+                stats["changed" if os.path.lexists(target) else "added"] += 1
+                _remove(target)
+                spool.seek(0)
+                fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o600)
+                with os.fdopen(fd, "wb") as out:
+                    shutil.copyfileobj(spool, out, CHUNK_SIZE)
+                os.chmod(target, mode)
+                os.utime(target, (member.mtime, member.mtime))
+                stats["written"] += member.size
+
+            st = os.lstat(target)
+            new_manifest[relpath] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "ino": st.st_ino,
+                "mode": mode,
+                "sha256": digest,
+            }
+
+    # tarfile stops at the end-of-archive blocks; reading the rest makes a truncated download fail here
+    while gz.read(CHUNK_SIZE):
+        pass
+
+    for dirpath, dirnames, filenames in os.walk(staging, topdown=False):
+        for name in filenames + [name for name in dirnames if os.path.islink(os.path.join(dirpath, name))]:
+            relpath = os.path.relpath(os.path.join(dirpath, name), staging)
+            if relpath not in seen_files:
+                os.unlink(os.path.join(dirpath, name))
+                stats["removed"] += 1
+        relpath = os.path.relpath(dirpath, staging)
+        if relpath != "." and relpath not in seen_dirs and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+    stats["manifest"] = new_manifest
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply a VSCode tarball to a hardlinked staging tree")
+    parser.add_argument("archive", help="VSCode .tar.gz, or - to read it from stdin")
+    parser.add_argument("installed", help="Currently installed VSCode tree")
+    parser.add_argument("staging", help="Hardlink clone of the installed tree to update in place")
+    parser.add_argument("manifest", help="Manifest cache file")
+    parser.add_argument("--previous-manifest", help="Also write the installed tree's manifest here")
+    args = parser.parse_args(argv)
+
+    manifest = build_manifest(args.installed, load_manifest(args.manifest))
+    if args.previous_manifest:
+        save_manifest(args.previous_manifest, manifest)
+    if args.archive == "-":
+        stats = apply_archive(sys.stdin.buffer, args.staging, manifest)
+    else:
+        with open(args.archive, "rb") as archive:
+            stats = apply_archive(archive, args.staging, manifest)
+
+    # Inodes of the staged tree survive the rename swap, so this manifest is valid for the next update
+    save_manifest(args.manifest, stats.pop("manifest"))
+    print(
+        f"DELTA: {stats['changed']} changed, {stats['added']} added, {stats['removed']} removed, "
+        f"{stats['unchanged']} unchanged, {stats['written']} bytes written"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from services import tracing
+from services.command_runner import bind_context, stream_command
+from services.downloader import Downloader
+
+DOWNLOAD_WORKERS = 8
+# Linking tiny files saves next to nothing and costs a hash each
+MIN_LINK_SIZE = 4096
+PIP = ["-m", "pip", "--disable-pip-version-check"]
+
+logger = logging.getLogger(__name__)
+
+
+class WheelhouseError(Exception):
+    pass
+
+
+def _file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class Wheelhouse:
+    # wheels/ is a --find-links directory every venv installs from offline; objects/ holds one inode per
+    # distinct installed file so venvs with the same packages share their site-packages data on disk
+    def __init__(self, root: Path, downloader: Optional[Downloader] = None):
+        self.root = Path(root)
+        self.wheels_dir = self.root / "wheels"
+        self.sdists_dir = self.root / "sdists"
+        self.objects_dir = self.root / "objects"
+        self.downloader = downloader or Downloader()
+
+    def install(self, python: str, requirements: Path, progress: Optional[Callable[[str], None]] = None) -> dict:
+        # Fast path: everything already in the wheelhouse, no index or network involved
+        if progress:
+            progress("Installing from the wheelhouse...")
+        if self._pip_install(python, requirements, offline=True).returncode != 0:
+            with self._locked():
+                # Whoever held the lock may have just filled in what was missing
+                result = self._pip_install(python, requirements, offline=True)
+                if result.returncode != 0:
+                    self.fill(python, requirements, progress)
+            if result.returncode != 0:
+                if progress:
+                    progress("Installing from the wheelhouse...")
+                result = self._pip_install(python, requirements, offline=True)
+            if result.returncode != 0:
+                raise WheelhouseError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "pip failed")
+
+        if progress:
+            progress("Linking installed files to the shared store...")
+        stats = self.link_duplicates(Path(python).parent.parent)
+        self.prune_objects()
+        return stats
+
+    @tracing.traced("wheelhouse.fill")
+    def fill(self, python: str, requirements: Path, progress: Optional[Callable[[str], None]] = None):
+        # pip resolves the full dependency set for this interpreter; the missing distributions are then
+        # fetched concurrently and sdists built into wheels concurrently, instead of one after another
+        for directory in (self.wheels_dir, self.sdists_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        if progress:
+            progress("Resolving dependencies...")
+        result = stream_command(
+            [python, *PIP, "install", "--dry-run", "--ignore-installed", "--quiet", "--report", "-"]
+            + ["--find-links", str(self.wheels_dir), "-r", str(requirements)],
+            stdin=subprocess.DEVNULL,
+            cwd=requirements.parent,
+            tail_lines=100000,
+        )
+        try:
+            report = json.loads(result.stdout) if result.returncode == 0 else None
+        except ValueError:
+            report = None
+        if report is None:
+            # pip older than 22.2 has no --report: let it download and build serially
+            logger.warning("pip cannot report its resolution, filling the wheelhouse serially")
+            self._pip_wheel(python, ["-r", str(requirements)], cwd=requirements.parent)
+            return
+
+        missing = []
+        for item in report.get("install", []):
+            info = item.get("download_info", {})
+            url = info.get("url", "")
+            if "dir_info" in info or "vcs_info" in info:
+                continue
+            filename = urllib.parse.unquote(url.rsplit("/", 1)[-1].split("#")[0])
+            if filename.endswith(".whl") and (self.wheels_dir / filename).exists():
+                continue
+            sha256 = info.get("archive_info", {}).get("hashes", {}).get("sha256")
+            missing.append((url, filename, sha256))
+
+        if progress:
+            progress(f"Fetching {len(missing)} distributions...")
+        fetched: List[Path] = []
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            fetch = bind_context(self._fetch)
+            fetched = list(executor.map(lambda entry: fetch(*entry), missing))
+
+        sdists = [path for path in fetched if not path.name.endswith(".whl")]
+        if sdists:
+            if progress:
+                progress(f"Building {len(sdists)} wheels...")
+            workers = max(1, min(os.cpu_count() or 1, len(sdists)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                build = bind_context(
+                    lambda sdist: self._pip_wheel(python, ["--no-deps", str(sdist)], prefix=f"[{sdist.name}] ")
+                )
+                list(executor.map(build, sdists))
+
+    @tracing.traced("wheelhouse.link")
+    def link_duplicates(self, venv_dir: Path) -> Dict[str, int]:
+        # Replaces installed files with hardlinks to identical ones already in the store; bytecode is
+        # skipped because it embeds the source mtime, which differs for every install. Linked inodes are
+        # made read-only: an in-place edit in one venv would otherwise change every venv sharing the file
+        # (pip itself replaces files rather than writing into them)
+        stats = {"linked": 0, "stored": 0, "linked_bytes": 0}
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        for site_dir in (venv_dir / "lib").glob("python*/site-packages"):
+            for dirpath, dirnames, filenames in os.walk(site_dir):
+                dirnames[:] = [name for name in dirnames if name != "__pycache__"]
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    st = os.lstat(path)
+                    if not stat.S_ISREG(st.st_mode) or st.st_size < MIN_LINK_SIZE or st.st_nlink > 1:
+                        continue
+                    key = f"{_file_sha256(path)}.{stat.S_IMODE(st.st_mode):o}"
+                    object_path = self.objects_dir / key[:2] / key
+                    read_only = stat.S_IMODE(st.st_mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+                    try:
+                        if object_path.exists():
+                            try:
+                                tmp_path = f"{path}.link.tmp"
+                                os.link(object_path, tmp_path)
+                                os.chmod(tmp_path, read_only)
+                                os.replace(tmp_path, path)
+                                stats["linked"] += 1
+                                stats["linked_bytes"] += st.st_size
+                                continue
+                            except FileNotFoundError:
+                                # Pruned in the meantime: this file becomes the object instead
+                                pass
+                        object_path.parent.mkdir(exist_ok=True)
+                        os.link(path, object_path)
+                        os.chmod(path, read_only)
+                        stats["stored"] += 1
+                    except FileExistsError:
+                        continue
+                    except OSError as e:
+                        if e.errno != errno.EXDEV:
+                            raise
+                        # The venv lives on another filesystem than the store: nothing can be shared
+                        logger.info(f"Not linking {venv_dir} to the wheelhouse store: {e}")
+                        return stats
+        return stats
+
+    @tracing.traced("wheelhouse.prune")
+    def prune_objects(self) -> Dict[str, int]:
+        # Objects whose only link is the store's own belong to venvs that were deleted
+        stats = {"removed": 0, "removed_bytes": 0}
+        try:
+            prefixes = list(os.scandir(self.objects_dir))
+        except FileNotFoundError:
+            return stats
+        for prefix in prefixes:
+            if not prefix.is_dir(follow_symlinks=False):
+                continue
+            for entry in os.scandir(prefix.path):
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                    if stat.S_ISREG(st.st_mode) and st.st_nlink == 1:
+                        os.unlink(entry.path)
+                        stats["removed"] += 1
+                        stats["removed_bytes"] += st.st_size
+                except FileNotFoundError:
+                    continue
+        return stats
+
+    def _fetch(self, url: str, filename: str, sha256: Optional[str]) -> Path:
+        target_dir = self.wheels_dir if filename.endswith(".whl") else self.sdists_dir
+        target = target_dir / filename
+        if target.exists():
+            return target
+        if url.startswith("file://"):
+            # A local index or mirror: copying is all the download there is
+            tmp_path = target.with_name(f".{filename}.{os.getpid()}.tmp")
+            shutil.copyfile(urllib.parse.unquote(urllib.parse.urlparse(url).path), tmp_path)
+            os.replace(tmp_path, target)
+        else:
+            self.downloader.download(url, target, sha256=sha256)
+        return target
+
+    def _pip_wheel(self, python: str, args: List[str], cwd: Optional[Path] = None, prefix: str = ""):
+        result = stream_command(
+            [python, *PIP, "wheel", "--wheel-dir", str(self.wheels_dir), "--find-links", str(self.wheels_dir)] + args,
+            stdin=subprocess.DEVNULL,
+            cwd=cwd,
+        )
+        if result.returncode != 0:
+            raise WheelhouseError(f"{prefix}pip wheel failed: {result.stderr.strip() or result.stdout.strip()}")
+
+    def _pip_install(self, python: str, requirements: Path, offline: bool):
+        args = ["--no-index"] if offline else []
+        return stream_command(
+            [python, *PIP, "install", *args, "--find-links", str(self.wheels_dir), "-r", str(requirements)],
+            stdin=subprocess.DEVNULL,
+            cwd=requirements.parent,
+        )
+
+    @contextmanager
+    def _locked(self):
+        # Fills are serialized so concurrent venvs never fetch or build the same wheel twice
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
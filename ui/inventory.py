@@ -0,0 +1,171 @@
+import os
+import time
+from typing import Callable, List, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, Qt, QThreadPool, pyqtSignal
+from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QFileDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QMessageBox,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from services.dev_tools_service import DevToolsService
+from services.downloader import format_bytes
+from services.venv_inventory import VenvInfo
+
+COLUMNS = ["Path", "Python", "Size", "Last used", "Interpreter"]
+
+
+class _SortItem(QTableWidgetItem):
+    # Displays formatted text but sorts by the raw value
+    def __init__(self, text: str, key):
+        super().__init__(text)
+        self._key = key
+
+    def __lt__(self, other):
+        if isinstance(other, _SortItem):
+            return self._key < other._key
+        return super().__lt__(other)
+
+
+class InventorySignals(QObject):
+    # The scanned venvs, or None and the error when the scan failed
+    finished = pyqtSignal(object, str)
+
+
+class InventoryLoader(QRunnable):
+    def __init__(self, signals: InventorySignals, roots: List[str]):
+        super().__init__()
+        self.signals = signals
+        self._roots = roots
+
+    def run(self):
+        # Always emitted, so the tab never stays stuck in a scan that died; PyQt aborts on exceptions left in run()
+        try:
+            self.signals.finished.emit(DevToolsService.scan_venvs(self._roots or None), "")
+        except Exception as e:
+            self.signals.finished.emit(None, str(e))
+
+
+class InventoryTab(QWidget):
+    def __init__(self, execute_task: Callable, parent=None):
+        super().__init__(parent)
+        self._execute_task = execute_task
+        self._scanning = False
+        self._loader_signals = InventorySignals(self)
+        self._loader_signals.finished.connect(self._scanned)
+        self._venvs: List[VenvInfo] = []
+
+        self._roots = QLabel()
+        self._roots.setWordWrap(True)
+        self._status = QLabel()
+        self._table = QTableWidget(0, len(COLUMNS))
+        self._table.setHorizontalHeaderLabels(COLUMNS)
+        self._table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self._table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._table.verticalHeader().setVisible(False)
+        self._table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+
+        btn_roots = QPushButton("Search in...")
+        btn_roots.clicked.connect(self._choose_root)
+        btn_scan = QPushButton("Rescan")
+        btn_scan.clicked.connect(lambda: self.scan())
+        btn_delete = QPushButton("Delete selected")
+        btn_delete.clicked.connect(self._delete_selected)
+        btn_broken = QPushButton("Delete broken")
+        btn_broken.setToolTip("Delete every venv whose interpreter no longer exists")
+        btn_broken.clicked.connect(self._delete_broken)
+        buttons = QHBoxLayout()
+        buttons.addWidget(btn_roots)
+        buttons.addWidget(btn_scan)
+        buttons.addStretch()
+        buttons.addWidget(btn_delete)
+        buttons.addWidget(btn_broken)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self._roots)
+        layout.addWidget(self._table)
+        layout.addWidget(self._status)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        # The last scan shows immediately; a rescan only re-lists directories that changed since
+        self._show_roots(DevToolsService.venv_roots())
+        self._populate(DevToolsService.cached_venvs())
+
+    def scan(self, roots: List[str] = None):
+        if self._scanning:
+            return
+        self._scanning = True
+        self._status.setText("Scanning...")
+        QThreadPool.globalInstance().start(InventoryLoader(self._loader_signals, roots or []))
+
+    def _scanned(self, venvs: Optional[List[VenvInfo]], error: str):
+        self._scanning = False
+        if venvs is None:
+            self._status.setText(f"Scan failed: {error}")
+            return
+        self._show_roots(DevToolsService.venv_roots())
+        self._populate(venvs)
+
+    def _show_roots(self, roots: List[str]):
+        self._roots.setText("Virtual environments under " + ", ".join(roots))
+
+    def _populate(self, venvs: List[VenvInfo]):
+        self._venvs = venvs
+        self._table.setSortingEnabled(False)
+        self._table.setRowCount(len(venvs))
+        for row, venv in enumerate(venvs):
+            path = QTableWidgetItem(venv.path)
+            path.setData(Qt.ItemDataRole.UserRole, venv.path)
+            size = _SortItem(format_bytes(venv.size_bytes), venv.size_bytes)
+            if venv.shared_bytes:
+                size.setToolTip(f"{format_bytes(venv.shared_bytes)} shared with other venvs")
+            used = _SortItem(time.strftime("%Y-%m-%d", time.localtime(venv.last_used)), venv.last_used)
+            interpreter = QTableWidgetItem(venv.interpreter if venv.interpreter_exists else "Missing")
+            interpreter.setToolTip(venv.interpreter or "")
+            for column, item in enumerate([path, QTableWidgetItem(venv.version or "?"), size, used, interpreter]):
+                self._table.setItem(row, column, item)
+        self._table.setSortingEnabled(True)
+        total = sum(venv.size_bytes for venv in venvs)
+        broken = sum(1 for venv in venvs if not venv.interpreter_exists)
+        self._status.setText(f"{len(venvs)} venvs, {format_bytes(total)}, {broken} with a missing interpreter")
+
+    def _choose_root(self):
+        root = QFileDialog.getExistingDirectory(self, "Select the directory to search for virtual environments")
+        if root:
+            self.scan([root])
+
+    def _delete_selected(self):
+        rows = {index.row() for index in self._table.selectedIndexes()}
+        self._delete([self._table.item(row, 0).data(Qt.ItemDataRole.UserRole) for row in sorted(rows)])
+
+    def _delete_broken(self):
+        self._delete([venv.path for venv in self._venvs if not venv.interpreter_exists])
+
+    def _delete(self, paths: List[str]):
+        if not paths:
+            QMessageBox.information(self, "Virtual Environments", "No virtual environments to delete.")
+            return
+        listing = "\n".join(paths[:20]) + (f"\n... and {len(paths) - 20} more" if len(paths) > 20 else "")
+        answer = QMessageBox.question(
+            self, "Virtual Environments", f"Permanently delete {len(paths)} virtual environments?\n\n{listing}"
+        )
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        job = self._execute_task(
+            DevToolsService.delete_venvs,
+            paths,
+            title="Virtual Environments",
+            label=f"Deleting {len(paths)} virtual environments...",
+            resources=tuple(f"venv:{os.path.dirname(path)}" for path in paths),
+        )
+        job.state_changed.connect(lambda *_: job.done and self._populate(DevToolsService.cached_venvs()))
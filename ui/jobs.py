@@ -0,0 +1,141 @@
+import itertools
+from enum import Enum
+from typing import Callable, Iterable, List, Optional, Set
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from services.command_runner import KILL_GRACE, CancelToken, JobCancelled, cancellable, forward_output
+from services.dev_tools_service import ActionResult
+
+# Resources a job can hold exclusively; jobs sharing one run strictly one after another
+PRIVILEGED = "privileged"  # sudo/pkexec prompts and the system package manager lock
+VSCODE = "vscode"
+MAX_CONCURRENT_JOBS = 2
+
+
+class JobState(Enum):
+    PENDING = "Queued"
+    RUNNING = "Running"
+    FINISHED = "Finished"
+    FAILED = "Failed"
+    CANCELLED = "Cancelled"
+
+
+class Job(QObject):
+    progress = pyqtSignal(int, str)
+    output = pyqtSignal(list)
+    state_changed = pyqtSignal()
+    _completed = pyqtSignal(object, str)
+
+    def __init__(self, job_id: int, title: str, func: Callable, args: tuple, kwargs: dict, resources: Set[str]):
+        super().__init__()
+        self.id = job_id
+        self.title = title
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.resources = resources
+        self.token = CancelToken()
+        self.state = JobState.PENDING
+        self.result: Optional[str] = None
+        self.status = ""
+        self.progress.connect(self._track_progress)
+
+    @property
+    def done(self) -> bool:
+        return self.state in (JobState.FINISHED, JobState.FAILED, JobState.CANCELLED)
+
+    def _track_progress(self, value: int, message: str):
+        self.status = message
+
+    def _set_state(self, state: JobState, result: Optional[str] = None):
+        self.state = state
+        if result is not None:
+            self.result = result
+        self.state_changed.emit()
+
+
+class _JobRunnable(QRunnable):
+    def __init__(self, job: Job):
+        super().__init__()
+        self.job = job
+
+    def run(self):
+        job = self.job
+        # Signals emitted here are queued to the GUI thread, where the job object lives
+        kwargs = dict(job.kwargs, progress_callback=job.progress.emit)
+        try:
+            with forward_output(job.output.emit), cancellable(job.token):
+                result = job.func(*job.args, **kwargs)
+            failed = isinstance(result, ActionResult) and not result.ok
+            job._completed.emit(JobState.FAILED if failed else JobState.FINISHED, str(result))
+        except JobCancelled:
+            job._completed.emit(JobState.CANCELLED, "Cancelled")
+        except Exception as e:
+            job._completed.emit(JobState.FAILED, str(e))
+
+
+class JobScheduler(QObject):
+    job_added = pyqtSignal(object)
+
+    def __init__(self, max_jobs: int = MAX_CONCURRENT_JOBS, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_jobs)
+        self._max_jobs = max_jobs
+        self._jobs: List[Job] = []
+        self._busy: Set[str] = set()
+        self._ids = itertools.count(1)
+
+    @property
+    def jobs(self) -> List[Job]:
+        return list(self._jobs)
+
+    def running_process_groups(self) -> Set[int]:
+        groups = set()
+        for job in self._jobs:
+            if job.state == JobState.RUNNING:
+                groups |= job.token.process_groups()
+        return groups
+
+    def submit(self, title: str, func: Callable, *args, resources: Iterable[str] = (), **kwargs) -> Job:
+        job = Job(next(self._ids), title, func, args, kwargs, set(resources))
+        job._completed.connect(lambda state, result: self._on_completed(job, state, result))
+        self._jobs.append(job)
+        self.job_added.emit(job)
+        self._dispatch()
+        return job
+
+    def cancel(self, job: Job):
+        if job.state == JobState.PENDING:
+            job._set_state(JobState.CANCELLED, "Cancelled before it started")
+        elif job.state == JobState.RUNNING:
+            job.status = "Cancelling..."
+            job.token.cancel()
+            job.state_changed.emit()
+
+    def clear_finished(self):
+        self._jobs = [job for job in self._jobs if not job.done]
+
+    def shutdown(self):
+        for job in self._jobs:
+            self.cancel(job)
+        # Cancelled process groups get SIGKILL after the grace period, so this wait is bounded
+        self._pool.waitForDone(int((KILL_GRACE + 2) * 1000))
+
+    def _dispatch(self):
+        running = sum(1 for job in self._jobs if job.state == JobState.RUNNING)
+        for job in self._jobs:
+            if running >= self._max_jobs:
+                break
+            if job.state != JobState.PENDING or job.resources & self._busy:
+                continue
+            self._busy |= job.resources
+            running += 1
+            job._set_state(JobState.RUNNING)
+            self._pool.start(_JobRunnable(job))
+
+    def _on_completed(self, job: Job, state: JobState, result: str):
+        self._busy -= job.resources
+        job._set_state(state, result)
+        self._dispatch()
@@ -1,19 +1,24 @@
-import subprocess
 from pathlib import Path
+from typing import Optional, Tuple
 
-from PyQt6.QtCore import QObject, Qt, QThread, pyqtSignal
+from PyQt6.QtCore import QObject, QRunnable, Qt, QThreadPool, pyqtSignal
 from PyQt6.QtGui import QFont, QIcon, QPixmap
 from PyQt6.QtWidgets import (
+    QCheckBox,
     QComboBox,
     QDialog,
     QDialogButtonBox,
     QFileDialog,
+    QFormLayout,
     QHBoxLayout,
     QInputDialog,
     QLabel,
+    QListWidget,
+    QListWidgetItem,
     QMainWindow,
     QMessageBox,
-    QProgressDialog,
+    QPlainTextEdit,
+    QProgressBar,
     QPushButton,
     QSizePolicy,
     QSpacerItem,
@@ -22,31 +27,91 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+from services.build_profiles import DEFAULT_BUILD_PROFILE
 from services.dev_tools_service import DevToolsService
+from ui.inventory import InventoryTab
+from ui.jobs import PRIVILEGED, VSCODE, Job, JobScheduler, JobState
+from ui.monitor import MonitorTab
 
+LOG_PANE_LINES = 5000
 
-class Worker(QObject):
-    progress = pyqtSignal(int, str)
+
+class SystemInfoSignals(QObject):
+    row_ready = pyqtSignal(str, str)
+    # Empty, or the error that ended the refresh
     finished = pyqtSignal(str)
-    error = pyqtSignal(str)
 
-    def __init__(self, func, *args, **kwargs):
+
+class SystemInfoLoader(QRunnable):
+    def __init__(self, signals: SystemInfoSignals):
         super().__init__()
-        self.func = func
-        self.args = args
-        self.kwargs = kwargs
+        self.signals = signals
 
     def run(self):
+        # Signals emitted here are queued to the GUI thread, where the signals object lives; PyQt aborts on
+        # exceptions left in run()
         try:
+            DevToolsService.refresh_system_info(on_row=self.signals.row_ready.emit)
+            self.signals.finished.emit("")
+        except Exception as e:
+            self.signals.finished.emit(f"Refresh failed: {e}")
+
+
+class TaskDialog(QDialog):
+    cancel_requested = pyqtSignal()
+
+    def __init__(self, title: str, label: str, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setMinimumWidth(460)
+
+        self._label = QLabel(label)
+        self._label.setWordWrap(True)
+        self._progress = QProgressBar()
+        self._progress.setRange(0, 100)
+        self._toggle = QPushButton("Show output")
+        self._toggle.setCheckable(True)
+        self._toggle.toggled.connect(self._toggle_output)
+        self._output = QPlainTextEdit()
+        self._output.setReadOnly(True)
+        self._output.setMaximumBlockCount(LOG_PANE_LINES)
+        self._output.setFont(QFont("Monospace", 9))
+        self._output.setMinimumHeight(240)
+        self._output.hide()
+        self._cancel = QPushButton("Cancel")
+        self._cancel.clicked.connect(self._request_cancel)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self._toggle)
+        buttons.addStretch()
+        buttons.addWidget(self._cancel)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self._label)
+        layout.addWidget(self._progress)
+        layout.addLayout(buttons)
+        layout.addWidget(self._output)
+        self.setLayout(layout)
 
-            def progress_cb(val, msg):
-                self.progress.emit(val, msg)
+    def setValue(self, value: int):
+        self._progress.setValue(value)
 
-            self.kwargs["progress_callback"] = progress_cb
-            result = self.func(*self.args, **self.kwargs)
-            self.finished.emit(result)
-        except Exception as e:
-            self.error.emit(str(e))
+    def setLabelText(self, text: str):
+        self._label.setText(text)
+
+    def append_output(self, lines: list):
+        # One append per batch; the block limit keeps the pane's memory bounded like the runner's tail
+        self._output.appendPlainText("\n".join(lines))
+
+    def _request_cancel(self):
+        self._cancel.setEnabled(False)
+        self._label.setText("Cancelling...")
+        self.cancel_requested.emit()
+
+    def _toggle_output(self, visible: bool):
+        self._output.setVisible(visible)
+        self._toggle.setText("Hide output" if visible else "Show output")
+        self.adjustSize()
 
 
 class MainWindow(QMainWindow):
@@ -55,8 +120,14 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Dev Tools")
         self.setMinimumSize(540, 400)
         self.setStyleSheet(self._get_styles())
+        self._scheduler = JobScheduler(parent=self)
+        self._job_items = {}
+        self._system_signals = SystemInfoSignals(self)
+        self._system_refreshing = False
         self._init_ui()
-        self._active_threads = []
+        self._system_signals.row_ready.connect(lambda key, value: self._system_rows[key].setText(value))
+        self._system_signals.finished.connect(self._system_info_loaded)
+        self._scheduler.job_added.connect(self._add_job_item)
 
     def _init_ui(self):
         main_widget = QWidget()
@@ -86,7 +157,14 @@ class MainWindow(QMainWindow):
         tabs.addTab(self._vscode_tab(), QIcon(), "VSCode")
         tabs.addTab(self._python_tab(), QIcon(), "Python")
         tabs.addTab(self._venv_tab(), QIcon(), "Virtualenvs")
-        tabs.addTab(self._system_tab(), QIcon(), "System")
+        self._inventory_tab = InventoryTab(self._execute_task)
+        tabs.addTab(self._inventory_tab, QIcon(), "Venv inventory")
+        self._system_tab_widget = self._system_tab()
+        tabs.addTab(self._system_tab_widget, QIcon(), "System")
+        tabs.addTab(MonitorTab(self._scheduler.running_process_groups), QIcon(), "Monitor")
+        tabs.addTab(self._jobs_tab(), QIcon(), "Jobs")
+        tabs.currentChanged.connect(self._tab_changed)
+        self._tabs = tabs
         main_layout.addWidget(tabs)
 
         main_widget.setLayout(main_layout)
@@ -100,8 +178,12 @@ class MainWindow(QMainWindow):
         btn_update = QPushButton(QIcon.fromTheme("system-software-update"), "Install/Update VSCode")
         btn_update.setToolTip("Download, install or update VSCode in /opt/vscode")
         btn_update.clicked.connect(self._update_vscode)
+        btn_restore = QPushButton(QIcon.fromTheme("document-revert"), "Restore VSCode backup")
+        btn_restore.setToolTip("Roll /opt/vscode back to a version kept in the backup store")
+        btn_restore.clicked.connect(self._restore_vscode)
         layout.addWidget(desc)
         layout.addWidget(btn_update)
+        layout.addWidget(btn_restore)
         layout.addStretch()
         tab.setLayout(layout)
         return tab
@@ -128,8 +210,12 @@ class MainWindow(QMainWindow):
         btn_create = QPushButton(QIcon.fromTheme("folder-new"), "Create virtual environment")
         btn_create.setToolTip("Create a Python virtual environment in the selected directory")
         btn_create.clicked.connect(self._create_venv)
+        btn_batch = QPushButton(QIcon.fromTheme("folder-open"), "Create venvs for all projects in a folder")
+        btn_batch.setToolTip("Find projects with requirements.txt or pyproject.toml and no .venv, and create them")
+        btn_batch.clicked.connect(self._provision_venvs)
         layout.addWidget(desc)
         layout.addWidget(btn_create)
+        layout.addWidget(btn_batch)
         layout.addStretch()
         tab.setLayout(layout)
         return tab
@@ -139,71 +225,139 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout()
         desc = QLabel("System information and installed tools.")
         desc.setWordWrap(True)
-        btn_info = QPushButton(QIcon.fromTheme("dialog-information"), "Show system information")
+        self._system_rows = {}
+        rows = QFormLayout()
+        cached = DevToolsService.cached_system_info()
+        for key, label, _ in DevToolsService.system_info_probes():
+            value = QLabel(cached.get(key, "..."))
+            value.setWordWrap(True)
+            value.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+            rows.addRow(QLabel(f"<b>{label}</b>"), value)
+            self._system_rows[key] = value
+        self._system_status = QLabel("Cached values, refresh pending" if cached else "")
+        btn_info = QPushButton(QIcon.fromTheme("view-refresh"), "Refresh system information")
         btn_info.setToolTip("Show relevant system and tools information")
         btn_info.clicked.connect(self._show_system_info)
         layout.addWidget(desc)
+        layout.addLayout(rows)
+        layout.addWidget(self._system_status)
         layout.addWidget(btn_info)
         layout.addStretch()
         tab.setLayout(layout)
         return tab
 
-    def _execute_task(self, task_func, *args, title="Task", label="Processing..."):
-        dlg = QProgressDialog(label, None, 0, 100, self)
-        dlg.setWindowTitle(title)
-        dlg.setValue(0)
-        dlg.setMinimumDuration(0)
-        dlg.setCancelButton(None)
-
-        worker = Worker(task_func, *args)
-        thread = QThread()
-
-        self._active_threads.append((worker, thread))
-        worker.moveToThread(thread)
+    def _jobs_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout()
+        desc = QLabel("Queued, running and finished jobs. Jobs needing administrator rights run one at a time.")
+        desc.setWordWrap(True)
+        self._job_list = QListWidget()
+        btn_cancel = QPushButton(QIcon.fromTheme("process-stop"), "Cancel selected job")
+        btn_cancel.clicked.connect(self._cancel_selected_job)
+        btn_clear = QPushButton(QIcon.fromTheme("edit-clear"), "Clear finished jobs")
+        btn_clear.clicked.connect(self._clear_finished_jobs)
+        buttons = QHBoxLayout()
+        buttons.addWidget(btn_cancel)
+        buttons.addWidget(btn_clear)
+        layout.addWidget(desc)
+        layout.addWidget(self._job_list)
+        layout.addLayout(buttons)
+        tab.setLayout(layout)
+        return tab
 
-        def handle_finished(result):
-            dlg.setValue(100)
-            QMessageBox.information(self, title, result)
+    def _add_job_item(self, job: Job):
+        item = QListWidgetItem()
+        item.setData(Qt.ItemDataRole.UserRole, job.id)
+        self._job_list.addItem(item)
+        self._job_items[job.id] = (job, item)
+
+        def refresh(*_):
+            status = job.result if job.done else job.status
+            item.setText(f"#{job.id} {job.title} - {job.state.value}" + (f": {status}" if status else ""))
+
+        job.state_changed.connect(refresh)
+        job.progress.connect(refresh)
+        refresh()
+
+    def _cancel_selected_job(self):
+        for item in self._job_list.selectedItems():
+            job, _ = self._job_items[item.data(Qt.ItemDataRole.UserRole)]
+            self._scheduler.cancel(job)
+
+    def _clear_finished_jobs(self):
+        self._scheduler.clear_finished()
+        for job_id, (job, item) in list(self._job_items.items()):
+            if job.done:
+                self._job_list.takeItem(self._job_list.row(item))
+                del self._job_items[job_id]
+
+    def _execute_task(self, task_func, *args, title="Task", label="Processing...", resources=(), **kwargs):
+        dlg = TaskDialog(title, label, self)
+        job = self._scheduler.submit(label.rstrip("."), task_func, *args, resources=resources, **kwargs)
+        if job.state == JobState.PENDING:
+            dlg.setLabelText(f"{label}\nQueued until the jobs ahead of it finish.")
+        dlg.show()
+
+        def handle_state():
+            if job.state == JobState.RUNNING:
+                dlg.setLabelText(job.status or label)
+                return
+            if not job.done:
+                return
             dlg.close()
-            thread.quit()
-            thread.wait(1000)
-            if (worker, thread) in self._active_threads:
-                self._active_threads.remove((worker, thread))
-            worker.deleteLater()
-            thread.deleteLater()
-
-        def handle_error(error_msg):
-            dlg.close()
-            QMessageBox.critical(self, f"{title} Error", f"An error occurred:\n{error_msg}")
-            thread.quit()
-            if (worker, thread) in self._active_threads:
-                self._active_threads.remove((worker, thread))
-            worker.deleteLater()
-            thread.deleteLater()
+            dlg.deleteLater()
+            if job.state == JobState.FINISHED:
+                QMessageBox.information(self, title, job.result)
+            elif job.state == JobState.FAILED:
+                QMessageBox.critical(self, f"{title} Error", f"An error occurred:\n{job.result}")
+            else:
+                QMessageBox.information(self, title, f"{label.rstrip('.')} was cancelled.")
 
         def handle_progress(val, msg):
             dlg.setValue(val)
             dlg.setLabelText(msg)
 
-        worker.progress.connect(handle_progress)
-        worker.finished.connect(handle_finished)
-        worker.error.connect(handle_error)
+        dlg.cancel_requested.connect(lambda: self._scheduler.cancel(job))
+        job.progress.connect(handle_progress)
+        job.output.connect(dlg.append_output)
+        job.state_changed.connect(handle_state)
+        return job
 
-        thread.started.connect(worker.run)
-        thread.start()
+    def closeEvent(self, event):
+        self._scheduler.shutdown()
+        DevToolsService.close_privileged_session()
+        super().closeEvent(event)
 
     def _update_vscode(self):
-        self._execute_task(DevToolsService.update_vscode, title="VSCode", label="Updating VSCode...")
+        self._execute_task(
+            DevToolsService.update_vscode, title="VSCode", label="Updating VSCode...", resources=(PRIVILEGED, VSCODE)
+        )
 
-    def _create_venv(self):
-        path = QFileDialog.getExistingDirectory(self, "Select the directory for the virtual environment")
-        if not path:
+    def _restore_vscode(self):
+        backups = DevToolsService.list_vscode_backups()
+        if not backups:
+            QMessageBox.information(self, "VSCode Backups", "No VSCode backups found.")
+            return
+
+        items = [f"{name} ({version})" for name, version in backups]
+        item, ok = QInputDialog.getItem(self, "Restore VSCode", "Backup to restore:", items, 0, False)
+        if not ok:
             return
 
-        available_versions = DevToolsService.detect_python_versions()
+        snapshot = backups[items.index(item)][0]
+        self._execute_task(
+            DevToolsService.restore_vscode,
+            snapshot,
+            title="VSCode",
+            label=f"Restoring VSCode backup {snapshot}...",
+            resources=(PRIVILEGED, VSCODE),
+        )
+
+    def _select_python_version(self, requirements_option: bool = False) -> Optional[Tuple[str, bool]]:
+        available_versions = DevToolsService.python_installations()
         if not available_versions:
             QMessageBox.warning(self, "No Python Versions", "No Python versions found on your system.")
-            return
+            return None
 
         dialog = QDialog(self)
         dialog.setWindowTitle("Select Python Version")
@@ -217,17 +371,9 @@ class MainWindow(QMainWindow):
         version_combo = QComboBox()
 
         version_details = []
-        for version in available_versions:
-            python_cmd = DevToolsService.get_python_command(version)
-            if python_cmd:
-                try:
-                    result = subprocess.run([python_cmd, "--version"], capture_output=True, text=True, check=False)
-                    exact_version = result.stdout.strip() if result.returncode == 0 else f"Python {version}"
-                    display_text = f"{exact_version} ({python_cmd})"
-                    version_details.append((display_text, version))
-                except Exception:
-                    display_text = f"Python {version} ({python_cmd})"
-                    version_details.append((display_text, version))
+        for version, python_cmd, version_output in available_versions:
+            exact_version = version_output or f"Python {version}"
+            version_details.append((f"{exact_version} ({python_cmd})", version))
 
         version_details.sort(key=lambda x: tuple(map(int, x[1].split("."))), reverse=True)
 
@@ -236,6 +382,10 @@ class MainWindow(QMainWindow):
 
         layout.addWidget(version_combo)
 
+        requirements_check = QCheckBox("Install requirements.txt from the shared wheelhouse")
+        if requirements_option:
+            layout.addWidget(requirements_check)
+
         button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         button_box.accepted.connect(dialog.accept)
         button_box.rejected.connect(dialog.reject)
@@ -244,9 +394,19 @@ class MainWindow(QMainWindow):
         dialog.setLayout(layout)
 
         if dialog.exec() != QDialog.DialogCode.Accepted:
+            return None
+
+        return version_combo.currentData(), requirements_check.isChecked()
+
+    def _create_venv(self):
+        path = QFileDialog.getExistingDirectory(self, "Select the directory for the virtual environment")
+        if not path:
             return
 
-        selected_version = version_combo.currentData()
+        selection = self._select_python_version(requirements_option=(Path(path) / "requirements.txt").is_file())
+        if not selection:
+            return
+        selected_version, install_requirements = selection
 
         self._execute_task(
             DevToolsService.create_venv,
@@ -254,19 +414,85 @@ class MainWindow(QMainWindow):
             selected_version,
             title="Virtual Environment",
             label=f"Creating virtual environment with Python {selected_version}...",
+            resources=(f"venv:{path}",),
+            install_requirements=install_requirements,
+        )
+
+    def _provision_venvs(self):
+        root = QFileDialog.getExistingDirectory(self, "Select the directory containing your projects")
+        if not root:
+            return
+
+        projects = DevToolsService.find_venv_projects([root])
+        if not projects:
+            QMessageBox.information(self, "Virtual Environments", f"Every project under {root} already has a venv.")
+            return
+
+        listing = "\n".join(str(project.relative_to(Path(root).resolve())) for project in projects[:20])
+        if len(projects) > 20:
+            listing += f"\n... and {len(projects) - 20} more"
+        answer = QMessageBox.question(
+            self, "Virtual Environments", f"Create virtual environments for {len(projects)} projects?\n\n{listing}"
+        )
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+
+        selection = self._select_python_version(requirements_option=True)
+        if not selection:
+            return
+        selected_version, install_requirements = selection
+
+        self._execute_task(
+            DevToolsService.provision_venvs,
+            [str(project) for project in projects],
+            selected_version,
+            title="Virtual Environments",
+            label=f"Provisioning {len(projects)} virtual environments with Python {selected_version}...",
+            resources=tuple(f"venv:{project}" for project in projects),
+            install_requirements=install_requirements,
         )
 
     def _install_python(self):
-        version, ok = QInputDialog.getText(self, "Install Python", "Python version (e.g.: 3.11):", text="3.11")
-        if not ok or not version:
+        text, ok = QInputDialog.getText(
+            self, "Install Python", "Python versions, separated by spaces (e.g.: 3.11 3.12):", text="3.11"
+        )
+        versions = text.replace(",", " ").split()
+        if not ok or not versions:
+            return
+        profiles = DevToolsService.build_profiles()
+        items = [f"{name} - {description}" for name, description in profiles]
+        default = next(i for i, (name, _) in enumerate(profiles) if name == DEFAULT_BUILD_PROFILE)
+        item, ok = QInputDialog.getItem(
+            self, "Install Python", "Build profile (used when compiling from source):", items, default, False
+        )
+        if not ok:
             return
         self._execute_task(
-            DevToolsService.install_python, version, title="Python", label=f"Installing Python {version}..."
+            DevToolsService.install_pythons,
+            versions,
+            title="Python",
+            label=f"Installing Python {', '.join(versions)}...",
+            resources=(PRIVILEGED,),
+            build_profile=profiles[items.index(item)][0],
         )
 
     def _show_system_info(self):
-        info = DevToolsService.system_info()
-        QMessageBox.information(self, "System Information", info)
+        if self._system_refreshing:
+            return
+        # Each row updates as its probe finishes; the other rows keep their cached values meanwhile
+        self._system_refreshing = True
+        self._system_status.setText("Refreshing...")
+        QThreadPool.globalInstance().start(SystemInfoLoader(self._system_signals))
+
+    def _system_info_loaded(self, error: str):
+        self._system_refreshing = False
+        self._system_status.setText(error)
+
+    def _tab_changed(self, index: int):
+        if self._tabs.widget(index) is self._system_tab_widget:
+            self._show_system_info()
+        elif self._tabs.widget(index) is self._inventory_tab:
+            self._inventory_tab.scan()
 
     def _get_styles(self):
         return """
@@ -302,8 +528,13 @@ class MainWindow(QMainWindow):
             background: #5e81ac;
             color: #fff;
         }
-        QProgressDialog {
+        TaskDialog {
             background: #23272e;
             color: #e0e0e0;
         }
+        QPlainTextEdit {
+            background: #1b1e23;
+            color: #c8ccd4;
+            border: 1px solid #444;
+        }
         """
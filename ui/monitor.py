@@ -0,0 +1,132 @@
+from typing import Callable, List, Optional
+
+from PyQt6.QtCore import QPointF, Qt, QTimer
+from PyQt6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt6.QtWidgets import (
+    QFileDialog,
+    QGridLayout,
+    QHBoxLayout,
+    QLabel,
+    QMessageBox,
+    QPushButton,
+    QSpinBox,
+    QVBoxLayout,
+    QWidget,
+)
+
+from services.downloader import format_bytes
+from services.resource_monitor import ResourceHistory, ResourceSampler
+
+DEFAULT_INTERVAL_MS = 1000
+
+# (metric, label, fixed maximum or None to scale to the visible peak, value formatter)
+PLOTS = [
+    ("cpu_percent", "CPU", 100.0, lambda value: f"{value:.0f}%"),
+    ("iowait_percent", "I/O wait", 100.0, lambda value: f"{value:.0f}%"),
+    ("memory_percent", "Memory", 100.0, lambda value: f"{value:.0f}%"),
+    ("swap_used_bytes", "Swap used", None, format_bytes),
+    ("disk_read_bps", "Disk read", None, lambda value: f"{format_bytes(value)}/s"),
+    ("disk_write_bps", "Disk write", None, lambda value: f"{format_bytes(value)}/s"),
+    ("job_cpu_percent", "Jobs CPU", 100.0, lambda value: f"{value:.0f}%"),
+    ("job_rss_bytes", "Jobs memory", None, format_bytes),
+]
+
+
+class Sparkline(QWidget):
+    def __init__(self, maximum: Optional[float] = None, parent=None):
+        super().__init__(parent)
+        self._maximum = maximum
+        self._values: List[float] = []
+        self.setMinimumSize(160, 28)
+
+    def set_values(self, values: List[float]):
+        self._values = values
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#1b1e23"))
+        if len(self._values) < 2:
+            return
+        top = self._maximum or max(self._values) or 1.0
+        width, height = self.width() - 1, self.height() - 2
+        step = width / (len(self._values) - 1)
+        points = QPolygonF(
+            [QPointF(i * step, 1 + height - height * min(value / top, 1.0)) for i, value in enumerate(self._values)]
+        )
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(QPen(QColor("#88c0d0"), 1.2))
+        painter.drawPolyline(points)
+
+
+class MonitorTab(QWidget):
+    def __init__(self, job_groups: Callable[[], set], parent=None):
+        super().__init__(parent)
+        self._job_groups = job_groups
+        self._sampler = ResourceSampler()
+        self._history = ResourceHistory()
+        self._plots = {}
+
+        desc = QLabel("Live CPU, memory, disk and job resource usage, sampled from /proc.")
+        desc.setWordWrap(True)
+        grid = QGridLayout()
+        for row, (metric, label, maximum, _) in enumerate(PLOTS):
+            sparkline = Sparkline(maximum)
+            value = QLabel("-")
+            value.setMinimumWidth(90)
+            value.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            grid.addWidget(QLabel(label), row, 0)
+            grid.addWidget(sparkline, row, 1)
+            grid.addWidget(value, row, 2)
+            self._plots[metric] = (sparkline, value)
+        grid.setColumnStretch(1, 1)
+
+        self._interval = QSpinBox()
+        self._interval.setRange(200, 10000)
+        self._interval.setSingleStep(100)
+        self._interval.setSuffix(" ms")
+        self._interval.setValue(DEFAULT_INTERVAL_MS)
+        self._interval.valueChanged.connect(lambda interval: self._timer.setInterval(interval))
+        btn_export = QPushButton("Export samples...")
+        btn_export.clicked.connect(self._export)
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Interval"))
+        controls.addWidget(self._interval)
+        controls.addStretch()
+        controls.addWidget(btn_export)
+
+        layout = QVBoxLayout()
+        layout.addWidget(desc)
+        layout.addLayout(grid)
+        layout.addLayout(controls)
+        layout.addStretch()
+        self.setLayout(layout)
+
+        # Samples are taken even while the tab is hidden, so a finished job's history can still be exported
+        self._timer = QTimer(self)
+        self._timer.setInterval(DEFAULT_INTERVAL_MS)
+        self._timer.timeout.connect(self._sample)
+        self._timer.start()
+
+    def _sample(self):
+        try:
+            sample = self._sampler.sample(self._job_groups())
+        except OSError:
+            return
+        self._history.record(sample)
+        if not self.isVisible():
+            return
+        for metric, _, _, formatter in PLOTS:
+            sparkline, value = self._plots[metric]
+            series = self._history.series[metric]
+            sparkline.set_values(series.values())
+            value.setText(formatter(series.last()))
+
+    def _export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export resource samples", "resources.csv", "CSV files (*.csv)")
+        if not path:
+            return
+        try:
+            self._history.export_csv(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Error", f"Could not write {path}:\n{e}")
@@ -4,10 +4,11 @@ set -e
 
 ICON="$HOME/.local/share/icons/dev-tools.png"
 DESKTOP="$HOME/.local/share/applications/dev-tools.desktop"
+CLI="$HOME/.local/bin/dev-tools"
 PROJECT_DIR="$(cd "$(dirname "$0")" && pwd)"
 
 echo "Removing desktop entry and icon..."
-rm -f "$DESKTOP" "$ICON"
+rm -f "$DESKTOP" "$ICON" "$CLI"
 update-desktop-database "$HOME/.local/share/applications/"
 
 rm -rf "$PROJECT_DIR/.venv"